@@ -0,0 +1,65 @@
+"""
+benchmarks/bench_gcode_lines.py
+Micro-benchmark del bucle caliente de generate_full_code():
+filtro de distancia mínima + formateo de líneas G1, sobre un camino de 1M de puntos.
+
+Uso:  python -m benchmarks.bench_gcode_lines [n_puntos]
+"""
+import sys
+import time
+import numpy as np
+
+from core.path_utils import filter_min_distance, format_g1_lines
+
+def make_toolpath(n_points, step=0.2, dup_ratio=0.02, seed=0):
+    """
+    Polilínea suave con saltos de ~'step' mm (como un DXF aplanado a 0.1mm)
+    y una fracción 'dup_ratio' de puntos casi duplicados (como los que deja el buffer).
+    """
+    rng = np.random.default_rng(seed)
+    heading = np.cumsum(rng.normal(0, 0.05, n_points))
+    lengths = rng.uniform(0.5 * step, 1.5 * step, n_points)
+    pts = np.column_stack((np.cumsum(lengths * np.cos(heading)), np.cumsum(lengths * np.sin(heading))))
+    dup = rng.random(n_points) < dup_ratio
+    dup[0] = False
+    pts[dup] = pts[np.flatnonzero(dup) - 1] + 0.01
+    return pts
+
+def legacy(path, feed_rate):
+    """Implementación anterior: bucle Python punto a punto + f-string por línea."""
+    clean_path = [path[0]]
+    for i in range(1, len(path)):
+        prev = clean_path[-1]
+        curr = path[i]
+        dist_sq = (curr[0]-prev[0])**2 + (curr[1]-prev[1])**2
+        if dist_sq > 0.0025:
+            clean_path.append(curr)
+    return "\n".join(f"G1 X{p[0]:.3f} Y{p[1]:.3f} F{feed_rate:.1f}" for p in clean_path[1:])
+
+def vectorized(path, feed_rate):
+    clean_path = filter_min_distance(path)
+    return format_g1_lines(clean_path[1:], feed_rate)
+
+def run(n_points=1_000_000):
+    scenarios = (
+        ("realista (2% duplicados)", make_toolpath(n_points)),
+        ("denso (pasos < 0.05mm)", make_toolpath(n_points, step=0.04)),
+    )
+    for title, pts in scenarios:
+        print(f"--- {title}: {n_points} puntos ---")
+        as_tuples = [tuple(p) for p in pts.tolist()]
+
+        results = {}
+        for name, fn, data in (("legacy", legacy, as_tuples), ("vectorized", vectorized, pts)):
+            t0 = time.perf_counter()
+            text = fn(data, 1000.0)
+            elapsed = time.perf_counter() - t0
+            lines = text.count("\n") + 1
+            results[name] = (text, elapsed, lines)
+            print(f"{name:>10}: {lines} líneas en {elapsed:.3f}s -> {lines / elapsed:,.0f} líneas/s")
+
+        assert results["legacy"][0] == results["vectorized"][0], "La salida vectorizada difiere"
+        print(f"Aceleración: x{results['legacy'][1] / results['vectorized'][1]:.1f} (salida idéntica)")
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
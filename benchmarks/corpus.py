@@ -0,0 +1,108 @@
+"""
+benchmarks/corpus.py
+Corpus sintético de DXF para la suite de rendimiento. Cada fichero se genera
+de forma determinista (semilla fija) y representa un caso que ha dado
+problemas en diseños reales:
+- circles:   miles de círculos pequeños (sprinkles, puntos),
+- splines:   splines densas con muchos puntos de control (trazados vectorizados),
+- nested:    contornos cerrados anidados (marcos, letras con huecos),
+- text:      texto explotado en LINE y ARC sueltos,
+- huge:      un único polígono con 20000 vértices (un contorno vectorizado sin limpiar).
+'scale' multiplica el tamaño de todos los casos.
+"""
+import math
+import os
+import numpy as np
+import ezdxf
+
+# Área de trabajo en mm (la de la máquina)
+AREA = 200.0
+# Cambiar si cambia algún generador: los ficheros ya escritos dejan de reutilizarse
+CORPUS_VERSION = 1
+
+
+def _circles(msp, rng, scale):
+    n = int(1500 * scale)
+    centers = rng.uniform(5, AREA - 5, (n, 2))
+    radii = rng.uniform(0.8, 3.0, n)
+    for (x, y), r in zip(centers, radii):
+        msp.add_circle((float(x), float(y)), float(r))
+
+
+def _splines(msp, rng, scale):
+    n = int(300 * scale)
+    for _ in range(n):
+        start = rng.uniform(10, AREA - 10, 2)
+        steps = rng.normal(0, 2.0, (40, 2))
+        points = np.clip(start + np.cumsum(steps, axis=0), 0, AREA)
+        msp.add_open_spline([(float(x), float(y)) for x, y in points], degree=3)
+
+
+def _nested(msp, rng, scale):
+    groups = int(40 * scale)
+    side = max(1, int(math.ceil(math.sqrt(groups))))
+    cell = AREA / side
+    t = np.linspace(0, 2 * math.pi, 200, endpoint=False)
+    for g in range(groups):
+        cx = (g % side + 0.5) * cell
+        cy = (g // side + 0.5) * cell
+        wobble = rng.uniform(0.05, 0.15)
+        lobes = int(rng.integers(3, 7))
+        for level in range(5):
+            r = cell * 0.45 * (1.0 - level * 0.18)
+            rr = r * (1.0 + wobble * np.sin(lobes * t))
+            points = np.column_stack((cx + rr * np.cos(t), cy + rr * np.sin(t)))
+            msp.add_lwpolyline([(float(x), float(y)) for x, y in points], close=True)
+
+
+def _text(msp, rng, scale):
+    """Caracteres de 4x6 mm hechos de trazos rectos y algún arco, como un texto explotado."""
+    n = int(400 * scale)
+    per_row = int(AREA // 5)
+    for k in range(n):
+        ox = (k % per_row) * 5.0
+        oy = AREA - 8.0 - ((k // per_row) * 8.0) % (AREA - 8.0)
+        # Trazos al azar sobre una rejilla 3x3 de la celda del carácter
+        nodes = rng.integers(0, 3, (12, 2)) * (2.0, 3.0) + (ox, oy)
+        for a, b in zip(nodes[:-1], nodes[1:]):
+            if (a != b).any():
+                msp.add_line((float(a[0]), float(a[1])), (float(b[0]), float(b[1])))
+        for _ in range(2):
+            start = float(rng.uniform(0, 360))
+            msp.add_arc((ox + 2.0, oy + 3.0), 1.5, start, start + float(rng.uniform(60, 270)))
+
+
+def _huge(msp, rng, scale):
+    n = int(20000 * scale)
+    t = np.linspace(0, 2 * math.pi, n, endpoint=False)
+    r = 80.0 + 8.0 * np.sin(37 * t) + rng.normal(0, 0.05, n)
+    points = np.column_stack((AREA / 2 + r * np.cos(t), AREA / 2 + r * np.sin(t)))
+    msp.add_lwpolyline([(float(x), float(y)) for x, y in points], close=True)
+
+
+CASES = {
+    "circles": _circles,
+    "splines": _splines,
+    "nested": _nested,
+    "text": _text,
+    "huge": _huge,
+}
+
+
+def build_corpus(out_dir, scale=1.0, cases=None, seed=0):
+    """
+    Escribe los DXF que falten en 'out_dir' y devuelve {nombre: ruta}.
+    El nombre del fichero incluye versión, escala y semilla: los ya generados se reutilizan.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    files = {}
+    for name in cases or CASES:
+        filename = os.path.join(out_dir, f"{name}_v{CORPUS_VERSION}_x{scale:g}_s{seed}.dxf")
+        if not os.path.exists(filename):
+            doc = ezdxf.new("R2010")
+            CASES[name](doc.modelspace(), np.random.default_rng(seed), scale)
+            tmp = filename + ".tmp"
+            doc.saveas(tmp)
+            os.replace(tmp, filename)
+        files[name] = filename
+    return files
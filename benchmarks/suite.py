@@ -0,0 +1,260 @@
+"""
+benchmarks/suite.py
+Suite de rendimiento reproducible sobre el corpus sintético (benchmarks/corpus.py).
+Para cada DXF mide las etapas del flujo completo:
+- read:    DXFReader.read() sin caché en disco y en un solo proceso,
+- fill:    una operación de relleno con todos los contornos cerrados, por la
+           misma vía que la GUI (get_all_preview_paths(): anidado, caché y
+           relleno por lotes), con la caché vacía; se omite si no hay cerrados,
+- preview: get_all_preview_paths() (una operación de relleno y otra de línea),
+- gcode:   generate_full_code() en serie,
+- canvas:  creación de los ítems de la escena (Qt offscreen).
+Guarda tiempo (mediana de las repeticiones y su dispersión), rendimiento
+(unidades/s) y pico de memoria (tracemalloc) en JSON y, con --baseline, falla
+si alguna etapa empeora más que el umbral y más que el ruido de medida.
+
+Uso:
+    python -m benchmarks.suite [-o resultados.json] [--baseline benchmarks/baseline.json]
+                               [--save-baseline] [--threshold 0.3] [--scale 1.0] [--repeat 5]
+                               [--cases circles huge] [--stages read gcode]
+Código de salida: 0 correcto, 1 si hay regresiones.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from benchmarks.corpus import CASES, build_corpus
+from core.dxf_processor import DXFReader
+from core.gcode_generator import GCodeGenerator
+from core.path_order import is_closed
+
+STAGES = ("read", "fill", "preview", "gcode", "canvas")
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+# Por debajo de estas diferencias absolutas no se considera regresión (ruido de medida):
+# las etapas de menos de 100 ms varían en varias decenas de ms entre ejecuciones
+MIN_DELTA_SECONDS = 0.1
+MIN_DELTA_MB = 2.0
+# Además, un tiempo solo empeora si la diferencia supera este múltiplo de la
+# dispersión medida (desviación absoluta mediana) en la línea base y ahora
+NOISE_FACTOR = 3.0
+
+
+def measure(fn, repeat):
+    """
+    Ejecuta fn() 'repeat' veces y devuelve (mediana del tiempo, desviación
+    absoluta mediana, pico de memoria en MB, resultado). La mediana no depende
+    de una única ejecución afortunada o interrumpida, como el mínimo o la media.
+    Como timeit, el recolector de ciclos se desactiva mientras se cronometra: su
+    coste depende de los objetos que hayan dejado vivos los casos anteriores.
+    El pico se mide en una ejecución previa, que sirve además de calentamiento:
+    tracemalloc ralentiza y falsearía el tiempo.
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    times = []
+    result = None
+    for _ in range(max(1, repeat)):
+        gc.collect()
+        gc.disable()
+        try:
+            t0 = time.perf_counter()
+            result = fn()
+            times.append(time.perf_counter() - t0)
+        finally:
+            gc.enable()
+    median = float(np.median(times))
+    spread = float(np.median(np.abs(np.asarray(times) - median)))
+    return median, spread, peak / (1024 * 1024), result
+
+
+def _generator(paths):
+    generator = GCodeGenerator()
+    closed = [p for p in paths if is_closed(p)]
+    if closed:
+        generator.add_operation(closed, 'fill', 1, "#ff0000", "Relleno", 2.0)
+    generator.add_operation(paths, 'line', 2, "#000000", "Borde", 2.0)
+    return generator
+
+
+def _canvas_factory():
+    """Creador de lienzos offscreen, o None si PySide6 no está disponible."""
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    try:
+        from PySide6.QtWidgets import QApplication
+        from gui.canvas import ViewerCanvas
+    except ImportError:
+        return None
+    app = QApplication.instance() or QApplication([])
+
+    def create(paths):
+        canvas = ViewerCanvas()
+        canvas.begin_bulk_add()
+        canvas.add_dxf_object(paths)
+        canvas.end_bulk_add()
+        app.processEvents()
+        n_items = len(canvas.scene.items())
+        canvas.scene.clear()
+        canvas.deleteLater()
+        app.processEvents()
+        return n_items
+    return create
+
+
+def run_case(filename, stages, repeat):
+    """Mide las etapas pedidas sobre un DXF. Devuelve {etapa: {...}}."""
+    results = {}
+    reader = DXFReader(use_cache=False, workers=1)
+    paths = reader.read(filename)
+    n_points = sum(len(p) for p in paths)
+
+    def record(stage, fn, units, unit_name):
+        seconds, spread, peak_mb, result = measure(fn, repeat)
+        count = units(result)
+        results[stage] = {
+            "seconds": round(seconds, 4),
+            "spread": round(spread, 4),
+            "peak_mb": round(peak_mb, 2),
+            "units": count,
+            "unit": unit_name,
+            "throughput": round(count / seconds, 1) if seconds > 0 else None,
+        }
+        print(f"  {stage:>8}: {seconds:8.3f}s ±{spread:.3f} {peak_mb:8.1f} MB  {count} {unit_name}")
+
+    if "read" in stages:
+        record("read", lambda: reader.read(filename), lambda r: sum(len(p) for p in r), "puntos")
+
+    if "fill" in stages:
+        closed = [p for p in paths if is_closed(p)]
+
+        def fill():
+            # Generador nuevo en cada repetición: caché de rellenos vacía
+            generator = GCodeGenerator()
+            generator.add_operation(closed, 'fill', 1, "#ff0000", "Relleno", 2.0)
+            return generator.get_all_preview_paths()
+        if closed:
+            record("fill", fill, lambda r: len(closed), "contornos")
+        else:
+            print("  sin contornos cerrados: se omite 'fill'")
+
+    if "preview" in stages:
+        record("preview", lambda: _generator(paths).get_all_preview_paths(),
+               lambda r: sum(len(op['paths']) for op in r), "caminos")
+
+    if "gcode" in stages:
+        record("gcode", lambda: _generator(paths).generate_full_code(),
+               lambda r: r.count("\n") + 1, "líneas")
+
+    if "canvas" in stages:
+        create = _canvas_factory()
+        if create is None:
+            print("  PySide6 no disponible: se omite 'canvas'")
+        else:
+            record("canvas", lambda: create(paths), lambda r: len(paths), "ítems")
+
+    return {"paths": len(paths), "points": n_points, "stages": results}
+
+
+def compare(results, baseline, threshold):
+    """
+    Lista de regresiones (texto) respecto a la línea base: tiempo o memoria.
+    Una etapa empeora si supera el umbral relativo y la diferencia absoluta
+    supera tanto el mínimo fijo como NOISE_FACTOR veces la dispersión medida.
+    """
+    regressions = []
+    for case, data in results["cases"].items():
+        base_case = baseline.get("cases", {}).get(case)
+        if base_case is None:
+            continue
+        for stage, current in data["stages"].items():
+            base = base_case["stages"].get(stage)
+            if base is None:
+                continue
+            noise = NOISE_FACTOR * (base.get("spread", 0.0) + current.get("spread", 0.0))
+            for key, unit, min_delta in (("seconds", "s", max(MIN_DELTA_SECONDS, noise)),
+                                         ("peak_mb", "MB", MIN_DELTA_MB)):
+                old, new = base[key], current[key]
+                if new > old * (1.0 + threshold) and new - old > min_delta:
+                    regressions.append(f"{case}/{stage}: {key} {old}{unit} -> {new}{unit} "
+                                       f"(+{(new / old - 1.0) * 100 if old else float('inf'):.0f}%)")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.suite",
+                                     description="Suite de rendimiento sobre DXF sintéticos.")
+    parser.add_argument("-o", "--output", help="Fichero JSON de resultados")
+    parser.add_argument("--baseline", default=None,
+                        help=f"Línea base con la que comparar (por defecto {DEFAULT_BASELINE} si existe)")
+    parser.add_argument("--save-baseline", action="store_true", help="Guarda los resultados como línea base")
+    parser.add_argument("--threshold", type=float, default=0.3,
+                        help="Empeoramiento relativo admitido por etapa (0.3 = +30%%)")
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiplicador del tamaño del corpus")
+    parser.add_argument("--repeat", type=int, default=5, help="Repeticiones por etapa (se toma la mediana)")
+    parser.add_argument("--cases", nargs="+", choices=list(CASES), default=list(CASES))
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES))
+    parser.add_argument("--corpus-dir", default=os.path.join(tempfile.gettempdir(), "gcodecookies-bench"),
+                        help="Carpeta donde se generan (y reutilizan) los DXF sintéticos")
+    args = parser.parse_args(argv)
+
+    files = build_corpus(args.corpus_dir, args.scale, args.cases)
+    results = {
+        "meta": {
+            "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "scale": args.scale,
+            "repeat": args.repeat,
+        },
+        "cases": {},
+    }
+    for case in args.cases:
+        print(f"--- {case} ---")
+        results["cases"][case] = run_case(files[case], args.stages, args.repeat)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+
+    baseline_file = args.baseline or DEFAULT_BASELINE
+    if args.save_baseline:
+        with open(baseline_file, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+        print(f"Línea base guardada en {baseline_file}")
+        return 0
+
+    if not os.path.exists(baseline_file):
+        if args.baseline:
+            print(f"No existe la línea base {baseline_file}", file=sys.stderr)
+            return 2
+        return 0
+    with open(baseline_file, encoding="utf-8") as f:
+        baseline = json.load(f)
+    if baseline.get("meta", {}).get("scale") != args.scale:
+        print(f"Aviso: la línea base es de escala {baseline.get('meta', {}).get('scale')}, "
+              f"no {args.scale}; no se compara.", file=sys.stderr)
+        return 0
+    regressions = compare(results, baseline, args.threshold)
+    for line in regressions:
+        print(f"[REGRESIÓN] {line}", file=sys.stderr)
+    if not regressions:
+        print(f"Sin regresiones respecto a {baseline_file} (umbral +{args.threshold * 100:.0f}%)")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
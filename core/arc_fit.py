@@ -0,0 +1,215 @@
+"""
+core/arc_fit.py
+Ajuste de arcos: sustituye tramos de puntos que caen sobre una circunferencia
+(dentro de una tolerancia) por un único G2/G3 con centro I/J relativo.
+Una curva aplanada en cientos de G1 cortos pasa a unos pocos arcos.
+"""
+import math
+import numpy as np
+from core.path_utils import format_g1_lines
+
+# Segmentos mínimos para que un tramo se convierta en arco
+MIN_ARC_SEGMENTS = 3
+# Barrido máximo de un arco: hasta media vuelta no hay ambigüedad en ningún control
+MAX_ARC_SWEEP = math.pi
+# Radios mayores se consideran rectas (el centro quedaría lejísimos)
+MAX_ARC_RADIUS = 1000.0
+
+def _circle_through(ax, ay, bx, by, cx, cy):
+    """Centro y radio de la circunferencia por tres puntos (None si están alineados)."""
+    d = 2.0 * (ax * (by - cy) + bx * (cy - ay) + cx * (ay - by))
+    if abs(d) < 1e-12:
+        return None
+    a2 = ax * ax + ay * ay
+    b2 = bx * bx + by * by
+    c2 = cx * cx + cy * cy
+    ux = (a2 * (by - cy) + b2 * (cy - ay) + c2 * (ay - by)) / d
+    uy = (a2 * (cx - bx) + b2 * (ax - cx) + c2 * (bx - ax)) / d
+    return ux, uy, math.hypot(ax - ux, ay - uy)
+
+def _fit(points, i, j, tolerance):
+    """
+    Arco que recorre points[i..j] sin salirse de la tolerancia, o None.
+    La distancia radial de la polilínea al arco crece hacia fuera en los
+    vértices y hacia dentro en el punto de cada cuerda más cercano al centro
+    (que una recta larga no se convierta en una panza): ambos extremos deben
+    quedar dentro de la tolerancia. Además, sentido de giro constante y
+    barrido máximo.
+    """
+    m = (i + j) // 2
+    circle = _circle_through(points[i, 0], points[i, 1], points[m, 0], points[m, 1],
+                             points[j, 0], points[j, 1])
+    if circle is None:
+        return None
+    ux, uy, radius = circle
+    if radius > MAX_ARC_RADIUS or radius < tolerance:
+        return None
+
+    rel = points[i:j + 1] - (ux, uy)
+    dist = np.hypot(rel[:, 0], rel[:, 1])
+    if np.abs(dist - radius).max() > tolerance:
+        return None
+    # Punto de cada cuerda más cercano al centro (proyección acotada al segmento)
+    seg = rel[1:] - rel[:-1]
+    length2 = (seg * seg).sum(axis=1)
+    t = -(rel[:-1] * seg).sum(axis=1) / np.where(length2 > 0, length2, 1.0)
+    closest = rel[:-1] + np.clip(t, 0.0, 1.0)[:, None] * seg
+    if radius - np.hypot(closest[:, 0], closest[:, 1]).min() > tolerance:
+        return None
+
+    cross = rel[:-1, 0] * rel[1:, 1] - rel[:-1, 1] * rel[1:, 0]
+    dot = rel[:-1, 0] * rel[1:, 0] + rel[:-1, 1] * rel[1:, 1]
+    steps = np.arctan2(cross, dot)
+    ccw = steps[0] > 0
+    if (ccw and steps.min() <= 0) or (not ccw and steps.max() >= 0):
+        return None
+    if abs(steps.sum()) > MAX_ARC_SWEEP:
+        return None
+    return ux, uy, radius, bool(ccw)
+
+def fit_arcs(points, tolerance):
+    """
+    Divide el camino (Nx2) en tramos. Devuelve [(j, arco o None), ...]: cada
+    tramo termina en el vértice j; 'arco' es (cx, cy, radio, ccw) o None si es recta.
+    Búsqueda voraz: desde cada inicio se alarga el arco duplicando el tramo
+    mientras encaja y se afina el final con búsqueda binaria.
+    """
+    points = np.asarray(points, dtype=np.float64)
+    n = len(points)
+    pieces = []
+    i = 0
+    while i < n - 1:
+        j = i + MIN_ARC_SEGMENTS
+        arc = _fit(points, i, j, tolerance) if j < n else None
+        if arc is None:
+            pieces.append((i + 1, None))
+            i += 1
+            continue
+        # Crecer mientras encaje...
+        good, good_arc = j, arc
+        step = MIN_ARC_SEGMENTS
+        bad = None
+        while good < n - 1:
+            step *= 2
+            j = min(good + step, n - 1)
+            arc = _fit(points, i, j, tolerance)
+            if arc is None:
+                bad = j
+                break
+            good, good_arc = j, arc
+        # ...y afinar el final entre el último que encaja y el primero que no
+        if bad is not None:
+            while bad - good > 1:
+                j = (good + bad) // 2
+                arc = _fit(points, i, j, tolerance)
+                if arc is None:
+                    bad = j
+                else:
+                    good, good_arc = j, arc
+        pieces.append((good, good_arc))
+        i = good
+    return pieces
+
+def _arc_center(sx, sy, ex, ey, arc):
+    """
+    Centro recalculado a partir de los extremos ya redondeados a 3 decimales,
+    sobre la mediatriz y del mismo lado que el ajustado: así el radio de inicio
+    y el de fin coinciden y el control no rechaza el arco.
+    """
+    cx, cy, radius, ccw = arc
+    mx, my = (sx + ex) / 2.0, (sy + ey) / 2.0
+    dx, dy = ex - sx, ey - sy
+    half = math.hypot(dx, dy) / 2.0
+    if half == 0.0:
+        return cx, cy
+    h = math.sqrt(max(radius * radius - half * half, 0.0))
+    nx, ny = -dy / (2.0 * half), dx / (2.0 * half)
+    # Lado del centro ajustado respecto a la cuerda
+    side = 1.0 if (cx - mx) * nx + (cy - my) * ny >= 0 else -1.0
+    return mx + side * h * nx, my + side * h * ny
+
+def format_arc_moves(points, feed_rate, tolerance):
+    """
+    Movimientos desde points[0] hasta el final: G1 en bloque para los tramos
+    rectos y G2 (horario) / G3 (antihorario) con I/J para los arcos.
+    Devuelve el texto (líneas unidas por '\\n').
+    """
+    points = np.asarray(points, dtype=np.float64)
+    rounded = np.round(points, 3)
+    chunks = []
+    line_start = None # primer vértice pendiente de G1
+    prev = 0
+    for j, arc in fit_arcs(points, tolerance):
+        if arc is None:
+            if line_start is None:
+                line_start = j
+            prev = j
+            continue
+        if line_start is not None:
+            chunks.append(format_g1_lines(points[line_start:prev + 1], feed_rate))
+            line_start = None
+        sx, sy = rounded[prev]
+        ex, ey = rounded[j]
+        cx, cy = _arc_center(sx, sy, ex, ey, arc)
+        # round(...) + 0.0 evita imprimir "-0.000"
+        i_off = round(cx - sx, 3) + 0.0
+        j_off = round(cy - sy, 3) + 0.0
+        code = "G3" if arc[3] else "G2"
+        chunks.append(f"{code} X{points[j, 0]:.3f} Y{points[j, 1]:.3f} I{i_off:.3f} J{j_off:.3f} F{feed_rate:.1f}")
+        prev = j
+    if line_start is not None:
+        chunks.append(format_g1_lines(points[line_start:prev + 1], feed_rate))
+    return "\n".join(chunks)
+
+def arc_step(radius, tolerance, max_step_deg=5.0):
+    """
+    Paso angular (radianes) para muestrear un arco sin que la cuerda se separe
+    de él más de 'tolerance' (flecha R·(1 - cos(paso/2))), como mucho max_step_deg.
+    """
+    max_step = math.radians(max_step_deg)
+    if radius <= tolerance:
+        return max_step
+    return min(max_step, 2.0 * math.acos(1.0 - tolerance / radius))
+
+def arc_points(start, end, center, ccw, tolerance, max_step_deg=5.0, radius=None):
+    """
+    Puntos del arco de 'start' a 'end' alrededor de 'center' (sin 'start'; el
+    último es 'end' exacto), con el paso de arc_step(). Un arco con los
+    extremos iguales es la vuelta completa, como en G2/G3.
+    'radius' por defecto es la distancia de 'start' al centro.
+    """
+    cx, cy = center
+    if radius is None:
+        radius = math.hypot(start[0] - cx, start[1] - cy)
+    a0 = math.atan2(start[1] - cy, start[0] - cx)
+    a1 = math.atan2(end[1] - cy, end[0] - cx)
+    sweep = a1 - a0
+    if ccw and sweep <= 0:
+        sweep += 2 * math.pi
+    elif not ccw and sweep >= 0:
+        sweep -= 2 * math.pi
+    n = max(2, int(math.ceil(abs(sweep) / arc_step(radius, tolerance, max_step_deg))))
+    angles = a0 + sweep * np.arange(1, n + 1) / n
+    pts = np.column_stack((cx + radius * np.cos(angles), cy + radius * np.sin(angles)))
+    pts[-1] = end
+    return pts
+
+def arcs_to_polyline(points, tolerance, max_step_deg=5.0):
+    """
+    Geometría que recorrerá la máquina tras el ajuste (para la previsualización):
+    cada arco se vuelve a muestrear con cuerdas a menos de 'tolerance' de él
+    (como mucho cada 'max_step_deg' grados, ver arc_step).
+    """
+    points = np.asarray(points, dtype=np.float64)
+    if len(points) < 2:
+        return points
+    out = [points[:1]]
+    prev = 0
+    for j, arc in fit_arcs(points, tolerance):
+        if arc is None:
+            out.append(points[j:j + 1])
+        else:
+            cx, cy, radius, ccw = arc
+            out.append(arc_points(points[prev], points[j], (cx, cy), ccw, tolerance, max_step_deg, radius))
+        prev = j
+    return np.concatenate(out)
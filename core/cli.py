@@ -0,0 +1,257 @@
+"""
+core/cli.py
+Conversor por lotes DXF -> G-Code sin interfaz gráfica.
+
+Uso:
+    python -m core.cli trabajo.json diseño1.dxf diseño2.dxf ... [-o salida/] [-j 8] [--clear-cache]
+    python -m core.cli --clear-cache        (solo vacía la caché de DXF aplanados)
+
+El fichero de trabajo (JSON, o YAML si PyYAML está instalado) describe las
+operaciones que se aplican a cada DXF:
+
+    {
+      "design_name": "Galleta",            (opcional, por defecto el nombre del fichero)
+      "z_safe": 5.0, "z_print": 0.0,       (opcionales)
+      "fill_overlap": 0.1,                 (opcional)
+      "fill_holes": true,                  (opcional: los contornos interiores son huecos, par/impar)
+      "simplification_tolerance": 0.05,    (opcional)
+      "flattening_distance": "auto",       (opcional: mm o "auto" según la boquilla más fina)
+      "optimize_travel": true,             (opcional: reordena caminos para acortar los G0)
+      "arc_fitting": true,                 (opcional: G2/G3 en lugar de G1 en las curvas)
+      "arc_tolerance": 0.05,               (opcional: error máximo del ajuste de arcos, mm)
+      "transform": {"x": 100, "y": 100, "scale": 1.0, "rotation": 0},
+      "operations": [
+        {"name": "Contorno", "type": "line", "injector": 1, "nozzle": 2.0,
+         "color": "#000000", "entities": "all", "tolerance": "auto"},
+        {"name": "Relleno", "type": "fill", "injector": 2, "nozzle": 2.0,
+         "color": "#ff0000", "entities": [0, 3], "pattern": "zigzag", "angle": 45}
+      ]
+    }
+
+'transform' se aplica a todo el diseño alrededor del centro de su caja envolvente
+(igual que en el editor): escala, rotación en grados y posición final del centro.
+'entities' elige qué entidades del DXF (por orden de lectura) usa cada operación.
+'tolerance' (solo líneas, opcional) simplifica los bordes: mm o "auto" según la boquilla.
+'pattern' (solo rellenos, opcional): concentric (por defecto), raster, zigzag o hybrid
+(un perímetro + zigzag); 'angle' es el ángulo de las líneas en grados (45 por defecto).
+"""
+import argparse
+import json
+import math
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from core.dxf_processor import DXFReader, DEFAULT_FLATTENING_DISTANCE, flattening_distance_for_nozzle
+from core.gcode_generator import GCodeGenerator
+from core.raster_fill import FILL_PATTERNS
+from core.geometry import PolygonSet
+
+try:
+    import yaml
+    YAML_AVAILABLE = True
+except ImportError:
+    YAML_AVAILABLE = False
+
+
+class JobError(Exception):
+    """Error en el fichero de trabajo o en la conversión de un DXF."""
+    pass
+
+
+def load_job(filename):
+    """Lee el fichero de trabajo (JSON o YAML) y valida lo mínimo."""
+    with open(filename, encoding="utf-8") as f:
+        if filename.lower().endswith((".yaml", ".yml")):
+            if not YAML_AVAILABLE:
+                raise JobError("Para leer trabajos YAML hace falta PyYAML (pip install pyyaml).")
+            job = yaml.safe_load(f)
+        else:
+            job = json.load(f)
+
+    if not isinstance(job, dict) or not job.get("operations"):
+        raise JobError(f"{filename}: el trabajo debe definir una lista 'operations'.")
+    for i, op in enumerate(job["operations"]):
+        if op.get("type", "line") not in ("line", "fill"):
+            raise JobError(f"{filename}: operación {i + 1}: tipo '{op.get('type')}' no válido (line/fill).")
+        pattern = op.get("pattern", "concentric")
+        if pattern not in FILL_PATTERNS:
+            raise JobError(f"{filename}: operación {i + 1}: patrón '{pattern}' no válido "
+                           f"({'/'.join(FILL_PATTERNS)}).")
+        tolerance = op.get("tolerance")
+        if tolerance not in (None, "auto") and not isinstance(tolerance, (int, float)):
+            raise JobError(f"{filename}: operación {i + 1}: tolerancia '{tolerance}' no válida (mm o \"auto\").")
+    return job
+
+
+def transform_paths(paths, transform):
+    """
+    Aplica al diseño completo escala y rotación alrededor del centro de su caja
+    envolvente y lo lleva a la posición (x, y). Todo vectorizado sobre un único array.
+    """
+    if not transform or not paths:
+        return paths
+
+    merged = PolygonSet.from_paths(paths)
+    min_x, min_y, max_x, max_y = merged.bounds
+    cx, cy = (min_x + max_x) / 2, (min_y + max_y) / 2
+
+    scale = float(transform.get("scale", 1.0))
+    angle = math.radians(float(transform.get("rotation", 0.0)))
+    tx = float(transform.get("x", cx))
+    ty = float(transform.get("y", cy))
+
+    cos_a, sin_a = math.cos(angle), math.sin(angle)
+    matrix = scale * np.array([[cos_a, sin_a], [-sin_a, cos_a]])
+    coords = (merged.coords - (cx, cy)) @ matrix + (tx, ty)
+    moved = PolygonSet(coords, merged.offsets)
+    return list(moved)
+
+
+def select_entities(paths, selection):
+    if selection is None or selection == "all":
+        return paths
+    try:
+        return [paths[i] for i in selection]
+    except (IndexError, TypeError):
+        raise JobError(f"Selección de entidades no válida: {selection} (hay {len(paths)} entidades).")
+
+
+def job_flattening_distance(job):
+    """Calidad de curva del trabajo; en 'auto' manda la boquilla más fina."""
+    value = job.get("flattening_distance", DEFAULT_FLATTENING_DISTANCE)
+    if value == "auto":
+        finest = min(float(op.get("nozzle", 2.0)) for op in job["operations"])
+        return flattening_distance_for_nozzle(finest)
+    return float(value)
+
+
+def convert_file(dxf_path, job, output_path, parallel=False, reader_workers=None):
+    """
+    Convierte un DXF según el trabajo y escribe el G-Code en 'output_path'.
+    Devuelve (output_path, nº de líneas, segundos). Pensada para ejecutarse en otro proceso.
+    'reader_workers' son los procesos del aplanado (None = todos los núcleos); dentro
+    del pool de ficheros debe ser 1 para no lanzar un pool por cada proceso.
+    """
+    t0 = time.perf_counter()
+    raw = DXFReader(workers=reader_workers).read(dxf_path, job_flattening_distance(job))
+    if not raw:
+        raise JobError("DXF inválido o sin geometría.")
+
+    paths = transform_paths(raw, job.get("transform"))
+
+    generator = GCodeGenerator()
+    generator.design_name = job.get("design_name") or os.path.splitext(os.path.basename(dxf_path))[0]
+    for attr in ("z_safe", "z_print", "fill_overlap", "simplification_tolerance"):
+        if attr in job:
+            setattr(generator, attr, float(job[attr]))
+    generator.fill_holes = bool(job.get("fill_holes", True))
+    generator.optimize_travel = bool(job.get("optimize_travel", False))
+    generator.arc_fitting = bool(job.get("arc_fitting", False))
+    if "arc_tolerance" in job:
+        generator.arc_tolerance = float(job["arc_tolerance"])
+
+    for op in job["operations"]:
+        selected = select_entities(paths, op.get("entities", "all"))
+        generator.add_operation(
+            selected,
+            op.get("type", "line"),
+            op.get("injector", 1),
+            op.get("color", "#000000"),
+            op.get("name", ""),
+            op.get("nozzle", 2.0),
+            op.get("tolerance"),
+            op.get("pattern", "concentric"),
+            float(op.get("angle", 45.0)),
+        )
+
+    with open(output_path, "w", encoding="utf-8", newline="\n", buffering=1024 * 1024) as f:
+        n_lines = generator.write_to(f, parallel=parallel)
+    return output_path, n_lines, time.perf_counter() - t0
+
+
+def output_path_for(dxf_path, output_dir):
+    base = os.path.splitext(os.path.basename(dxf_path))[0] + ".gcode"
+    return os.path.join(output_dir or os.path.dirname(os.path.abspath(dxf_path)), base)
+
+
+def run(dxf_files, job, output_dir=None, workers=None):
+    """
+    Procesa todos los ficheros repartiéndolos entre procesos.
+    Devuelve la lista de (dxf, resultado o None, error o None) en el orden de entrada.
+    """
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+
+    workers = workers or os.cpu_count() or 1
+    results = {}
+
+    if workers == 1 or len(dxf_files) == 1:
+        # Un solo fichero: el paralelismo se usa dentro del generador
+        for dxf in dxf_files:
+            try:
+                results[dxf] = (convert_file(dxf, job, output_path_for(dxf, output_dir), parallel=workers > 1), None)
+            except Exception as e:
+                results[dxf] = (None, str(e))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            # Cada proceso convierte un fichero entero: sin pools anidados
+            futures = {executor.submit(convert_file, dxf, job, output_path_for(dxf, output_dir), False, 1): dxf
+                       for dxf in dxf_files}
+            for future in as_completed(futures):
+                dxf = futures[future]
+                try:
+                    results[dxf] = (future.result(), None)
+                except Exception as e:
+                    results[dxf] = (None, str(e))
+
+    return [(dxf,) + results[dxf] for dxf in dxf_files]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m core.cli",
+                                     description="Conversor por lotes DXF -> G-Code (sin interfaz gráfica).")
+    parser.add_argument("job", nargs="?", help="Fichero de trabajo JSON/YAML con las operaciones")
+    parser.add_argument("dxf", nargs="*", help="Ficheros DXF a convertir")
+    parser.add_argument("-o", "--output-dir", help="Carpeta de salida (por defecto, junto a cada DXF)")
+    parser.add_argument("-j", "--jobs", type=int, default=None,
+                        help="Procesos en paralelo (por defecto, todos los núcleos)")
+    parser.add_argument("--clear-cache", action="store_true",
+                        help="Vacía la caché en disco de DXF aplanados antes de convertir")
+    args = parser.parse_args(argv)
+
+    if args.clear_cache:
+        freed = DXFReader().clear_cache()
+        print(f"Caché de DXF vaciada ({freed / (1024 * 1024):.1f} MB)")
+        if args.job is None:
+            return 0
+    if args.job is None or not args.dxf:
+        parser.error("faltan el fichero de trabajo y al menos un DXF")
+
+    try:
+        job = load_job(args.job)
+    except (OSError, ValueError, JobError) as e:
+        print(f"Error en el trabajo: {e}", file=sys.stderr)
+        return 2
+
+    t0 = time.perf_counter()
+    results = run(args.dxf, job, args.output_dir, args.jobs)
+
+    failed = 0
+    for dxf, result, error in results:
+        if error:
+            failed += 1
+            print(f"[ERROR] {dxf}: {error}", file=sys.stderr)
+        else:
+            out, n_lines, seconds = result
+            print(f"[OK] {dxf} -> {out} ({n_lines} líneas, {seconds:.2f}s)")
+
+    print(f"{len(results) - failed}/{len(results)} ficheros convertidos en {time.perf_counter() - t0:.2f}s")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
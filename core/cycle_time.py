@@ -0,0 +1,89 @@
+"""
+core/cycle_time.py
+Estimación del tiempo de ejecución de un programa con un modelo de movimiento
+con aceleración (perfil trapezoidal) y desviación de esquina (junction
+deviation, como el planificador de Grbl/Marlin).
+Todo vectorizado sobre los segmentos: sin bucles en Python por movimiento.
+"""
+import numpy as np
+
+
+class MachineProfile:
+    """Límites de la máquina usados por el estimador (mm, mm/min, mm/s²)."""
+    def __init__(self, max_feed=5000.0, rapid_feed=3000.0, acceleration=500.0, junction_deviation=0.02):
+        self.max_feed = max_feed                  # tope para cualquier F programado
+        self.rapid_feed = rapid_feed              # velocidad de los G0
+        self.acceleration = acceleration
+        self.junction_deviation = junction_deviation
+
+
+def _junction_speed_sq(units, nominal_sq, acceleration, deviation):
+    """
+    Velocidad² máxima en cada vértice interior (entre el segmento k-1 y el k).
+    Fórmula de la desviación de esquina: v² = a·δ·sin(θ/2) / (1 - sin(θ/2)),
+    con θ el ángulo entre las dos direcciones; limitada por ambos segmentos.
+    """
+    cos_theta = -np.einsum("ij,ij->i", units[:-1], units[1:])
+    cos_theta = np.clip(cos_theta, -1.0, 1.0)
+    sin_half = np.sqrt((1.0 - cos_theta) * 0.5)
+    with np.errstate(divide="ignore"):
+        v_sq = np.where(sin_half < 1.0 - 1e-9,
+                        acceleration * deviation * sin_half / np.maximum(1.0 - sin_half, 1e-12),
+                        np.inf) # movimiento recto: sin límite por esquina
+    return np.minimum(v_sq, np.minimum(nominal_sq[:-1], nominal_sq[1:]))
+
+
+def segment_times(points, feeds, profile):
+    """
+    Tiempo (s) de cada segmento points[k] -> points[k+1] (puntos Nx3) a la
+    velocidad programada feeds[k] (mm/min).
+
+    Velocidad en los vértices: el mayor valor que respeta el límite de esquina
+    y la aceleración hacia delante y hacia atrás. Con S la longitud acumulada,
+    v²[k] = min_j (J[j] + 2a·|S[k] - S[j]|), que se separa en un mínimo
+    acumulado hacia delante y otro hacia atrás (np.minimum.accumulate).
+    El programa arranca y termina parado.
+    """
+    points = np.asarray(points, dtype=np.float64)
+    feeds = np.asarray(feeds, dtype=np.float64)
+    if len(points) < 2:
+        return np.zeros(0)
+
+    delta = np.diff(points, axis=0)
+    lengths = np.sqrt(np.einsum("ij,ij->i", delta, delta))
+    times = np.zeros(len(lengths))
+    moving = lengths > 1e-9
+    if not moving.any():
+        return times
+
+    # Los segmentos nulos no cuentan para el planificador
+    lengths_m = lengths[moving]
+    units = delta[moving] / lengths_m[:, None]
+    speed = np.minimum(feeds[moving], profile.max_feed) / 60.0
+    nominal_sq = speed * speed
+    accel = float(profile.acceleration)
+
+    # Límites por vértice: parado en los extremos, esquina en los interiores
+    limit_sq = np.empty(len(lengths_m) + 1)
+    limit_sq[0] = limit_sq[-1] = 0.0
+    limit_sq[1:-1] = _junction_speed_sq(units, nominal_sq, accel, profile.junction_deviation)
+
+    dist = np.concatenate(([0.0], np.cumsum(lengths_m)))
+    two_a = 2.0 * accel
+    # Hacia atrás: v²[k] <= J[j] + 2a(S[j] - S[k]) para j >= k
+    backward = np.minimum.accumulate((limit_sq + two_a * dist)[::-1])[::-1] - two_a * dist
+    # Hacia delante: v²[k] <= J[j] + 2a(S[k] - S[j]) para j <= k
+    forward = np.minimum.accumulate(limit_sq - two_a * dist) + two_a * dist
+    v_sq = np.maximum(np.minimum(np.minimum(limit_sq, backward), forward), 0.0)
+
+    v0_sq, v1_sq = v_sq[:-1], v_sq[1:]
+    v0, v1 = np.sqrt(v0_sq), np.sqrt(v1_sq)
+    # Velocidad pico si solo se acelera y frena (triángulo)
+    peak_sq = (two_a * lengths_m + v0_sq + v1_sq) * 0.5
+    cruise = peak_sq >= nominal_sq
+    peak = np.sqrt(np.where(cruise, nominal_sq, peak_sq))
+    ramp_time = (peak - v0) / accel + (peak - v1) / accel
+    ramp_dist = (2.0 * peak * peak - v0_sq - v1_sq) / two_a
+    cruise_time = np.where(cruise, np.maximum(lengths_m - ramp_dist, 0.0) / speed, 0.0)
+    times[moving] = ramp_time + cruise_time
+    return times
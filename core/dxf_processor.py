@@ -1,27 +1,314 @@
+import hashlib
+import multiprocessing
+import os
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 import ezdxf
 from ezdxf import path
+from ezdxf.addons import iterdxf
+from core.geometry import PolygonSet
+from core.instrumentation import span, timed
+
+# Cambiar si cambia la forma de aplanar: invalida la caché en disco
+READER_VERSION = 2
+
+# Tamaño máximo de la caché en disco: al guardar se borran las entradas usadas
+# hace más tiempo (fecha de modificación, que se renueva en cada acierto)
+CACHE_MAX_BYTES = 512 * 1024 * 1024
+CACHE_MAX_ENTRIES = 200
+
+# Calidad de curva (error máximo de cuerda, mm) por defecto
+DEFAULT_FLATTENING_DISTANCE = 0.1
+
+# Modo automático: una fracción de la boquilla, acotada
+NOZZLE_TOLERANCE_FACTOR = 0.05
+MIN_FLATTENING_DISTANCE = 0.02
+MAX_FLATTENING_DISTANCE = 0.25
+
+def flattening_distance_for_nozzle(nozzle_mm, factor=NOZZLE_TOLERANCE_FACTOR):
+    """
+    Tolerancia de aplanado adecuada para una boquilla: un error de cuerda del 5%
+    del ancho del cordón es invisible en la galleta. Una boquilla de 2mm da 0.1mm
+    (el valor histórico); las gruesas generan muchos menos vértices.
+    """
+    return min(MAX_FLATTENING_DISTANCE, max(MIN_FLATTENING_DISTANCE, float(nozzle_mm) * factor))
+
+class FlattenReport:
+    """Resumen de una lectura: entidades procesadas, omitidas por tipo y errores."""
+    def __init__(self):
+        self.entities = 0
+        self.paths = 0
+        self.from_cache = False
+        self.skipped = Counter()   # tipo DXF sin geometría de camino (TEXT, INSERT...)
+        self.empty = Counter()     # tipo DXF que quedó con menos de 2 vértices
+        self.errors = Counter()    # tipo DXF que falló al aplanar
+        self.last_error = {}       # tipo DXF -> último mensaje de error
+
+    def summary(self):
+        if self.from_cache:
+            return f"{self.paths} caminos (desde caché)"
+        parts = [f"{self.paths} caminos de {self.entities} entidades"]
+        if self.skipped:
+            parts.append("omitidas: " + ", ".join(f"{t} x{n}" for t, n in self.skipped.most_common()))
+        if self.empty:
+            parts.append("vacías: " + ", ".join(f"{t} x{n}" for t, n in self.empty.most_common()))
+        if self.errors:
+            parts.append("errores: " + ", ".join(f"{t} x{n}" for t, n in self.errors.most_common()))
+        return "; ".join(parts)
+
+@timed("dxf.flatten")
+def _flatten_batch(batch, distance):
+    """
+    Tarea de un proceso del pool: aplana un lote de [(tipo, ezdxf Path), ...].
+    Devuelve [(tipo, array Nx2 o None, error o None), ...] en el mismo orden.
+    """
+    out = []
+    for dxftype, p in batch:
+        try:
+            vertices = np.array(list(p.flattening(distance=distance)), dtype=np.float64)
+            out.append((dxftype, vertices[:, :2] if len(vertices) else vertices.reshape(0, 2), None))
+        except Exception as e:
+            out.append((dxftype, None, f"{type(e).__name__}: {e}"))
+    return out
+
+def default_cache_dir():
+    """Carpeta de caché: $GCODECOOKIES_CACHE o ~/.cache/gcodecookies/dxf."""
+    env = os.environ.get("GCODECOOKIES_CACHE")
+    if env:
+        return env
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "gcodecookies", "dxf")
 
 class DXFReader:
     """
     Clase simplificada: Solo lee el archivo y devuelve la lista de puntos.
     Ya no guarda estado ni transforma matrices, eso lo hará la GUI.
+    Cada camino es un array Nx2 float64.
+
+    Los vértices aplanados se guardan en una caché en disco direccionada por
+    contenido (hash del fichero + distancia de aplanado + versión del lector),
+    en formato .npy que se abre con memory-map: reabrir un diseño ya usado
+    no vuelve a aplanar ninguna curva. La caché se poda tras cada escritura
+    (LRU por fecha de modificación) para no pasar de cache_max_bytes ni de
+    cache_max_entries entradas.
+    Las entidades se leen en streaming y se aplanan en paralelo (iter_paths).
     """
-    def read(self, filename):
+    def __init__(self, cache_dir=None, use_cache=True, workers=None):
+        self.use_cache = use_cache
+        self.cache_dir = cache_dir or default_cache_dir()
+        self.cache_max_bytes = CACHE_MAX_BYTES
+        self.cache_max_entries = CACHE_MAX_ENTRIES
+
+        # Aplanado en paralelo: solo compensa arrancar procesos en ficheros grandes
+        self.workers = workers or os.cpu_count() or 1
+        self.parallel_min_bytes = 4 * 1024 * 1024
+        self.batch_size = 256
+
+    @timed("dxf.read")
+    def read(self, filename, distance=DEFAULT_FLATTENING_DISTANCE, report=None):
+        """Lee el fichero completo. Devuelve la lista de caminos o None si el DXF no es válido."""
         paths_found = []
         try:
-            doc = ezdxf.readfile(filename)
-            msp = doc.modelspace()
-            
-            for entity in msp:
+            for batch in self.iter_paths(filename, distance, report):
+                paths_found.extend(batch)
+        except (IOError, ezdxf.DXFStructureError):
+            return None
+        return paths_found
+
+    def iter_paths(self, filename, distance=DEFAULT_FLATTENING_DISTANCE, report=None):
+        """
+        Genera los caminos por lotes a medida que se aplanan (para ir mostrándolos
+        antes de terminar). Las entidades se leen en streaming y, en ficheros
+        grandes, se aplanan en un pool de procesos; el orden de salida es siempre
+        el del fichero. 'report' (FlattenReport) recoge lo omitido y los errores.
+        Lanza IOError / DXFStructureError si el fichero no se puede leer.
+        """
+        # 'distance' es la calidad de curva (ver flattening_distance_for_nozzle)
+        report = report if report is not None else FlattenReport()
+        key = None
+        if self.use_cache:
+            try:
+                key = self._cache_key(filename, distance)
+                with span("dxf.cache_load"):
+                    cached = self._load_cached(key)
+            except OSError:
+                key, cached = None, None
+            if cached is not None:
+                report.from_cache = True
+                report.paths = len(cached)
+                for i in range(0, len(cached), self.batch_size):
+                    yield [cached[j] for j in range(i, min(i + self.batch_size, len(cached)))]
+                return
+
+        paths_found = []
+        for batch in self._flatten_stream(filename, distance, report):
+            paths_found.extend(batch)
+            yield batch
+
+        if key is not None:
+            with span("dxf.cache_store"):
+                self._store_cached(key, PolygonSet.from_paths(paths_found))
+
+    def _iter_entities(self, filename):
+        """
+        Entidades del modelspace en streaming (iterdxf, sin cargar el documento);
+        si el fichero no admite streaming se recurre a ezdxf.readfile.
+        """
+        started = False
+        try:
+            for entity in iterdxf.modelspace(filename):
+                started = True
+                yield entity
+            return
+        except ezdxf.DXFStructureError:
+            if started:
+                raise
+        doc = ezdxf.readfile(filename)
+        yield from doc.modelspace()
+
+    def _flatten_stream(self, filename, distance, report):
+        use_pool = self.workers > 1 and os.path.getsize(filename) >= self.parallel_min_bytes
+        executor = None
+        if use_pool:
+            executor = ProcessPoolExecutor(max_workers=self.workers,
+                                           mp_context=multiprocessing.get_context("spawn"))
+        pending = deque()
+        batch = []
+        try:
+            for entity in self._iter_entities(filename):
+                report.entities += 1
+                dxftype = entity.dxftype()
                 try:
-                    p = path.make_path(entity)
-                    # distance=0.1 es la calidad de curva
-                    vertices = list(p.flattening(distance=0.1))
-                    if len(vertices) > 1:
-                        paths_found.append(vertices)
+                    with span("dxf.make_path"):
+                        p = path.make_path(entity)
                 except Exception:
+                    # Entidad sin geometría de camino (texto, bloques, cotas...)
+                    report.skipped[dxftype] += 1
                     continue
-            return paths_found
-            
-        except (IOError, ezdxf.DXFStructureError):
-            return None
\ No newline at end of file
+                batch.append((dxftype, p))
+                if len(batch) >= self.batch_size:
+                    if executor is None:
+                        yield self._collect(_flatten_batch(batch, distance), report)
+                    else:
+                        pending.append(executor.submit(_flatten_batch, batch, distance))
+                        # Contrapresión: como mucho 2 lotes por proceso en vuelo
+                        while len(pending) >= self.workers * 2:
+                            yield self._collect(pending.popleft().result(), report)
+                    batch = []
+
+            if batch:
+                if executor is None:
+                    yield self._collect(_flatten_batch(batch, distance), report)
+                else:
+                    pending.append(executor.submit(_flatten_batch, batch, distance))
+            while pending:
+                yield self._collect(pending.popleft().result(), report)
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=True, cancel_futures=True)
+
+    def _collect(self, results, report):
+        paths = []
+        for dxftype, vertices, error in results:
+            if error is not None:
+                report.errors[dxftype] += 1
+                report.last_error[dxftype] = error
+            elif len(vertices) > 1:
+                paths.append(vertices)
+            else:
+                report.empty[dxftype] += 1
+        report.paths += len(paths)
+        return paths
+
+    def clear_cache(self):
+        """Borra todos los ficheros de la caché en disco. Devuelve los bytes liberados."""
+        freed = 0
+        for _, size, files in self._cache_entries():
+            freed += self._remove_files(files, size)
+        return freed
+
+    # --- CACHÉ EN DISCO ---
+    def _cache_key(self, filename, distance):
+        h = hashlib.sha256()
+        with open(filename, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                h.update(block)
+        h.update(f"|{float(distance)!r}|{READER_VERSION}|{ezdxf.__version__}".encode())
+        return h.hexdigest()
+
+    def _cache_files(self, key):
+        base = os.path.join(self.cache_dir, key)
+        return base + ".coords.npy", base + ".offsets.npy"
+
+    def _load_cached(self, key):
+        coords_file, offsets_file = self._cache_files(key)
+        # 'offsets' se escribe el último: si existe, la entrada está completa
+        if not os.path.exists(offsets_file):
+            return None
+        try:
+            coords = np.load(coords_file, mmap_mode="r")
+            offsets = np.load(offsets_file)
+            # Usada ahora: la poda LRU la conserva
+            os.utime(offsets_file)
+        except (OSError, ValueError):
+            return None
+        return PolygonSet(coords, offsets)
+
+    def _store_cached(self, key, polygons):
+        coords_file, offsets_file = self._cache_files(key)
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # Escritura atómica: fichero temporal + os.replace
+            for target, data in ((coords_file, polygons.coords), (offsets_file, polygons.offsets)):
+                tmp = f"{target}.{os.getpid()}.tmp"
+                with open(tmp, "wb") as f:
+                    np.save(f, data)
+                os.replace(tmp, target)
+        except OSError:
+            return
+        self._prune_cache(keep=key)
+
+    def _cache_entries(self):
+        """[(fecha de último uso, bytes, [ficheros]), ...] de cada entrada de la caché."""
+        entries = {}
+        try:
+            names = os.listdir(self.cache_dir)
+        except OSError:
+            return []
+        for name in names:
+            if not name.endswith(".npy"):
+                continue
+            full = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(full)
+            except OSError:
+                continue
+            entry = entries.setdefault(name.split(".", 1)[0], [0.0, 0, []])
+            entry[0] = max(entry[0], stat.st_mtime)
+            entry[1] += stat.st_size
+            entry[2].append(full)
+        return [tuple(entry) for entry in entries.values()]
+
+    @staticmethod
+    def _remove_files(files, size):
+        try:
+            for full in files:
+                os.remove(full)
+        except OSError:
+            return 0 # abierta (memory-map en Windows) o ya borrada
+        return size
+
+    def _prune_cache(self, keep=None):
+        """Borra las entradas usadas hace más tiempo hasta respetar ambos límites."""
+        entries = self._cache_entries()
+        total = sum(size for _, size, _ in entries)
+        count = len(entries)
+        # Las más antiguas primero; la recién guardada nunca se borra
+        for mtime, size, files in sorted(entries, key=lambda e: e[0]):
+            if total <= self.cache_max_bytes and count <= self.cache_max_entries:
+                break
+            if keep is not None and os.path.basename(files[0]).startswith(keep):
+                continue
+            total -= self._remove_files(files, size)
+            count -= 1
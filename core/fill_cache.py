@@ -0,0 +1,103 @@
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+
+
+class FillCache:
+    """
+    Caché LRU acotada para los caminos de relleno calculados.
+    La clave combina la geometría del polígono con los parámetros que afectan
+    al resultado (boquilla, solapamiento y tolerancia de simplificación), de modo
+    que cambiar el nombre, color o inyector de una operación nunca recalcula el relleno.
+    """
+    # Coste aproximado en bytes: cada camino es un array Nx2 float64
+    BYTES_PER_POINT = 16
+    BYTES_PER_PATH = 112
+
+    def __init__(self, max_entries=None, max_bytes=64 * 1024 * 1024):
+        # El límite lo pone la memoria: un trabajo con miles de polígonos pequeños
+        # debe caber entero (las pasadas son secuenciales y un LRU corto nunca acertaría).
+        # max_entries (None = sin límite) solo es un tope adicional opcional.
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+
+        self._entries = OrderedDict()  # clave -> (paths, bytes)
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+
+        # Contadores para diagnóstico
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(coords, *params):
+        """Genera una clave compacta a partir de las coordenadas (array Nx2) y los parámetros."""
+        flat = np.ascontiguousarray(coords, dtype=np.float64)
+        digest = hashlib.blake2b(flat.tobytes(), digest_size=16).hexdigest()
+        return (digest, len(coords)) + tuple(float(p) for p in params)
+
+    def get(self, key):
+        """Devuelve los caminos guardados o None. Marca la entrada como usada recientemente."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def __contains__(self, key):
+        """Comprueba si hay una entrada sin contar acierto/fallo ni cambiar el orden LRU."""
+        with self._lock:
+            return key in self._entries
+
+    def record_misses(self, count=1):
+        """Cuenta como fallos los rellenos que se calcularon tras comprobarlos con 'in'."""
+        with self._lock:
+            self.misses += count
+
+    def put(self, key, paths):
+        size = self._estimate_size(paths)
+        with self._lock:
+            # Un resultado que por sí solo supera el límite no se guarda
+            if size > self.max_bytes:
+                return
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.current_bytes -= old[1]
+            self._entries[key] = (paths, size)
+            self.current_bytes += size
+            self._evict()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _evict(self):
+        # Expulsamos las entradas menos usadas hasta respetar ambos límites
+        while self._entries and ((self.max_entries is not None and len(self._entries) > self.max_entries)
+                                 or self.current_bytes > self.max_bytes):
+            _, (_, size) = self._entries.popitem(last=False)
+            self.current_bytes -= size
+            self.evictions += 1
+
+    def _estimate_size(self, paths):
+        n_points = sum(len(p) for p in paths)
+        return n_points * self.BYTES_PER_POINT + len(paths) * self.BYTES_PER_PATH
@@ -1,13 +1,190 @@
+import copy
 import json
-from PySide6.QtCore import QPointF
+import itertools
+import multiprocessing
+import os
+from collections import ChainMap
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+from core.arc_fit import arcs_to_polyline, format_arc_moves
+from core.cycle_time import MachineProfile, segment_times
+from core.fill_cache import FillCache
+from core.instrumentation import span, timed
+from core.geometry import (IDENTITY, PolygonSet, nest_polygons, split_affine, transform_paths,
+                           union_bounds)
+from core.path_order import order_paths, rapid_distance
+from core.path_utils import filter_min_distance, format_g1_lines, simplify_paths
+from core.raster_fill import FILL_PATTERNS, raster_fill
+from core.dxf_processor import flattening_distance_for_nozzle
 
 # Importamos Shapely
 try:
+    import shapely
     from shapely.geometry import Polygon, MultiPolygon
+    from shapely.ops import polylabel
     SHAPELY_AVAILABLE = True
 except ImportError:
     SHAPELY_AVAILABLE = False
 
+class GenerationCancelled(Exception):
+    """Se lanza desde el callback de progreso para abortar un cálculo en curso."""
+    pass
+
+# Un polígono que tras simplificar conserva más vértices que esto (contornos
+# enormes o con ruido) se retranquea de forma incremental: cada buffer directo
+# recorrería el contorno completo, mientras que los anillos sucesivos ya salen simplificados.
+DIRECT_OFFSET_MAX_VERTICES = 2000
+
+def _inradii(polys, tolerance):
+    """Radio del mayor círculo inscrito de cada polígono (0 si está vacío)."""
+    radii = np.zeros(len(polys))
+    valid = ~shapely.is_empty(polys)
+    if not valid.any():
+        return radii
+    if hasattr(shapely, "maximum_inscribed_circle"):
+        radii[valid] = shapely.length(shapely.maximum_inscribed_circle(polys[valid], tolerance))
+        return radii
+    # Shapely < 2.1: polo de inaccesibilidad de cada parte
+    for i in np.flatnonzero(valid):
+        parts = polys[i].geoms if isinstance(polys[i], MultiPolygon) else [polys[i]]
+        radii[i] = max(part.boundary.distance(polylabel(part, tolerance)) for part in parts)
+    return radii
+
+def _incremental_fill(poly, nozzle_mm, step, simplification_tolerance):
+    """Anillos retranqueando cada uno a partir del anterior ya simplificado."""
+    fill_paths = []
+    with span("fill.buffer"):
+        current_poly = poly.buffer(-nozzle_mm / 2)
+    while not current_poly.is_empty:
+        with span("fill.simplify"):
+            current_poly = current_poly.simplify(simplification_tolerance, preserve_topology=True)
+        geoms = list(current_poly.geoms) if isinstance(current_poly, MultiPolygon) else [current_poly]
+        for geom in geoms:
+            if not geom.is_empty:
+                fill_paths.append(np.asarray(geom.exterior.coords))
+                fill_paths.extend(np.asarray(ring.coords) for ring in geom.interiors)
+        with span("fill.buffer"):
+            current_poly = current_poly.buffer(-step)
+    return fill_paths
+
+def _ring_paths(geoms, owners, count):
+    """
+    Reparte los anillos (exterior y huecos, en orden) de 'geoms' entre 'count'
+    listas de caminos según 'owners'. Todo con las funciones vectorizadas de Shapely.
+    """
+    fills = [[] for _ in range(count)]
+    parts, index = shapely.get_parts(geoms, return_index=True)
+    keep = ~shapely.is_empty(parts)
+    parts, owners = parts[keep], owners[index[keep]]
+    if len(parts) == 0:
+        return fills
+
+    # Por cada parte: su exterior y después sus huecos
+    per_part = 1 + shapely.get_num_interior_rings(parts)
+    part = np.repeat(np.arange(len(parts)), per_part)
+    slot = np.arange(len(part)) - np.repeat(np.cumsum(per_part) - per_part, per_part)
+    rings = np.empty(len(part), dtype=object)
+    exterior = slot == 0
+    rings[exterior] = shapely.get_exterior_ring(parts)
+    rings[~exterior] = shapely.get_interior_ring(parts[part[~exterior]], slot[~exterior] - 1)
+
+    coords = shapely.get_coordinates(rings)
+    bounds = np.cumsum(shapely.get_num_coordinates(rings))[:-1]
+    for owner, ring in zip(owners[part], np.split(coords, bounds)):
+        fills[owner].append(ring)
+    return fills
+
+def concentric_fills(shapes, nozzle_mm, fill_overlap, simplification_tolerance):
+    """
+    Relleno concéntrico de varios polígonos a la vez: [(exterior Nx2, [huecos Nx2]), ...]
+    -> una lista de caminos por polígono.
+    Cada anillo k se calcula directamente desde el polígono original (simplificado
+    una sola vez) a distancia nozzle/2 + k*step, así que el error de simplificación
+    no se acumula de un anillo al siguiente. El nº de anillos se acota de antemano
+    con el radio inscrito y todos los buffers salen de una única llamada vectorizada.
+    """
+    fills = [[] for _ in shapes]
+    if not SHAPELY_AVAILABLE:
+        return fills
+    step = nozzle_mm * (1.0 - fill_overlap)
+
+    index = np.array([i for i, (coords, _) in enumerate(shapes) if len(coords) >= 3], dtype=np.int64)
+    if len(index) == 0:
+        return fills
+    polys = np.empty(len(index), dtype=object)
+    plain = np.array([not any(len(h) >= 3 for h in shapes[i][1]) for i in index], dtype=bool)
+    if plain.any():
+        # Sin huecos: todos los anillos en una sola llamada
+        rings = [np.asarray(shapes[i][0], dtype=np.float64)[:, :2] for i in index[plain]]
+        owners = np.repeat(np.arange(len(rings)), [len(r) for r in rings])
+        polys[plain] = shapely.polygons(shapely.linearrings(np.concatenate(rings), indices=owners))
+    for j in np.flatnonzero(~plain):
+        coords, holes = shapes[index[j]]
+        polys[j] = Polygon(coords, [h for h in holes if len(h) >= 3])
+    invalid = ~shapely.is_valid(polys)
+    if invalid.any():
+        polys[invalid] = shapely.buffer(polys[invalid], 0)
+
+    # El original se simplifica una sola vez: el error queda acotado por la tolerancia
+    # y los buffers trabajan con menos vértices
+    with span("fill.simplify"):
+        simple = shapely.simplify(polys, simplification_tolerance, preserve_topology=True)
+    direct = shapely.get_num_coordinates(simple) <= DIRECT_OFFSET_MAX_VERTICES
+    for j in np.flatnonzero(~direct):
+        fills[index[j]] = _incremental_fill(polys[j], nozzle_mm, step, simplification_tolerance)
+    index, polys = index[direct], simple[direct]
+
+    # Anillo k no vacío <=> nozzle/2 + k*step < radio inscrito (con margen por la tolerancia)
+    margin = step * 0.5
+    radii = _inradii(polys, margin)
+    counts = np.maximum(np.ceil((radii + margin - nozzle_mm / 2) / step), 0).astype(np.int64)
+    owner = np.repeat(np.arange(len(polys)), counts)
+    k = np.arange(len(owner)) - np.repeat(np.cumsum(counts) - counts, counts)
+    with span("fill.buffer"):
+        rings = shapely.buffer(polys[owner], -(nozzle_mm / 2 + k * step))
+    with span("fill.simplify"):
+        rings = shapely.simplify(rings, simplification_tolerance, preserve_topology=True)
+
+    for i, paths in zip(index, _ring_paths(rings, owner, len(polys))):
+        fills[i] = paths
+    return fills
+
+def concentric_fill(coords, nozzle_mm, fill_overlap, simplification_tolerance, holes=()):
+    """
+    Cálculo puro del relleno concéntrico a partir de coordenadas Nx2.
+    'holes' son los contornos interiores (Nx2) que no se rellenan: sus anillos
+    también se recorren, rodeando cada hueco.
+    Es una función de módulo (sin QPointF ni estado) para poder ejecutarla
+    en otros procesos. Ver concentric_fills().
+    """
+    return concentric_fills([(coords, holes)], nozzle_mm, fill_overlap, simplification_tolerance)[0]
+
+def compute_fill(coords, nozzle_mm, fill_overlap, simplification_tolerance, holes=(),
+                 pattern="concentric", angle=45.0):
+    """Relleno de un polígono con el patrón pedido (ver FILL_PATTERNS)."""
+    if pattern == "concentric":
+        return concentric_fill(coords, nozzle_mm, fill_overlap, simplification_tolerance, holes)
+    return raster_fill(coords, nozzle_mm, fill_overlap, angle,
+                       zigzag=pattern in ("zigzag", "hybrid"), perimeter=pattern == "hybrid", holes=holes)
+
+def _fill_batch(jobs):
+    """
+    Tarea de un proceso del pool: calcula un lote de rellenos [(coords, nozzle, overlap, tol, huecos, patrón, ángulo), ...].
+    Los concéntricos con los mismos parámetros se calculan juntos (concentric_fills).
+    """
+    results = [None] * len(jobs)
+    concentric = {}
+    for i, job in enumerate(jobs):
+        if job[5] == "concentric":
+            concentric.setdefault(job[1:4], []).append(i)
+        else:
+            results[i] = compute_fill(*job)
+    for params, indices in concentric.items():
+        shapes = [(jobs[i][0], jobs[i][4]) for i in indices]
+        for i, paths in zip(indices, concentric_fills(shapes, *params)):
+            results[i] = paths
+    return results
+
 class GCodeGenerator:
     def __init__(self):
         self.operations = []
@@ -22,18 +199,78 @@ class GCodeGenerator:
         # Solo para limpiar el "ruido" matemático que genera el buffer, sin alterar la forma.
         self.simplification_tolerance = 0.05
 
-    def add_operation(self, polygons, op_type, injector_id, color_hex, name, nozzle_size):
+        # Caché de rellenos compartida por la previsualización y el código final
+        self.fill_cache = FillCache()
+
+        # Respetar los huecos: los contornos interiores de una operación de relleno
+        # (regla par/impar) se restan del exterior en lugar de rellenarse
+        self.fill_holes = True
+
+        # Rellenos concéntricos pendientes que se calculan juntos (una llamada
+        # vectorizada a Shapely por lote); entre lotes se informa del progreso
+        self.fill_batch_size = 64
+
+        # Modo paralelo (multi-núcleo) para generate_full_code.
+        # Con pocos rellenos pendientes no compensa arrancar procesos.
+        self.max_workers = None # None = todos los núcleos
+        self.parallel_min_polygons = 8
+
+        # Identificadores estables para seguir cada operación aunque cambie su índice
+        self._op_ids = itertools.count(1)
+
+        # --- OPTIMIZACIÓN DE RECORRIDOS ---
+        # Reordenar los caminos de cada operación (y su punto de inicio) para
+        # acortar los G0. Desactivado por defecto: el programa sale en el orden original.
+        self.optimize_travel = False
+
+        # --- ESTIMACIÓN DE TIEMPO ---
+        # Límites de la máquina (avance máximo, G0, aceleración, desviación de esquina)
+        self.machine = MachineProfile()
+
+        # --- AJUSTE DE ARCOS ---
+        # Sustituir los tramos de G1 que caen sobre una circunferencia (error
+        # máximo arc_tolerance, en mm) por G2/G3. Desactivado por defecto.
+        self.arc_fitting = False
+        self.arc_tolerance = 0.05
+
+        # Vértices tras simplificar cada operación de línea, por (id, tolerancia,
+        # forma): la lista de la GUI los muestra sin repetir Douglas-Peucker.
+        # Se llena al simplificar; en la GUI, con el resultado de la previsualización.
+        self.line_stats = {}
+
+    def add_operation(self, polygons, op_type, injector_id, color_hex, name, nozzle_size, tolerance=None,
+                      pattern="concentric", angle=45.0, transform=None):
+        """
+        'polygons' es un PolygonSet o una lista de secuencias de (x, y), en las
+        coordenadas locales del diseño; 'transform' (m11, m12, m21, m22, dx, dy),
+        como un QTransform, las lleva a la máquina (None = ya están en la máquina).
+        'tolerance' simplifica los caminos de las operaciones de línea: mm,
+        'auto' (según la boquilla) o None para emitir los vértices tal cual.
+        'pattern' y 'angle' (grados) eligen el relleno: concentric, raster,
+        zigzag o hybrid (un perímetro + zigzag); el ángulo es el de las líneas,
+        relativo al diseño (gira con él).
+        Devuelve el id de la operación.
+        """
+        if not isinstance(polygons, PolygonSet):
+            polygons = PolygonSet.from_paths(polygons)
         op = {
+            "id": next(self._op_ids),
             "type": op_type, 
             "injector": int(injector_id),
             "color": color_hex,
             "polygons": polygons, 
             "name": name,
-            "nozzle": float(nozzle_size)
+            "nozzle": float(nozzle_size),
+            "tolerance": tolerance,
+            "pattern": pattern,
+            "angle": float(angle),
+            "transform": IDENTITY if transform is None else tuple(float(v) for v in transform)
         }
         self.operations.append(op)
+        return op['id']
 
-    def update_operation(self, index, op_type, injector_id, color_hex, name, nozzle_size):
+    def update_operation(self, index, op_type, injector_id, color_hex, name, nozzle_size, tolerance=None,
+                         pattern="concentric", angle=45.0):
         if 0 <= index < len(self.operations):
             op = self.operations[index]
             op['type'] = op_type
@@ -41,115 +278,401 @@ class GCodeGenerator:
             op['color'] = color_hex
             op['name'] = name
             op['nozzle'] = float(nozzle_size)
+            op['tolerance'] = tolerance
+            op['pattern'] = pattern
+            op['angle'] = float(angle)
+
+    def set_operation_transform(self, index, transform):
+        """
+        Mueve, gira o escala una operación sin tocar su geometría local.
+        Solo un cambio de escala obliga a recalcular el relleno (ver split_affine).
+        """
+        if 0 <= index < len(self.operations):
+            self.operations[index]['transform'] = tuple(float(v) for v in transform)
 
     def delete_operation(self, index):
         if 0 <= index < len(self.operations):
-            self.operations.pop(index)
+            op_id = self.operations.pop(index)['id']
+            for key in [k for k in self.line_stats if k[0] == op_id]:
+                del self.line_stats[key]
 
     def clear_operations(self):
         self.operations = []
+        self.line_stats.clear()
+
+    def snapshot(self):
+        """
+        Copia independiente para calcular en otro hilo: las operaciones se copian
+        (la GUI puede seguir editándolas) y la caché de rellenos se comparte.
+        """
+        clone = copy.copy(self)
+        clone.operations = [dict(op) for op in self.operations]
+        clone.machine = copy.copy(self.machine)
+        clone.line_stats = dict(self.line_stats)
+        return clone
+
+    def count_polygons(self, operations=None):
+        """Total de polígonos a procesar (unidad de progreso)."""
+        ops = self.operations if operations is None else operations
+        return sum(len(op['polygons']) for op in ops)
 
     def _calculate_center(self):
-        min_x, max_x = float('inf'), float('-inf')
-        min_y, max_y = float('inf'), float('-inf')
-        has_points = False
-        
-        for op in self.operations:
-            for poly in op['polygons']:
-                for p in poly:
-                    has_points = True
-                    if p.x() < min_x: min_x = p.x()
-                    if p.x() > max_x: max_x = p.x()
-                    if p.y() < min_y: min_y = p.y()
-                    if p.y() > max_y: max_y = p.y()
-        
-        if not has_points: return [0, 0]
+        bounds = union_bounds(op['polygons'].transformed(op['transform']) for op in self.operations)
+        if bounds is None: return [0, 0]
+        min_x, min_y, max_x, max_y = bounds
         return [round((min_x + max_x) / 2, 2), round((min_y + max_y) / 2, 2)]
 
-    def _generate_concentric_fill(self, qpoints_list, nozzle_mm):
+    def _fill_key(self, coords, nozzle_mm, holes=(), pattern="concentric", angle=45.0):
+        params = (nozzle_mm, self.fill_overlap, self.simplification_tolerance)
+        if pattern != "concentric":
+            # El concéntrico conserva la clave de siempre; el resto añade patrón y ángulo
+            params += (FILL_PATTERNS.index(pattern), angle)
+        if holes:
+            # Los huecos forman parte de la geometría: exterior + huecos y dónde empieza cada uno
+            params += (len(coords),) + tuple(len(h) for h in holes)
+            coords = np.concatenate([coords] + list(holes))
+        return FillCache.make_key(coords, *params)
+
+    @staticmethod
+    def operation_frame(op):
         """
-        Genera caminos de relleno.
-        La simplificación se aplica SOLO al resultado del buffer.
+        (polígonos con la escala aplicada, movimiento hasta la máquina).
+        Rellenos y simplificación se calculan con los primeros; el movimiento
+        (giro + traslación) solo se aplica a los caminos resultantes, así que
+        mover o girar un diseño reutiliza lo que haya en caché.
         """
-        if not SHAPELY_AVAILABLE:
-            return []
+        shape, motion = split_affine(op['transform'])
+        return op['polygons'].transformed(shape), motion
 
-        fill_paths = []
-        step = nozzle_mm * (1.0 - self.fill_overlap)
+    def fill_groups(self, op):
+        """
+        Polígonos a rellenar de una operación: [(exterior Nx2, [huecos Nx2]), ...],
+        con la escala ya aplicada (ver operation_frame).
+        Con fill_holes, los contornos se anidan por contención (nest_polygons);
+        si no, cada contorno se rellena por separado.
+        """
+        polygons = self.operation_frame(op)[0]
+        if not self.fill_holes:
+            return [(p, []) for p in polygons]
+        return [(polygons[shell], [polygons[h] for h in holes]) for shell, holes in nest_polygons(polygons)]
 
-        # 1. Conversión
-        coords = [(p.x(), p.y()) for p in qpoints_list]
-        if len(coords) < 3: return []
+    @staticmethod
+    def _group_size(polygons, groups):
+        """Contornos cubiertos por cada grupo (unidad de progreso); los que sobran van al último."""
+        sizes = [1 + len(holes) for _, holes in groups]
+        if sizes:
+            sizes[-1] += len(polygons) - sum(sizes)
+        return sizes
 
-        poly = Polygon(coords)
-        if not poly.is_valid:
-            poly = poly.buffer(0)
-        
-        # NOTA: Hemos quitado la simplificación aquí. 
-        # El polígono original se respeta al 100%.
+    @timed("fill.batch")
+    def _batch_concentric(self, groups, nozzle_mm, prefetched=None):
+        """
+        Calcula de una vez los rellenos concéntricos de 'groups' que no estén
+        calculados ni en caché. Devuelve {clave: caminos} (también quedan en caché).
+        """
+        pending = {}
+        for coords, holes in groups:
+            if len(coords) < 3: continue
+            key = self._fill_key(coords, nozzle_mm, holes)
+            if key in pending or (prefetched and key in prefetched): continue
+            if key in self.fill_cache: continue
+            pending[key] = (coords, holes)
+        if not pending:
+            return {}
+        self.fill_cache.record_misses(len(pending))
+        results = concentric_fills(list(pending.values()), nozzle_mm, self.fill_overlap,
+                                   self.simplification_tolerance)
+        computed = dict(zip(pending, results))
+        for key, paths in computed.items():
+            self.fill_cache.put(key, paths)
+        return computed
 
-        # 2. Erosión Inicial (Inset)
-        current_poly = poly.buffer(-nozzle_mm / 2)
+    def _iter_fills(self, op, prefetched=None):
+        """
+        Genera (caminos, contornos cubiertos) de cada grupo de una operación de relleno,
+        en orden. Los concéntricos se calculan por lotes de fill_batch_size.
+        """
+        groups = self.fill_groups(op)
+        sizes = self._group_size(op['polygons'], groups)
+        batch_size = max(1, self.fill_batch_size)
+        for start in range(0, len(groups), batch_size):
+            batch = groups[start:start + batch_size]
+            known = prefetched
+            if op['pattern'] == 'concentric' and SHAPELY_AVAILABLE:
+                known = ChainMap(self._batch_concentric(batch, op['nozzle'], prefetched), prefetched or {})
+            for (poly, holes), size in zip(batch, sizes[start:start + batch_size]):
+                yield self._generate_fill(poly, op['nozzle'], known, holes, op['pattern'], op['angle']), size
 
-        while not current_poly.is_empty:
-            # APLICAMOS SIMPLIFICACIÓN SOLO AL BUFFER
-            # Esto evita que las curvas offset tengan miles de micro-segmentos
-            current_poly = current_poly.simplify(self.simplification_tolerance, preserve_topology=True)
+    def _generate_concentric_fill(self, points, nozzle_mm, prefetched=None, holes=()):
+        """Relleno concéntrico (ver _generate_fill)."""
+        return self._generate_fill(points, nozzle_mm, prefetched, holes)
 
-            geoms = []
-            if isinstance(current_poly, MultiPolygon):
-                geoms = list(current_poly.geoms)
-            else:
-                geoms = [current_poly]
+    @timed("fill.compute")
+    def _generate_fill(self, points, nozzle_mm, prefetched=None, holes=(), pattern="concentric", angle=45.0):
+        """
+        Genera caminos de relleno con el patrón pedido.
+        Los concéntricos normalmente ya llegan calculados por lotes (_batch_concentric).
+        El resultado se guarda en caché: misma geometría y parámetros -> mismos caminos.
+        'prefetched' son resultados ya calculados en paralelo (clave -> caminos).
+        'holes' son los contornos interiores que se restan del polígono.
+        """
+        if not SHAPELY_AVAILABLE:
+            return []
 
-            for geom in geoms:
-                if not geom.is_empty:
-                    fill_paths.append(list(geom.exterior.coords))
+        # 1. Los puntos ya llegan como array Nx2
+        coords = points
+        if len(coords) < 3: return []
 
-            # Siguiente paso
-            current_poly = current_poly.buffer(-step)
-        
+        key = self._fill_key(coords, nozzle_mm, holes, pattern, angle)
+        if prefetched and key in prefetched:
+            return prefetched[key]
+        cached = self.fill_cache.get(key)
+        if cached is not None:
+            return cached
+
+        fill_paths = compute_fill(coords, nozzle_mm, self.fill_overlap, self.simplification_tolerance,
+                                  holes, pattern, angle)
+        self.fill_cache.put(key, fill_paths)
         return fill_paths
     
-    def get_all_preview_paths(self):
+    def line_tolerance(self, op):
+        """Tolerancia de simplificación (mm) de una operación de línea; 0 = sin simplificar."""
+        if op['type'] != 'line':
+            return 0.0
+        tolerance = op.get('tolerance')
+        if tolerance == 'auto':
+            return flattening_distance_for_nozzle(op['nozzle'])
+        return float(tolerance or 0.0)
+
+    def _line_stats_key(self, op):
+        return op['id'], self.line_tolerance(op), split_affine(op['transform'])[0]
+
+    def _line_paths(self, op):
+        """
+        Caminos de una operación de línea (con la escala aplicada), simplificados
+        si tiene tolerancia. Anota el recuento de vértices en line_stats.
+        """
+        polygons = self.operation_frame(op)[0]
+        tolerance = self.line_tolerance(op)
+        if tolerance > 0:
+            paths = simplify_paths(polygons, tolerance)
+            self.line_stats[self._line_stats_key(op)] = sum(len(p) for p in paths)
+            return paths
+        return list(polygons)
+
+    def simplification_stats(self, op):
+        """
+        (vértices originales, vértices tras simplificar) de una operación de línea.
+        No simplifica: si el resultado aún no está en line_stats (lo calcula la
+        previsualización o la generación), el segundo valor es None.
+        """
+        before = op['polygons'].n_points
+        if self.line_tolerance(op) <= 0:
+            return before, before
+        return before, self.line_stats.get(self._line_stats_key(op))
+
+    def preview_key(self, op):
+        """
+        Parámetros de la operación que afectan a su geometría calculada.
+        Si no cambian, la previsualización existente sigue siendo válida
+        (nombre, color o inyector no alteran los caminos).
+        El ajuste de arcos cambia lo que se dibuja en todas las operaciones.
+        De la transformación solo cuenta la escala: mover o girar el diseño
+        solo cambia preview_transform().
+        """
+        pattern = (op['pattern'], op['angle']) if op['type'] == 'fill' else None
+        shape = split_affine(op['transform'])[0]
+        return (op['type'], op['nozzle'], self.arc_fitting and self.arc_tolerance, self.line_tolerance(op), pattern,
+                shape)
+
+    @staticmethod
+    def preview_transform(op):
+        """Movimiento (m11, m12, m21, m22, dx, dy) que lleva la previsualización a la máquina."""
+        return split_affine(op['transform'])[1]
+
+    def get_operation_preview(self, op, progress=None, done=0, total=None):
+        """
+        Calcula la geometría de una sola operación.
+        Estructura: {'id': int, 'color': '#hex', 'paths': [[(x,y)...], ...], 'transform': (m11, ..., dy),
+                     'line_stats': (clave, vértices) o None}
+        'line_stats' es el recuento de una operación de línea simplificada, para
+        anotarlo en el line_stats del generador original (ver simplification_stats).
+        Los caminos quedan en el sistema del diseño (con la escala aplicada);
+        'transform' los lleva a la máquina (ver preview_transform).
+        'progress(hechos, total)' se llama tras cada polígono (puede lanzar GenerationCancelled).
+        """
+        op_type = op['type']
+        raw_polygons = op['polygons']
+
+        if total is None:
+            total = len(raw_polygons)
+
+        calculated_paths = []
+        line_stats = None
+
+        if op_type == 'fill':
+            for loops, size in self._iter_fills(op):
+                calculated_paths.extend(loops)
+                done += size
+                if progress: progress(done, total)
+        else:
+            # Si es borde, devolvemos el polígono original (simplificado si se pidió)
+            calculated_paths = self._line_paths(op)
+            key = self._line_stats_key(op)
+            if key in self.line_stats:
+                line_stats = (key, self.line_stats[key])
+            done += len(raw_polygons)
+            if progress: progress(done, total)
+
+        if self.arc_fitting:
+            # Se muestra lo que recorrerá la máquina: los arcos ajustados
+            calculated_paths = [arcs_to_polyline(filter_min_distance(p), self.arc_tolerance)
+                                for p in calculated_paths]
+
+        return {
+            'id': op['id'],
+            'color': op['color'],
+            'paths': calculated_paths,
+            'transform': self.preview_transform(op),
+            'line_stats': line_stats
+        }
+
+    @timed("preview.compute")
+    def get_all_preview_paths(self, operations=None, progress=None):
         """
         Devuelve una lista de diccionarios con la geometría CALCULADA para visualizar.
-        Estructura: [{'color': '#hex', 'paths': [[(x,y)...], ...]}, ...]
+        Estructura: [{'id': int, 'color': '#hex', 'paths': [[(x,y)...], ...], 'transform': ...}, ...]
+        (ver get_operation_preview).
+        'operations' permite calcular solo un subconjunto (por defecto, todas).
         """
+        ops = self.operations if operations is None else operations
+        total = self.count_polygons(ops)
+        done = 0
         previews = []
         
-        for op in self.operations:
-            op_type = op['type']
-            nozzle = op['nozzle']
-            raw_polygons = op['polygons']
-            color = op['color']
-            
-            calculated_paths = []
-
-            if op_type == 'fill':
-                if SHAPELY_AVAILABLE:
-                    for poly in raw_polygons:
-                        loops = self._generate_concentric_fill(poly, nozzle)
-                        calculated_paths.extend(loops)
-            else:
-                # Si es borde, devolvemos el polígono original convertido a tuplas
-                for poly in raw_polygons:
-                    calculated_paths.append([(p.x(), p.y()) for p in poly])
-            
-            if calculated_paths:
-                previews.append({
-                    'color': color,
-                    'paths': calculated_paths
-                })
+        for op in ops:
+            preview = self.get_operation_preview(op, progress, done, total)
+            done += len(op['polygons'])
+            if preview['paths']:
+                previews.append(preview)
                 
         return previews
 
-    def generate_full_code(self):
+    def _parallel_fills(self, progress=None):
+        """
+        Calcula en un ProcessPoolExecutor los rellenos que no están en caché.
+        La geometría viaja como arrays Nx2 de floats, nunca como objetos Qt.
+        Devuelve (clave -> caminos, nº de trabajos) para que el ensamblado posterior,
+        en el orden original, produzca exactamente el mismo programa que el modo serie.
+        """
+        jobs = {}
+        for op in self.operations:
+            if op['type'] != 'fill': continue
+            for coords, holes in self.fill_groups(op):
+                if len(coords) < 3: continue
+                key = self._fill_key(coords, op['nozzle'], holes, op['pattern'], op['angle'])
+                if key in jobs or key in self.fill_cache: continue
+                jobs[key] = (coords, op['nozzle'], self.fill_overlap, self.simplification_tolerance, holes,
+                             op['pattern'], op['angle'])
+
+        if len(jobs) < self.parallel_min_polygons:
+            return {}, 0
+
+        self.fill_cache.record_misses(len(jobs))
+        workers = self.max_workers or os.cpu_count() or 1
+        keys = list(jobs)
+        # Lotes pequeños para repartir bien la carga y poder informar del progreso
+        chunk = max(1, len(keys) // (workers * 4))
+        batches = [keys[i:i + chunk] for i in range(0, len(keys), chunk)]
+
+        results = {}
+        # 'spawn' evita heredar el estado de Qt de la GUI en los procesos hijos
+        executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        try:
+            futures = {executor.submit(_fill_batch, [jobs[k] for k in batch]): batch for batch in batches}
+            done = 0
+            for future in as_completed(futures):
+                batch = futures[future]
+                for key, paths in zip(batch, future.result()):
+                    results[key] = paths
+                    self.fill_cache.put(key, paths)
+                done += len(batch)
+                if progress: progress(done, len(keys))
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+        return results, len(keys)
+
+    @timed("gcode.generate")
+    def generate_full_code(self, progress=None, parallel=False):
+        """
+        Genera el programa completo como un único texto.
+        Une los trozos de _iter_gcode_chunks() (bloques de varias líneas, no línea
+        a línea); para programas grandes es preferible write_to().
+        """
+        return "\n".join(self._iter_gcode_chunks(progress, parallel))
+
+    @timed("gcode.generate")
+    def generate_with_report(self, progress=None, parallel=False):
+        """
+        (programa, travel_report(), estimate_cycle_time()) calculando los caminos
+        de las operaciones una sola vez: el programa, el informe y la estimación
+        salen de las mismas listas en lugar de repetir tres pasadas.
+        """
+        original = list(self._iter_operation_paths(progress, parallel, optimize=False))
+        optimized = self._ordered_operation_paths(original)
+        program = optimized if self.optimize_travel else original
+        code = "\n".join(self._iter_gcode_chunks(operation_paths=program))
+        # Los movimientos de cada orden se construyen una vez para el informe y la estimación
+        before, after = self._motion(original), self._motion(optimized)
+        report = {"before": self._program_stats(original, before), "after": self._program_stats(optimized, after)}
+        return code, report, self._cycle_time(program, after if self.optimize_travel else before)
+
+    @timed("gcode.write")
+    def write_to(self, file_obj, progress=None, parallel=False, buffer_lines=4096):
+        """
+        Escribe el programa en un fichero (o cualquier objeto con write()) en bloques
+        de al menos 'buffer_lines' líneas, sin construir nunca el texto completo en memoria.
+        El contenido es idéntico al de generate_full_code(). Devuelve el nº de líneas.
+        """
+        buffer = []
+        buffered = 0
+        count = 0
+        first = True
+        for chunk in self._iter_gcode_chunks(progress, parallel):
+            buffer.append(chunk)
+            buffered += chunk.count("\n") + 1
+            if buffered >= buffer_lines:
+                file_obj.write(("" if first else "\n") + "\n".join(buffer))
+                first = False
+                count += buffered
+                buffer.clear()
+                buffered = 0
+        if buffer:
+            file_obj.write(("" if first else "\n") + "\n".join(buffer))
+            count += buffered
+        return count
+
+    def iter_gcode_lines(self, progress=None, parallel=False):
+        """
+        Generador de las líneas del programa (sin salto de línea final).
+        'progress(hechos, total)' se llama tras cada polígono (puede lanzar GenerationCancelled).
+        Con parallel=True los rellenos se reparten entre varios procesos; la salida
+        es idéntica byte a byte a la del modo serie.
+        """
+        for chunk in self._iter_gcode_chunks(progress, parallel):
+            yield from chunk.split("\n")
+
+    def _iter_gcode_chunks(self, progress=None, parallel=False, operation_paths=None):
+        """
+        Produce el programa en trozos de texto (una o varias líneas unidas por '\n').
+        Los movimientos G1 de cada camino se formatean en bloque.
+        'operation_paths' ([(op, caminos), ...] ya calculados) evita recalcularlos.
+        """
         if not self.operations:
-            return "; No hay operaciones definidas."
+            yield "; No hay operaciones definidas."
+            return
 
-        gcode = []
-        
         # --- HEADER ---
         center = self._calculate_center()
         header = {
@@ -159,67 +682,216 @@ class GCodeGenerator:
             "center": center,
             "simplification": self.simplification_tolerance
         }
-        gcode.append(f"; JSON_HEADER: {json.dumps(header)}")
+        yield f"; JSON_HEADER: {json.dumps(header)}"
         
         # --- DEFINITIONS ---
-        gcode.append("; --- DEFINITIONS ---")
+        yield "; --- DEFINITIONS ---"
         for op in self.operations:
             op_name = op['name'] if op['name'] else f"{op['type'].upper()} {op['injector']}"
-            gcode.append(f'; DEFINE_INJECTOR ID={op["injector"]} COLOR="{op["color"]}" NAME="{op_name}" NOZZLE="{op["nozzle"]}mm"')
+            yield f'; DEFINE_INJECTOR ID={op["injector"]} COLOR="{op["color"]}" NAME="{op_name}" NOZZLE="{op["nozzle"]}mm"'
 
         # --- BODY ---
-        gcode.append("; --- BODY ---")
-        
-        for op in self.operations:
+        yield "; --- BODY ---"
+
+        if operation_paths is None:
+            operation_paths = self._iter_operation_paths(progress, parallel)
+        for op, paths_to_print in operation_paths:
             inj_id = op['injector']
             op_type = op['type']
-            nozzle = op['nozzle']
-            raw_polygons = op['polygons']
             
-            gcode.append(f"; --- OPERACION: {op['name']} ({op_type}) ---")
-            gcode.append(f"T{inj_id - 1}") 
-            gcode.append(f"G0 Z{self.z_safe:.3f}")
+            yield f"; --- OPERACION: {op['name']} ({op_type}) ---"
+            yield f"T{inj_id - 1}" 
+            yield f"G0 Z{self.z_safe:.3f}"
 
-            paths_to_print = []
-
-            if op_type == 'fill':
-                if SHAPELY_AVAILABLE:
-                    for poly_points in raw_polygons:
-                        fill_loops = self._generate_concentric_fill(poly_points, nozzle)
-                        paths_to_print.extend(fill_loops)
-            else:
-                # BORDES (LINE)
-                # Aquí NO usamos simplificación de Shapely para respetar el DXF original,
-                # a menos que el DXF venga muy sucio, pero por defecto lo dejamos puro.
-                for poly_points in raw_polygons:
-                    paths_to_print.append([(p.x(), p.y()) for p in poly_points])
-
-            feed_rate = 800.0 if op_type == 'line' else 1000.0
+            feed_rate = self._feed_rate(op)
             
             for path in paths_to_print:
-                if not path: continue
+                if len(path) == 0: continue
                 
                 # Filtro de seguridad mínimo (0.05mm) para evitar puntos duplicados exactos
-                clean_path = [path[0]]
-                for i in range(1, len(path)):
-                    prev = clean_path[-1]
-                    curr = path[i]
-                    dist_sq = (curr[0]-prev[0])**2 + (curr[1]-prev[1])**2
-                    # 0.05^2 = 0.0025
-                    if dist_sq > 0.0025: 
-                        clean_path.append(curr)
+                with span("gcode.filter"):
+                    clean_path = filter_min_distance(path)
                 
                 if len(clean_path) < 2: continue
 
                 start = clean_path[0]
-                gcode.append(f"G0 X{start[0]:.3f} Y{start[1]:.3f} Z{self.z_print:.3f}")
-                gcode.append(f"G1 Z-1.000 F250.0")
-                
-                for p in clean_path[1:]:
-                    gcode.append(f"G1 X{p[0]:.3f} Y{p[1]:.3f} F{feed_rate:.1f}")
-                
-                gcode.append(f"G0 Z{self.z_safe:.3f}")
+                yield f"G0 X{start[0]:.3f} Y{start[1]:.3f} Z{self.z_print:.3f}"
+                yield f"G1 Z-1.000 F250.0"
+                with span("gcode.format"):
+                    if self.arc_fitting:
+                        moves = format_arc_moves(clean_path, feed_rate, self.arc_tolerance)
+                    else:
+                        moves = format_g1_lines(clean_path[1:], feed_rate)
+                yield moves
+                yield f"G0 Z{self.z_safe:.3f}"
 
-        gcode.append("M30 ; Fin")
-        
-        return "\n".join(gcode)
\ No newline at end of file
+        yield "M30 ; Fin"
+
+    @staticmethod
+    def _feed_rate(op):
+        return 800.0 if op['type'] == 'line' else 1000.0
+
+    def _iter_operation_paths(self, progress=None, parallel=False, optimize=None):
+        """
+        Genera (operación, caminos a imprimir) en el orden del programa.
+        Con optimize (por defecto self.optimize_travel) los caminos de cada operación
+        se reordenan empezando donde terminó la anterior.
+        """
+        optimize = self.optimize_travel if optimize is None else optimize
+        prefetched, done = {}, 0
+        total = self.count_polygons()
+        if parallel and SHAPELY_AVAILABLE:
+            fill_progress = None
+            if progress:
+                fill_progress = lambda n, jobs: progress(n, jobs + total)
+            prefetched, done = self._parallel_fills(fill_progress)
+            total += done
+
+        position = None
+        for op in self.operations:
+            paths_to_print = []
+
+            if op['type'] == 'fill':
+                for fill_loops, size in self._iter_fills(op, prefetched):
+                    paths_to_print.extend(fill_loops)
+                    done += size
+                    if progress: progress(done, total)
+            else:
+                # BORDES (LINE)
+                # Aquí NO usamos simplificación de Shapely para respetar el DXF original.
+                # Solo si la operación tiene tolerancia (DXF sucios o trazados) se aplica
+                # Douglas-Peucker vectorizado, con error acotado por esa tolerancia.
+                paths_to_print = self._line_paths(op)
+                done += len(op['polygons'])
+                if progress: progress(done, total)
+
+            # Giro y traslación del diseño: una sola multiplicación por operación
+            paths_to_print = transform_paths(paths_to_print, self.preview_transform(op))
+
+            if optimize:
+                with span("gcode.order_paths"):
+                    paths_to_print = order_paths(paths_to_print, position)
+            if paths_to_print:
+                position = paths_to_print[-1][-1]
+            yield op, paths_to_print
+
+    def _motion(self, operation_paths):
+        """
+        Movimientos del programa como polilínea 3D, igual que los emite
+        _iter_gcode_chunks: (puntos Nx3, avance de cada segmento en mm/min,
+        índice de la operación de cada segmento). Los arcos ajustados se
+        cuentan por sus cuerdas (mismo recorrido a efectos de tiempo).
+        """
+        rapid = self.machine.rapid_feed
+        blocks, arrival_feeds, arrival_ops = [], [], []
+        position = None
+        for k, (op, paths) in enumerate(operation_paths):
+            feed = self._feed_rate(op)
+            paths = [c for c in (filter_min_distance(p) for p in paths if len(p)) if len(c) >= 2]
+            if not paths:
+                continue
+            # G0 Z de seguridad al empezar la operación
+            if position is None:
+                position = paths[0][0]
+            blocks.append(np.array([[position[0], position[1], self.z_safe]]))
+            arrival_feeds.append(np.array([rapid]))
+            arrival_ops.append(np.array([k]))
+            for path in paths:
+                n = len(path)
+                # G0 a z_print, G1 Z-1 (F250), G1 del camino a Z-1, G0 a z_safe
+                block = np.empty((n + 2, 3))
+                block[0, :2] = path[0]
+                block[0, 2] = self.z_print
+                block[1:n + 1, :2] = path
+                block[1:n + 1, 2] = -1.0
+                block[n + 1, :2] = path[-1]
+                block[n + 1, 2] = self.z_safe
+                feeds = np.full(n + 2, feed)
+                feeds[0] = feeds[-1] = rapid
+                feeds[1] = 250.0
+                blocks.append(block)
+                arrival_feeds.append(feeds)
+                arrival_ops.append(np.full(n + 2, k))
+            position = paths[-1][-1]
+
+        if not blocks:
+            return np.zeros((0, 3)), np.zeros(0), np.zeros(0, dtype=np.int64)
+        # El primer punto es la posición inicial: los segmentos llegan a los demás
+        return (np.concatenate(blocks), np.concatenate(arrival_feeds)[1:],
+                np.concatenate(arrival_ops)[1:])
+
+    def _program_stats(self, operation_paths, motion=None):
+        """
+        Recorrido y tiempo estimado de un programa dado como [(op, caminos), ...].
+        El tiempo sale del modelo con aceleración de core.cycle_time.
+        'motion' es _motion(operation_paths) si ya se calculó.
+        """
+        rapid_mm = 0.0
+        print_mm = 0.0
+        n_paths = 0
+        position = None
+        for op, paths in operation_paths:
+            paths = [p for p in paths if len(p) >= 2]
+            rapid_mm += rapid_distance(paths, position)
+            if paths:
+                position = paths[-1][-1]
+            print_mm += sum(float(np.hypot(*np.diff(p, axis=0).T).sum()) for p in paths)
+            n_paths += len(paths)
+
+        points, feeds, _ = motion if motion is not None else self._motion(operation_paths)
+        return {
+            "paths": n_paths,
+            "rapid_mm": rapid_mm,
+            "print_mm": print_mm,
+            "time_s": float(segment_times(points, feeds, self.machine).sum()),
+        }
+
+    @timed("gcode.cycle_time")
+    def estimate_cycle_time(self, progress=None, parallel=False):
+        """
+        Tiempo de ejecución estimado del programa tal como se generaría ahora
+        (orden, optimización de recorridos incluida), con aceleración y
+        desviación de esquina según self.machine.
+        Devuelve {'total_s': s, 'operations': {id de operación: s}}.
+        Los rellenos salen de la caché si ya se calcularon.
+        """
+        return self._cycle_time(list(self._iter_operation_paths(progress, parallel)))
+
+    def _cycle_time(self, operation_paths, motion=None):
+        """
+        Estimación de estimate_cycle_time() para un programa dado como [(op, caminos), ...].
+        'motion' es _motion(operation_paths) si ya se calculó.
+        """
+        points, feeds, owners = motion if motion is not None else self._motion(operation_paths)
+        times = segment_times(points, feeds, self.machine)
+        per_op = np.bincount(owners, weights=times, minlength=len(operation_paths))
+        return {
+            "total_s": float(times.sum()),
+            "operations": {op['id']: float(t) for (op, _), t in zip(operation_paths, per_op)},
+        }
+
+    def travel_report(self, progress=None, parallel=False):
+        """
+        Compara el programa en el orden original y con los recorridos optimizados:
+        {'before': {...}, 'after': {...}} con nº de caminos, mm en vacío (G0 XY),
+        mm impresos y tiempo estimado en segundos. Los rellenos salen de la caché.
+        """
+        original = list(self._iter_operation_paths(progress, parallel, optimize=False))
+        optimized = self._ordered_operation_paths(original)
+        return {"before": self._program_stats(original), "after": self._program_stats(optimized)}
+
+    @staticmethod
+    def _ordered_operation_paths(operation_paths):
+        """
+        Los mismos caminos con los recorridos optimizados: cada operación se
+        reordena empezando donde terminó la anterior (como optimize_travel).
+        """
+        optimized = []
+        position = None
+        for op, paths in operation_paths:
+            with span("gcode.order_paths"):
+                paths = order_paths(paths, position)
+            if paths:
+                position = paths[-1][-1]
+            optimized.append((op, paths))
+        return optimized
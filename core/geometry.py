@@ -0,0 +1,185 @@
+"""
+core/geometry.py
+Almacenamiento compacto de geometría para las operaciones: todas las polilíneas
+en un único buffer contiguo float64 (N x 2) más los offsets de cada subcamino.
+16 bytes por punto y sin dependencias de Qt.
+También las transformaciones afines de las operaciones (geometría local + transformación).
+"""
+import math
+import numpy as np
+
+try:
+    import shapely
+    from shapely.strtree import STRtree
+    SHAPELY_AVAILABLE = True
+except ImportError:
+    SHAPELY_AVAILABLE = False
+
+
+class PolygonSet:
+    """
+    Conjunto inmutable de polilíneas.
+    El subcamino i ocupa coords[offsets[i]:offsets[i+1]].
+    Caja envolvente y centroide se calculan una sola vez y quedan en caché.
+    """
+    __slots__ = ("coords", "offsets", "_bounds", "_centroid")
+
+    def __init__(self, coords, offsets):
+        self.coords = np.ascontiguousarray(coords, dtype=np.float64).reshape(-1, 2)
+        self.offsets = np.ascontiguousarray(offsets, dtype=np.int64)
+        self._bounds = None
+        self._centroid = None
+
+    @classmethod
+    def from_paths(cls, paths):
+        """Construye el conjunto a partir de una lista de secuencias de (x, y)."""
+        arrays = [np.asarray(p, dtype=np.float64).reshape(-1, 2) for p in paths]
+        offsets = np.zeros(len(arrays) + 1, dtype=np.int64)
+        if arrays:
+            offsets[1:] = np.cumsum([len(a) for a in arrays])
+            coords = np.concatenate(arrays) if offsets[-1] else np.empty((0, 2))
+        else:
+            coords = np.empty((0, 2))
+        return cls(coords, offsets)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return self.coords[self.offsets[index]:self.offsets[index + 1]]
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.coords[self.offsets[i]:self.offsets[i + 1]]
+
+    def transformed(self, transform):
+        """Copia con la transformación afín aplicada (el mismo conjunto si es la identidad)."""
+        if is_identity(transform):
+            return self
+        return PolygonSet(apply_affine(self.coords, transform), self.offsets)
+
+    @property
+    def n_points(self):
+        return len(self.coords)
+
+    @property
+    def nbytes(self):
+        return self.coords.nbytes + self.offsets.nbytes
+
+    @property
+    def bounds(self):
+        """(min_x, min_y, max_x, max_y) o None si no hay puntos."""
+        if self._bounds is None and len(self.coords):
+            mins = self.coords.min(axis=0)
+            maxs = self.coords.max(axis=0)
+            self._bounds = (float(mins[0]), float(mins[1]), float(maxs[0]), float(maxs[1]))
+        return self._bounds
+
+    @property
+    def centroid(self):
+        """Centroide de los vértices (x, y) o None si no hay puntos."""
+        if self._centroid is None and len(self.coords):
+            c = self.coords.mean(axis=0)
+            self._centroid = (float(c[0]), float(c[1]))
+        return self._centroid
+
+
+def union_bounds(polygon_sets):
+    """Caja envolvente común de varios PolygonSet (None si todos están vacíos)."""
+    boxes = [ps.bounds for ps in polygon_sets if ps.bounds is not None]
+    if not boxes:
+        return None
+    arr = np.array(boxes)
+    return (float(arr[:, 0].min()), float(arr[:, 1].min()),
+            float(arr[:, 2].max()), float(arr[:, 3].max()))
+
+
+# Transformación afín como tupla (m11, m12, m21, m22, dx, dy), el convenio de QTransform:
+#   x' = m11*x + m21*y + dx,   y' = m12*x + m22*y + dy
+IDENTITY = (1.0, 0.0, 0.0, 1.0, 0.0, 0.0)
+
+
+def is_identity(transform):
+    return transform is None or tuple(transform) == IDENTITY
+
+
+def apply_affine(coords, transform):
+    """Aplica la transformación a un array Nx2 (con la identidad devuelve el mismo array)."""
+    if is_identity(transform):
+        return coords
+    m11, m12, m21, m22, dx, dy = transform
+    return np.asarray(coords, dtype=np.float64) @ np.array([[m11, m12], [m21, m22]]) + (dx, dy)
+
+
+def transform_paths(paths, transform):
+    """Transforma una lista de caminos Nx2 con una sola multiplicación de matrices."""
+    paths = list(paths)
+    if is_identity(transform) or not paths:
+        return paths
+    coords = apply_affine(np.concatenate([np.asarray(p, dtype=np.float64).reshape(-1, 2) for p in paths]), transform)
+    return np.split(coords, np.cumsum([len(p) for p in paths])[:-1])
+
+
+def split_affine(transform):
+    """
+    Separa una transformación en (forma, movimiento), con transform = movimiento tras forma.
+    'forma' es lo que altera distancias (la escala) y 'movimiento' el giro (o simetría)
+    más la traslación: un relleno calculado con 'forma' vale para cualquier 'movimiento'.
+    Si la parte lineal es una semejanza (giro + escala uniforme, lo que hace el canvas)
+    forma = s·I, con s redondeado para que girar no cambie la clave de la caché;
+    si no (escala no uniforme, cizalla), toda la parte lineal es 'forma'.
+    """
+    if is_identity(transform):
+        return IDENTITY, IDENTITY
+    m11, m12, m21, m22, dx, dy = (float(v) for v in transform)
+    norm = m11 * m11 + m12 * m12
+    similar = (norm > 0 and math.isclose(m21 * m21 + m22 * m22, norm, rel_tol=1e-9)
+               and abs(m11 * m21 + m12 * m22) <= 1e-9 * norm)
+    if not similar:
+        return (m11, m12, m21, m22, 0.0, 0.0), (1.0, 0.0, 0.0, 1.0, dx, dy)
+    s = round(math.sqrt(norm), 9)
+    return (s, 0.0, 0.0, s, 0.0, 0.0), (m11 / s, m12 / s, m21 / s, m22 / s, dx, dy)
+
+
+def nest_polygons(polygons):
+    """
+    Agrupa contornos cerrados en polígonos con huecos siguiendo la regla par/impar:
+    un contorno dentro de un número impar de otros es un hueco del que lo contiene
+    más de cerca; dentro de un número par (una isla dentro de un hueco) es otro exterior.
+    La contención se resuelve con un STRtree (O(n log n)): se busca en qué contornos
+    cae el primer vértice de cada uno (los contornos de un diseño no se cruzan).
+    Devuelve [(índice del exterior, [índices de sus huecos]), ...] en el orden de los
+    exteriores. Los caminos de menos de 3 puntos se ignoran.
+    """
+    valid = [i for i, p in enumerate(polygons) if len(p) >= 3]
+    if len(valid) < 2 or not SHAPELY_AVAILABLE:
+        return [(i, []) for i in valid]
+
+    rings = [np.asarray(polygons[i], dtype=np.float64) for i in valid]
+    geoms = np.array([shapely.Polygon(r) for r in rings], dtype=object)
+    areas = shapely.area(geoms)
+    tree = STRtree(geoms)
+    inner, outer = tree.query(shapely.points([r[0] for r in rings]), predicate="within")
+    # Un contenedor es siempre mayor (descarta contornos degenerados o que se tocan)
+    keep = (inner != outer) & (areas[outer] > areas[inner])
+    inner, outer = inner[keep], outer[keep]
+
+    depth = np.bincount(inner, minlength=len(rings))
+    # El contenedor más cercano es el de menor área
+    order = np.lexsort((areas[outer], inner))
+    inner, outer = inner[order], outer[order]
+    first = np.ones(len(inner), dtype=bool)
+    first[1:] = inner[1:] != inner[:-1]
+    parent = np.full(len(rings), -1)
+    parent[inner[first]] = outer[first]
+
+    holes = {k: [] for k in range(len(rings)) if depth[k] % 2 == 0}
+    for k in np.flatnonzero(depth % 2 == 1):
+        p = int(parent[k])
+        if p in holes:
+            holes[p].append(valid[k])
+    return [(valid[k], holes[k]) for k in sorted(holes)]
@@ -0,0 +1,202 @@
+"""
+core/instrumentation.py
+Medición por etapas (spans) para saber dónde se va el tiempo de un trabajo:
+lectura del DXF, aplanado, buffers de Shapely, filtro de puntos, formateo del
+texto, creación de ítems de la escena...
+
+    with span("fill.buffer"):
+        ...
+
+    @timed("dxf.read")
+    def read(...): ...
+
+Desactivado (lo normal) cada span es un contexto vacío compartido y @timed solo
+comprueba un booleano: el coste es despreciable. Activado, se acumulan por
+nombre: nº de llamadas, tiempo total, p50/p95/máximo y, si se pidió memoria,
+el pico de asignaciones (tracemalloc) de cada llamada.
+Los datos son globales al proceso (los hijos del pool de rellenos no cuentan).
+tracemalloc tiene un único pico para todo el proceso: la memoria solo se mide
+en los spans del hilo que activó la medición (los de otros hilos, como los
+del QThreadPool, la dejan en blanco), y aun así es el pico del PROCESO
+mientras el span está abierto, asignaciones de otros hilos incluidas.
+"""
+import contextlib
+import functools
+import json
+import threading
+import time
+import tracemalloc
+
+import numpy as np
+
+# Muestras de duración guardadas por span para los percentiles (las demás solo suman)
+MAX_SAMPLES = 100_000
+
+_enabled = False
+_track_memory = False
+_memory_thread = None
+_lock = threading.Lock()
+_stats = {}
+_local = threading.local()
+_NULL = contextlib.nullcontext()
+
+
+class _SpanStats:
+    __slots__ = ("count", "total", "max", "samples", "peak_bytes")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples = []
+        self.peak_bytes = None # None = ninguna llamada midió memoria
+
+    def add(self, seconds, peak_bytes):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        if len(self.samples) < MAX_SAMPLES:
+            self.samples.append(seconds)
+        if peak_bytes is not None:
+            self.peak_bytes = max(self.peak_bytes or 0, peak_bytes)
+
+
+class _Span:
+    """
+    Span activo. Con memoria, el pico se mide desde la entrada: se reinicia el
+    pico de tracemalloc y, al salir, se propaga al span padre (si no, el padre
+    perdería el pico alcanzado dentro del hijo). Solo en el hilo que activó la
+    medición: reiniciar el pico desde otro hilo borraría el del span abierto.
+    """
+    __slots__ = ("name", "start", "memory", "base", "child_peak")
+
+    def __init__(self, name):
+        self.name = name
+        self.memory = False
+        self.base = 0
+        self.child_peak = 0
+
+    def __enter__(self):
+        self.memory = _track_memory and threading.get_ident() == _memory_thread
+        if self.memory:
+            stack = getattr(_local, "stack", None)
+            if stack is None:
+                stack = _local.stack = []
+            if stack:
+                # El pico acumulado hasta aquí pertenece al padre
+                stack[-1].child_peak = max(stack[-1].child_peak, tracemalloc.get_traced_memory()[1])
+            stack.append(self)
+            self.base = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self.start
+        peak = None
+        if self.memory and tracemalloc.is_tracing():
+            absolute = max(tracemalloc.get_traced_memory()[1], self.child_peak)
+            peak = max(absolute - self.base, 0)
+            stack = _local.stack
+            if stack and stack[-1] is self:
+                stack.pop()
+            if stack:
+                stack[-1].child_peak = max(stack[-1].child_peak, absolute)
+        with _lock:
+            stats = _stats.get(self.name)
+            if stats is None:
+                stats = _stats[self.name] = _SpanStats()
+            stats.add(seconds, peak)
+        return False
+
+
+def span(name):
+    """Contexto que mide el bloque con el nombre dado (vacío si está desactivado)."""
+    if not _enabled:
+        return _NULL
+    return _Span(name)
+
+
+def timed(name):
+    """Decorador: mide cada llamada a la función como un span."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            with _Span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def enable(memory=False):
+    """
+    Activa la medición; con memory=True también el pico de asignaciones (más lento),
+    medido en los spans de este hilo (ver la cabecera del módulo).
+    """
+    global _enabled, _track_memory, _memory_thread
+    _track_memory = bool(memory)
+    _memory_thread = threading.get_ident()
+    if _track_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    _enabled = True
+
+
+def disable():
+    global _enabled, _track_memory
+    _enabled = False
+    if _track_memory and tracemalloc.is_tracing():
+        tracemalloc.stop()
+    _track_memory = False
+
+
+def is_enabled():
+    return _enabled
+
+
+def memory_tracking():
+    return _track_memory
+
+
+def reset():
+    """Borra lo acumulado (p. ej. al empezar un trabajo nuevo)."""
+    with _lock:
+        _stats.clear()
+
+
+def report():
+    """
+    Resumen por span, ordenado por tiempo total:
+    {nombre: {'count', 'total_s', 'mean_s', 'p50_s', 'p95_s', 'max_s', 'peak_mb'}}.
+    'peak_mb' es el pico del proceso con el span abierto, o None si el span no
+    midió memoria (medición sin memoria o span de otro hilo).
+    """
+    with _lock:
+        items = [(name, s.count, s.total, s.max, np.array(s.samples), s.peak_bytes)
+                 for name, s in _stats.items()]
+    out = {}
+    for name, count, total, max_s, samples, peak in sorted(items, key=lambda item: -item[2]):
+        p50, p95 = np.percentile(samples, (50, 95)) if len(samples) else (0.0, 0.0)
+        out[name] = {
+            "count": count,
+            "total_s": total,
+            "mean_s": total / count if count else 0.0,
+            "p50_s": float(p50),
+            "p95_s": float(p95),
+            "max_s": max_s,
+            "peak_mb": None if peak is None else peak / (1024 * 1024),
+        }
+    return out
+
+
+def dump_json(filename):
+    """Escribe el resumen en un fichero JSON."""
+    data = {
+        "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "memory": _track_memory,
+        "memory_scope": "pico del proceso con el span abierto; solo spans del hilo que activó la medición",
+        "spans": report(),
+    }
+    with open(filename, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
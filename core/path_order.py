@@ -0,0 +1,226 @@
+"""
+core/path_order.py
+Optimización de los desplazamientos en vacío (G0) entre caminos:
+- orden por vecino más cercano con un índice espacial en rejilla,
+- mejora 2-opt en ventana sobre ese orden,
+- costura: los caminos cerrados empiezan en el vértice más cercano al final del anterior.
+Los caminos son arrays Nx2; uno es cerrado si su primer y último punto coinciden.
+"""
+import math
+import numpy as np
+
+# Tramo de la secuencia que se prueba a invertir en cada paso de 2-opt
+TWO_OPT_WINDOW = 32
+TWO_OPT_MAX_PASSES = 8
+
+def is_closed(path, tol=1e-9):
+    return len(path) > 2 and abs(path[0, 0] - path[-1, 0]) <= tol and abs(path[0, 1] - path[-1, 1]) <= tol
+
+def rotate_closed(path, k):
+    """El mismo lazo cerrado empezando (y terminando) en el vértice k."""
+    if k == 0:
+        return path
+    return np.concatenate((path[k:-1], path[:k + 1]))
+
+def nearest_vertex(path, point):
+    """Índice del vértice de 'path' más cercano a 'point'."""
+    d = path[:, 0] - point[0]
+    e = path[:, 1] - point[1]
+    return int(np.argmin(d * d + e * e))
+
+def rapid_distance(paths, start=None):
+    """Suma de los saltos en vacío: del final de cada camino al inicio del siguiente."""
+    total = 0.0
+    position = start
+    for path in paths:
+        if len(path) == 0:
+            continue
+        if position is not None:
+            total += math.hypot(path[0, 0] - position[0], path[0, 1] - position[1])
+        position = path[-1]
+    return total
+
+
+class _EntryGrid:
+    """
+    Rejilla hash de los puntos de entrada posibles (todos los vértices de los
+    lazos cerrados, los dos extremos de los abiertos). Los caminos ya usados se
+    eliminan de cada celda la próxima vez que se visita.
+    """
+    def __init__(self, points, owners, n_cells):
+        self.points = points
+        self.owners = owners
+        mins = points.min(axis=0)
+        span = max(float((points.max(axis=0) - mins).max()), 1e-9)
+        self.origin = mins
+        self.cell = span / max(1, int(math.sqrt(n_cells)))
+        ij = np.floor((points - mins) / self.cell).astype(np.int64)
+        self.max_ij = ij.max(axis=0)
+        order = np.lexsort((ij[:, 1], ij[:, 0]))
+        keys, starts = np.unique(ij[order], axis=0, return_index=True)
+        ends = np.append(starts[1:], len(order))
+        self.cells = {(int(i), int(j)): order[s:e] for (i, j), s, e in zip(keys, starts, ends)}
+
+    def nearest(self, point, used):
+        """Índice del punto libre más cercano a 'point' (None si no queda ninguno)."""
+        # Un punto fuera de la rejilla empieza en la celda del borde más cercana:
+        # por cada eje, los puntos a k celdas de ella siguen quedando a >= k-1
+        # celdas de él, y los anillos no crecen con la distancia a la rejilla
+        max_i, max_j = int(self.max_ij[0]), int(self.max_ij[1])
+        ci = min(max(int(math.floor((point[0] - self.origin[0]) / self.cell)), 0), max_i)
+        cj = min(max(int(math.floor((point[1] - self.origin[1]) / self.cell)), 0), max_j)
+        best, best_d = None, math.inf
+        max_ring = max(ci, cj, max_i - ci, max_j - cj) + 1
+        for ring in range(max_ring + 1):
+            # Todo lo que está más allá de este anillo queda a distancia >= (ring-1) celdas
+            if best is not None and best_d <= ((ring - 1) * self.cell) ** 2:
+                break
+            for key in self._ring(ci, cj, ring):
+                members = self.cells.get(key)
+                if members is None:
+                    continue
+                alive = members[~used[self.owners[members]]]
+                if len(alive) != len(members):
+                    if len(alive):
+                        self.cells[key] = alive
+                    else:
+                        del self.cells[key]
+                        continue
+                delta = self.points[alive] - point
+                dist = delta[:, 0] * delta[:, 0] + delta[:, 1] * delta[:, 1]
+                k = int(np.argmin(dist))
+                if dist[k] < best_d:
+                    best, best_d = int(alive[k]), float(dist[k])
+        return best
+
+    @staticmethod
+    def _ring(ci, cj, ring):
+        if ring == 0:
+            yield (ci, cj)
+            return
+        for i in range(ci - ring, ci + ring + 1):
+            yield (i, cj - ring)
+            yield (i, cj + ring)
+        for j in range(cj - ring + 1, cj + ring):
+            yield (ci - ring, j)
+            yield (ci + ring, j)
+
+
+def _nearest_neighbour(paths, start, allow_reverse):
+    """
+    Orden voraz: desde la posición actual, el camino con la entrada libre más
+    cercana. Devuelve la lista de caminos ya orientados/rotados.
+    """
+    closed = [is_closed(p) for p in paths]
+    points, owners, kinds = [], [], []
+    for k, (path, is_loop) in enumerate(zip(paths, closed)):
+        if is_loop:
+            pts = path[:-1]
+            points.append(pts)
+            owners.append(np.full(len(pts), k))
+            kinds.append(np.arange(len(pts)))      # vértice de costura
+        else:
+            ends = path[[0, -1]] if allow_reverse else path[:1]
+            points.append(ends)
+            owners.append(np.full(len(ends), k))
+            kinds.append(np.array([0, -1])[:len(ends)])  # 0 = tal cual, -1 = invertido
+    points = np.concatenate(points)
+    owners = np.concatenate(owners)
+    kinds = np.concatenate(kinds)
+
+    grid = _EntryGrid(points, owners, len(paths))
+    used = np.zeros(len(paths), dtype=bool)
+    ordered = []
+    position = np.asarray(start, dtype=np.float64) if start is not None else paths[0][0]
+    for _ in range(len(paths)):
+        idx = grid.nearest(position, used)
+        k = int(owners[idx])
+        used[k] = True
+        path = paths[k]
+        if closed[k]:
+            path = rotate_closed(path, int(kinds[idx]))
+        elif kinds[idx] == -1:
+            path = path[::-1]
+        ordered.append(path)
+        position = path[-1]
+    return ordered
+
+
+def _two_opt(paths, start, allow_reverse, window, max_passes):
+    """
+    2-opt en ventana: invertir el tramo i+1..j de la secuencia si acorta los
+    saltos. Invertir un tramo invierte también cada camino (entrada <-> salida),
+    así que solo se permite si todos los caminos abiertos pueden invertirse.
+    El coste de cada j de la ventana se evalúa en bloque con NumPy.
+    """
+    n = len(paths)
+    if n < 3 or not allow_reverse:
+        return paths
+    entries = np.array([p[0] for p in paths])
+    exits = np.array([p[-1] for p in paths])
+    order = np.arange(n)
+    flipped = np.zeros(n, dtype=bool)
+    # Nodo virtual 0 = posición inicial (solo tiene salida)
+    origin = np.asarray(start if start is not None else paths[0][0], dtype=np.float64)
+
+    for _ in range(max_passes):
+        improved = False
+        for i in range(-1, n - 2):
+            exit_i = origin if i < 0 else exits[i]
+            j = np.arange(i + 2, min(i + 1 + window, n))
+            if len(j) == 0:
+                continue
+            a = entries[i + 1]
+            next_entries = entries[np.minimum(j + 1, n - 1)]
+            has_next = j + 1 < n
+            old = (np.hypot(*(a - exit_i)) +
+                   np.where(has_next, np.hypot(*(next_entries - exits[j]).T), 0.0))
+            new = (np.hypot(*(exits[j] - exit_i).T) +
+                   np.where(has_next, np.hypot(*(next_entries - a).T), 0.0))
+            gain = old - new
+            best = int(np.argmax(gain))
+            if gain[best] > 1e-9:
+                jj = int(j[best])
+                seg = slice(i + 1, jj + 1)
+                entries[seg], exits[seg] = exits[seg][::-1].copy(), entries[seg][::-1].copy()
+                order[seg] = order[seg][::-1].copy()
+                flipped[seg] = ~flipped[seg][::-1]
+                improved = True
+        if not improved:
+            break
+
+    return [paths[k][::-1] if f else paths[k] for k, f in zip(order, flipped)]
+
+
+def _reseat(paths, start):
+    """Recoloca la costura de cada lazo cerrado junto al final del camino anterior."""
+    position = start
+    out = []
+    for path in paths:
+        if position is not None and is_closed(path):
+            path = rotate_closed(path, nearest_vertex(path[:-1], position))
+        out.append(path)
+        position = path[-1]
+    return out
+
+
+def order_paths(paths, start=None, allow_reverse=True,
+                window=TWO_OPT_WINDOW, max_passes=TWO_OPT_MAX_PASSES):
+    """
+    Reordena los caminos para minimizar los desplazamientos en vacío.
+    'start' es la posición de la boquilla antes del primer camino (None = empezar
+    por el primero tal cual). Los caminos abiertos se pueden recorrer al revés
+    si allow_reverse; los cerrados se rotan para empezar en el vértice más cercano.
+    Nunca alarga los saltos: si el orden original ya era mejor (el voraz no es
+    óptimo), se devuelve ese.
+    Devuelve la lista de caminos (arrays Nx2, nuevos o vistas de los originales).
+    """
+    paths = [np.asarray(p, dtype=np.float64)[:, :2] for p in paths if len(p)]
+    if len(paths) < 2:
+        return _reseat(paths, start)
+    ordered = _nearest_neighbour(paths, start, allow_reverse)
+    ordered = _two_opt(ordered, start, allow_reverse, window, max_passes)
+    ordered = _reseat(ordered, start)
+    if rapid_distance(ordered, start) > rapid_distance(paths, start):
+        return paths
+    return ordered
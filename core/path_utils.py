@@ -0,0 +1,330 @@
+"""
+core/path_utils.py
+Operaciones vectorizadas (NumPy) sobre caminos de puntos: limpieza de puntos
+demasiado próximos, formateo masivo de líneas G1, simplificación y unión
+de entidades conectadas.
+"""
+from bisect import bisect_right
+import numpy as np
+from core.geometry import nest_polygons
+from core.path_order import is_closed
+
+# 0.05mm^2: distancia mínima entre puntos consecutivos del programa
+MIN_POINT_DIST_SQ = 0.0025
+
+def as_points(path):
+    """Convierte cualquier secuencia de (x, y) en un array Nx2 float64 (sin copiar si ya lo es)."""
+    pts = np.asarray(path, dtype=np.float64)
+    if pts.ndim != 2:
+        pts = pts.reshape(-1, 2)
+    return pts[:, :2]
+
+def filter_min_distance(path, min_dist_sq=MIN_POINT_DIST_SQ):
+    """
+    Elimina los puntos a distancia <= sqrt(min_dist_sq) del ÚLTIMO punto conservado
+    (semántica acumulativa, idéntica al filtro punto a punto original).
+
+    Si el punto anterior se conservó y el salto es largo, el punto actual también se
+    conserva: los saltos se calculan en bloque y solo se recorren secuencialmente
+    los tramos que empiezan con un salto corto. La máscara final se arma con cumsum.
+    """
+    pts = as_points(path)
+    n = len(pts)
+    if n < 2:
+        return pts
+
+    delta = np.diff(pts, axis=0)
+    step_sq = delta[:, 0] * delta[:, 0] + delta[:, 1] * delta[:, 1]
+    # Índices de los puntos cuyo salto desde el anterior es corto
+    short = np.flatnonzero(step_sq <= min_dist_sq) + 1
+    if short.size == 0:
+        return pts
+
+    # Recorrido de los tramos dudosos con floats nativos (sin coste por llamada NumPy)
+    xs = pts[:, 0].tolist()
+    ys = pts[:, 1].tolist()
+    short_list = short.tolist()
+    n_short = len(short_list)
+    drop_start = []
+    drop_end = []
+    k = 0
+    while k < n_short:
+        j = short_list[k]
+        # Todo lo anterior a j está resuelto y j-1 se conservó: j se descarta
+        lx = xs[j - 1]
+        ly = ys[j - 1]
+        m = j + 1
+        while m < n:
+            dx = xs[m] - lx
+            dy = ys[m] - ly
+            if dx * dx + dy * dy > min_dist_sq:
+                break
+            m += 1
+        drop_start.append(j)
+        drop_end.append(m)
+        # 'm' es el siguiente punto conservado; saltamos los cortos ya resueltos
+        k = bisect_right(short_list, m, k)
+
+    # Máscara de descartes: +1 al inicio de cada tramo, -1 al final
+    marks = np.zeros(n + 1, dtype=np.int64)
+    np.add.at(marks, drop_start, 1)
+    np.add.at(marks, drop_end, -1)
+    keep = np.cumsum(marks[:n]) == 0
+    return pts[keep]
+
+def format_g1_lines(points, feed_rate):
+    """
+    Formatea en bloque 'G1 X.. Y.. F..' para cada punto.
+    Devuelve un único texto con las líneas separadas por '\\n' (sin salto final).
+    El formato es exactamente el de f"G1 X{x:.3f} Y{y:.3f} F{feed:.1f}".
+    """
+    pts = as_points(points)
+    if len(pts) == 0:
+        return ""
+    line = "G1 X%.3f Y%.3f F" + f"{feed_rate:.1f}"
+    return "\n".join([line] * len(pts)) % tuple(pts.ravel().tolist())
+
+def decimate_to_grid(path, cell):
+    """
+    Reducción muy barata para visualización: de cada racha de puntos consecutivos
+    que caen en la misma celda de una rejilla de lado 'cell' solo queda el primero
+    (más el punto final). El error queda acotado por la diagonal de la celda.
+    """
+    pts = as_points(path)
+    if len(pts) < 3 or cell <= 0:
+        return pts
+    cells = np.floor(pts / cell)
+    changed = np.any(cells[1:] != cells[:-1], axis=1)
+    keep = np.concatenate(([True], changed))
+    keep[-1] = True
+    return pts[keep]
+
+def simplify_polyline(path, tolerance):
+    """
+    Douglas-Peucker: conserva solo los vértices necesarios para que el camino no se
+    aleje más de 'tolerance' del original.
+    Los extremos (y por tanto el cierre de un lazo) se conservan siempre.
+    """
+    pts = as_points(path)
+    if len(pts) < 3 or tolerance <= 0:
+        return pts
+    keep = _douglas_peucker_mask(pts, np.array([0, len(pts)]), tolerance)
+    return pts[keep]
+
+def simplify_paths(paths, tolerance):
+    """Simplifica una lista de caminos de una sola pasada vectorizada (ver simplify_polyline)."""
+    arrays = [as_points(p) for p in paths]
+    if tolerance <= 0 or not arrays:
+        return arrays
+    offsets = np.zeros(len(arrays) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(a) for a in arrays])
+    if offsets[-1] == 0:
+        return arrays
+    coords = np.concatenate(arrays)
+    keep = _douglas_peucker_mask(coords, offsets, tolerance)
+    return [coords[offsets[i]:offsets[i + 1]][keep[offsets[i]:offsets[i + 1]]] for i in range(len(arrays))]
+
+def _douglas_peucker_mask(coords, offsets, tolerance):
+    """
+    Máscara de vértices conservados por Douglas-Peucker para todos los caminos
+    coords[offsets[i]:offsets[i+1]] a la vez. En cada pasada se evalúan en bloque
+    los puntos interiores de TODOS los tramos pendientes (sin bucle por tramo):
+    el número de pasadas es la profundidad del árbol de divisiones, no el de vértices.
+    """
+    n = len(coords)
+    keep = np.zeros(n, dtype=bool)
+    lengths = np.diff(offsets)
+    valid = lengths > 0
+    starts = offsets[:-1][valid]
+    ends = offsets[1:][valid] - 1
+    keep[starts] = True
+    keep[ends] = True
+
+    while starts.size:
+        inner = ends - starts - 1
+        active = inner > 0
+        starts, ends, inner = starts[active], ends[active], inner[active]
+        if not starts.size:
+            break
+
+        # Índices de los puntos interiores de cada tramo, concatenados
+        seg_first = np.cumsum(inner) - inner
+        seg_id = np.repeat(np.arange(len(starts)), inner)
+        idx = np.arange(inner.sum()) - seg_first[seg_id] + starts[seg_id] + 1
+
+        a = coords[starts]
+        d = coords[ends] - a
+        rel = coords[idx] - a[seg_id]
+        dx, dy = d[seg_id, 0], d[seg_id, 1]
+        length2 = dx * dx + dy * dy
+        # Distancia al segmento (no a la recta infinita: un pico de ida y vuelta
+        # sobre la misma recta debe conservarse). Proyección acotada a [0, 1];
+        # si el tramo es degenerado (lazo cerrado), t = 0 y se mide al punto.
+        t = (rel[:, 0] * dx + rel[:, 1] * dy) / np.where(length2 > 0, length2, 1.0)
+        t = np.clip(t, 0.0, 1.0)
+        dist = np.hypot(rel[:, 0] - t * dx, rel[:, 1] - t * dy)
+
+        # Máximo por tramo y primer índice donde se alcanza (como argmax)
+        seg_max = np.maximum.reduceat(dist, seg_first)
+        candidates = np.flatnonzero(dist == seg_max[seg_id])
+        _, first = np.unique(seg_id[candidates], return_index=True)
+        split_pos = candidates[first]
+
+        split = seg_max > tolerance
+        split_idx = idx[split_pos[split]]
+        keep[split_idx] = True
+        starts = np.concatenate((starts[split], split_idx))
+        ends = np.concatenate((split_idx, ends[split]))
+
+    return keep
+
+# Distancia máxima (mm) entre extremos para considerar dos entidades conectadas
+CONNECT_TOLERANCE = 0.01
+
+def _endpoint_pairs(ends, tolerance):
+    """
+    Pares (i, j), i < j, de extremos a distancia <= tolerance.
+    Rejilla hash con celdas del tamaño de la tolerancia: cada celda solo se
+    compara consigo misma y con 4 vecinas (la otra mitad ya la cubre la vecina).
+    """
+    xs = ends[:, 0].tolist()
+    ys = ends[:, 1].tolist()
+    cells = np.floor(ends / tolerance).astype(np.int64).tolist()
+    grid = {}
+    for idx, (cx, cy) in enumerate(cells):
+        grid.setdefault((cx, cy), []).append(idx)
+
+    tol_sq = tolerance * tolerance
+    pairs = []
+    for (cx, cy), members in grid.items():
+        for a in range(len(members)):
+            for b in range(a + 1, len(members)):
+                i, j = members[a], members[b]
+                if (xs[i] - xs[j]) ** 2 + (ys[i] - ys[j]) ** 2 <= tol_sq:
+                    pairs.append((i, j))
+        for key in ((cx + 1, cy - 1), (cx + 1, cy), (cx + 1, cy + 1), (cx, cy + 1)):
+            others = grid.get(key)
+            if not others:
+                continue
+            for i in members:
+                for j in others:
+                    if (xs[i] - xs[j]) ** 2 + (ys[i] - ys[j]) ** 2 <= tol_sq:
+                        pairs.append((i, j) if i < j else (j, i))
+    return pairs
+
+def _path_ends(paths):
+    """Extremos [inicio0, fin0, inicio1, fin1, ...] como array (2n)x2."""
+    ends = np.empty((2 * len(paths), 2))
+    for k, p in enumerate(paths):
+        ends[2 * k] = p[0, :2]
+        ends[2 * k + 1] = p[-1, :2]
+    return ends
+
+def stitch_paths(paths, tolerance=CONNECT_TOLERANCE):
+    """
+    Une en una sola polilínea los caminos que se continúan extremo con extremo
+    (un contorno explotado en líneas y arcos vuelve a ser un único camino).
+    Las cadenas empiezan por un extremo libre; lo que queda son ciclos cerrados.
+    En las bifurcaciones la cadena termina y la rama sigue como otro camino.
+    """
+    paths = [as_points(p) for p in paths]
+    n = len(paths)
+    if n < 2:
+        return paths
+
+    # Extremos vecinos de cada extremo (sin contar los del propio camino)
+    neighbours = [[] for _ in range(2 * n)]
+    for i, j in _endpoint_pairs(_path_ends(paths), tolerance):
+        if i // 2 != j // 2:
+            neighbours[i].append(j)
+            neighbours[j].append(i)
+
+    used = [False] * n
+    stitched = []
+
+    def follow(k, reverse):
+        """Cadena que arranca en el camino k (invertido si 'reverse')."""
+        used[k] = True
+        pieces = [paths[k][::-1] if reverse else paths[k]]
+        tail = 2 * k if reverse else 2 * k + 1
+        while True:
+            nxt = next((e for e in neighbours[tail] if not used[e // 2]), None)
+            if nxt is None:
+                break
+            k = nxt // 2
+            used[k] = True
+            # Entramos por 'nxt': si es el final del camino, se recorre al revés
+            forward = nxt % 2 == 0
+            pieces.append(paths[k][1:] if forward else paths[k][::-1][1:])
+            tail = 2 * k + 1 if forward else 2 * k
+        return np.concatenate(pieces) if len(pieces) > 1 else pieces[0]
+
+    # 1. Cadenas abiertas desde un extremo libre
+    for k in range(n):
+        if used[k]:
+            continue
+        if not neighbours[2 * k]:
+            stitched.append((k, follow(k, False)))
+        elif not neighbours[2 * k + 1]:
+            stitched.append((k, follow(k, True)))
+    # 2. Lo que queda forma ciclos: da igual por dónde empezar
+    for k in range(n):
+        if not used[k]:
+            stitched.append((k, follow(k, False)))
+    # Se mantiene el orden del fichero (por el primer camino de cada cadena)
+    stitched.sort(key=lambda item: item[0])
+    return [chain for _, chain in stitched]
+
+def group_connected_paths(paths, tolerance=CONNECT_TOLERANCE):
+    """
+    Agrupa los caminos que se tocan por sus extremos (union-find sobre la rejilla
+    de extremos). Devuelve listas de índices, en el orden del primer camino de cada grupo.
+    """
+    if not paths:
+        return []
+    pairs = ((i // 2, j // 2) for i, j in _endpoint_pairs(_path_ends([as_points(p) for p in paths]), tolerance))
+    return _components(len(paths), pairs)
+
+def _components(n, pairs):
+    """Union-find: índices 0..n-1 unidos por los pares dados, en el orden del primero de cada grupo."""
+    parent = list(range(n))
+
+    def find(a):
+        while parent[a] != a:
+            parent[a] = parent[parent[a]]
+            a = parent[a]
+        return a
+
+    for i, j in pairs:
+        ri, rj = find(i), find(j)
+        if ri != rj:
+            parent[max(ri, rj)] = min(ri, rj)
+
+    groups = {}
+    for k in range(n):
+        groups.setdefault(find(k), []).append(k)
+    return list(groups.values())
+
+def merge_connected_paths(paths, tolerance=CONNECT_TOLERANCE):
+    """Cose las cadenas y agrupa lo conectado: lista de grupos (listas de arrays Nx2)."""
+    stitched = stitch_paths(paths, tolerance)
+    return [[stitched[k] for k in group] for group in group_connected_paths(stitched, tolerance)]
+
+def merge_nested_groups(groups, tolerance=CONNECT_TOLERANCE):
+    """
+    Une los grupos cuyos contornos cerrados se anidan: cada exterior con sus
+    huecos (nest_polygons, par/impar) queda en un mismo grupo, de modo que la
+    operación creada con ese objeto rellena dejando los huecos. Una isla dentro
+    de un hueco es otro exterior y sigue siendo un grupo aparte.
+    """
+    rings, owner = [], []
+    for g, group in enumerate(groups):
+        for path in group:
+            path = as_points(path)
+            if is_closed(path, tolerance):
+                rings.append(path)
+                owner.append(g)
+    pairs = [(owner[outer], owner[hole]) for outer, holes in nest_polygons(rings) for hole in holes]
+    if not pairs:
+        return groups
+    return [[p for g in component for p in groups[g]] for component in _components(len(groups), pairs)]
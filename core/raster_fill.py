@@ -0,0 +1,178 @@
+"""
+core/raster_fill.py
+Relleno por barrido (raster): líneas paralelas a un ángulo dado, opcionalmente
+unidas en zigzag, y el modo híbrido (un perímetro + zigzag interior).
+Solo hay un buffer de Shapely por polígono (el retranqueo de media boquilla);
+los cortes de las líneas con los bordes se calculan en bloque con NumPy.
+"""
+import math
+import numpy as np
+
+try:
+    from shapely import affinity
+    from shapely.geometry import Polygon, MultiPolygon, LineString
+    from shapely.prepared import prep
+    SHAPELY_AVAILABLE = True
+except ImportError:
+    SHAPELY_AVAILABLE = False
+
+# Patrones de relleno admitidos por las operaciones ('concentric' vive en gcode_generator)
+FILL_PATTERNS = ("concentric", "raster", "zigzag", "hybrid")
+
+
+def _rotation(angle_deg):
+    a = math.radians(angle_deg)
+    c, s = math.cos(a), math.sin(a)
+    return np.array([[c, -s], [s, c]])
+
+
+def _edges(geom):
+    """Aristas (x0, y0, x1, y1) de todos los anillos de un polígono o multipolígono."""
+    polys = geom.geoms if isinstance(geom, MultiPolygon) else [geom]
+    rings = []
+    for poly in polys:
+        if poly.is_empty:
+            continue
+        rings.append(np.asarray(poly.exterior.coords))
+        rings.extend(np.asarray(r.coords) for r in poly.interiors)
+    if not rings:
+        return np.empty((0, 4))
+    return np.concatenate([np.hstack((r[:-1, :2], r[1:, :2])) for r in rings])
+
+
+def scanline_origin(geom, step):
+    """Altura de la línea k=0: las líneas quedan centradas en la altura del polígono."""
+    ymin, ymax = geom.bounds[1], geom.bounds[3]
+    return ymin + (((ymax - ymin) % step) or step) / 2.0
+
+
+def scanline_segments(geom, step):
+    """
+    Tramos interiores de las líneas horizontales y = origen + k*step que cortan 'geom'.
+    Devuelve (k, xa, xb) como arrays, ordenados por línea y por x.
+    Cada arista cubre las líneas con y en [min, max): así cada línea corta un
+    número par de veces y los cortes se emparejan dentro/fuera (par/impar).
+    """
+    edges = _edges(geom)
+    empty = (np.empty(0, dtype=np.int64), np.empty(0), np.empty(0))
+    if len(edges) == 0:
+        return empty
+    x0, y0, x1, y1 = edges.T
+    origin = scanline_origin(geom, step)
+    lo = np.minimum(y0, y1)
+    hi = np.maximum(y0, y1)
+    k_lo = np.ceil((lo - origin) / step).astype(np.int64)
+    k_hi = np.ceil((hi - origin) / step).astype(np.int64)
+    counts = np.maximum(k_hi - k_lo, 0)
+    total = int(counts.sum())
+    if total == 0:
+        return empty
+
+    edge = np.repeat(np.arange(len(edges)), counts)
+    starts = np.cumsum(counts) - counts
+    k = k_lo[edge] + (np.arange(total) - starts[edge])
+    y = origin + k * step
+    t = (y - y0[edge]) / (y1[edge] - y0[edge])
+    x = x0[edge] + t * (x1[edge] - x0[edge])
+
+    order = np.lexsort((x, k))
+    k, x = k[order], x[order]
+    # Pares consecutivos de cada línea: entrada y salida
+    return k[0::2], x[0::2], x[1::2]
+
+
+def _chain(k, xa, xb, origin_y, step, inside, zigzag):
+    """
+    Une los tramos en caminos. Sin zigzag, cada tramo es un camino (alternando
+    el sentido por línea). En zigzag, un tramo continúa el camino de la línea
+    anterior si sus intervalos se solapan y el enlace cae dentro del polígono.
+    """
+    paths = []
+    active = [] # caminos que terminan en la línea anterior: (camino, xa, xb)
+    prev_k = None
+    start = 0
+    n = len(k)
+    while start < n:
+        line_k = k[start]
+        end = start
+        while end < n and k[end] == line_k:
+            end += 1
+        y = origin_y + line_k * step
+        if prev_k is None or line_k != prev_k + 1:
+            active = []
+        left_to_right = line_k % 2 == 0
+        next_active = []
+        used = set()
+        for i in range(start, end):
+            a, b = xa[i], xb[i]
+            target = None
+            if zigzag:
+                for j, (path, pa, pb) in enumerate(active):
+                    if j in used or pb < a or pa > b:
+                        continue
+                    last = path[-1]
+                    entry = (a, y) if last[0] < (a + b) / 2.0 else (b, y)
+                    link = LineString([last, entry])
+                    if inside(link):
+                        target = path
+                        used.add(j)
+                        break
+            if target is None:
+                target = []
+                paths.append(target)
+                forward = left_to_right
+            else:
+                # Entrar por el extremo más cercano al final del camino
+                forward = target[-1][0] < (a + b) / 2.0
+            if forward:
+                target.extend(((a, y), (b, y)))
+            else:
+                target.extend(((b, y), (a, y)))
+            next_active.append((target, a, b))
+        active = next_active
+        prev_k = line_k
+        start = end
+    return paths
+
+
+def raster_fill(coords, nozzle_mm, fill_overlap, angle_deg=45.0, zigzag=False, perimeter=False, holes=()):
+    """
+    Relleno por líneas paralelas a 'angle_deg' grados, separadas el paso de la
+    boquilla y retranqueadas media boquilla del borde. Con zigzag las líneas
+    contiguas se unen en un único camino; con perimeter se recorre antes un
+    anillo por el borde (y por cada hueco) y el barrido ocupa el interior.
+    Devuelve una lista de caminos Nx2.
+    """
+    if not SHAPELY_AVAILABLE or len(coords) < 3:
+        return []
+    step = nozzle_mm * (1.0 - fill_overlap)
+    poly = Polygon(coords, [h for h in holes if len(h) >= 3])
+    if not poly.is_valid:
+        poly = poly.buffer(0)
+
+    fill_paths = []
+    region = poly.buffer(-nozzle_mm / 2)
+    if region.is_empty:
+        return fill_paths
+    if perimeter:
+        for geom in (region.geoms if isinstance(region, MultiPolygon) else [region]):
+            fill_paths.append(np.asarray(geom.exterior.coords))
+            fill_paths.extend(np.asarray(r.coords) for r in geom.interiors)
+        region = region.buffer(-step)
+        if region.is_empty:
+            return fill_paths
+
+    # Se barre en horizontal sobre la geometría girada -angle y se deshace el giro al final
+    local = affinity.rotate(region, -angle_deg, origin=(0, 0))
+    k, xa, xb = scanline_segments(local, step)
+    if len(k) == 0:
+        return fill_paths
+
+    inside = None
+    if zigzag:
+        # Un enlace del zigzag puede rozar el borde como mucho un 5% del paso
+        inside = prep(local.buffer(step * 0.05)).covers
+    paths = _chain(k, xa, xb, scanline_origin(local, step), step, inside, zigzag)
+    to_world = _rotation(angle_deg).T
+    fill_paths.extend(np.asarray(path) @ to_world for path in paths)
+    return fill_paths
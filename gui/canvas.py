@@ -1,11 +1,21 @@
+import math
 from PySide6.QtWidgets import QGraphicsView, QGraphicsScene, QGraphicsPathItem
 from PySide6.QtGui import (QPen, QColor, QPainter, QFont, QTransform, 
-                           QWheelEvent, QMouseEvent, QBrush, QPainterPath)
-from PySide6.QtCore import Qt, QPoint, Signal
+                           QWheelEvent, QMouseEvent, QBrush, QPainterPath, QPixmapCache)
+from PySide6.QtCore import Qt, QPoint, QTimer, Signal
 from gui.dxf_item import DXFGraphicsItem
+from core.instrumentation import timed
 
 class ViewerCanvas(QGraphicsView):
     items_selected = Signal(list)
+    items_moved = Signal() # al soltar el ratón tras arrastrar objetos
+
+    # Memoria para los pixmaps de los ítems DXF (KB, unidades de QPixmapCache)
+    RENDER_CACHE_KB = 256 * 1024
+    # Profundidad máxima del árbol BSP de la escena
+    BSP_MAX_DEPTH = 14
+    # Espera (ms) para agrupar los cambios de selección en un único aviso
+    SELECTION_DEBOUNCE_MS = 30
 
     def __init__(self):
         super().__init__()
@@ -21,6 +31,17 @@ class ViewerCanvas(QGraphicsView):
         self.setResizeAnchor(QGraphicsView.AnchorUnderMouse)
         self.setDragMode(QGraphicsView.RubberBandDrag)
 
+        # Los DXFGraphicsItem se cachean como pixmaps: con miles de entidades el
+        # límite por defecto de QPixmapCache (10 MB) se quedaría corto
+        QPixmapCache.setCacheLimit(max(QPixmapCache.cacheLimit(), self.RENDER_CACHE_KB))
+        self.setViewportUpdateMode(QGraphicsView.SmartViewportUpdate)
+
+        # El reparto de la caché se recalcula cuando el zoom se detiene
+        self._render_cache_timer = QTimer(self)
+        self._render_cache_timer.setSingleShot(True)
+        self._render_cache_timer.setInterval(150)
+        self._render_cache_timer.timeout.connect(self.update_render_cache)
+
         self._panning = False
         self._last_mouse_pos = QPoint()
         self.work_area_size = 200 
@@ -31,47 +52,126 @@ class ViewerCanvas(QGraphicsView):
         self.draw_pins() 
         self.scale(1, -1)
         
-        # --- Contenedor para las previsualizaciones ---
-        self.preview_items = [] 
+        # --- Contenedor para las previsualizaciones (id de operación -> item) ---
+        self.preview_items = {} 
 
-        self.scene.selectionChanged.connect(self.on_selection_changed)
+        # Tramo del G-Code resaltado desde el visor (se crea al usarlo)
+        self.highlight_item = None
 
+        # Una selección con rubber band de miles de ítems dispara selectionChanged
+        # muchas veces: se agrupan y 'items_selected' se emite una sola vez
+        self._selection_timer = QTimer(self)
+        self._selection_timer.setSingleShot(True)
+        self._selection_timer.setInterval(self.SELECTION_DEBOUNCE_MS)
+        self._selection_timer.timeout.connect(self.on_selection_changed)
+        self.scene.selectionChanged.connect(self._selection_timer.start)
+
+    @timed("canvas.draw_preview_paths")
     def draw_preview_paths(self, preview_data):
         """
-        Recibe una lista de dicts: [{'color': '#...', 'paths': [[(x,y)...]]}, ...]
-        Dibuja estas rutas encima de todo con líneas punteadas.
+        Recibe una lista de dicts: [{'id': int, 'color': '#...', 'paths': [[(x,y)...]], 'transform': ...}, ...]
+        Reconstruye TODAS las previsualizaciones (encima de todo con líneas punteadas).
         """
         # 1. Limpiar previsualización anterior
-        for item in self.preview_items:
-            self.scene.removeItem(item)
-        self.preview_items.clear()
+        self.clear_previews()
         
         # 2. Dibujar nuevas rutas
         for op_data in preview_data:
-            color_hex = op_data['color']
-            paths_list = op_data['paths']
-            
-            # Configurar Lápiz: Punteado, del color de la operación
-            pen = QPen(QColor(color_hex))
-            pen.setWidth(0) # 'Cosmetic' (siempre fino)
-            pen.setStyle(Qt.DotLine) # <--- LINEA PUNTEADA
-            
-            # Crear el camino gráfico
-            painter_path = QPainterPath()
-            
-            for poly in paths_list:
-                if not poly: continue
-                painter_path.moveTo(poly[0][0], poly[0][1])
-                for point in poly[1:]:
-                    painter_path.lineTo(point[0], point[1])
-            
+            self.set_operation_preview(op_data['id'], op_data['color'], op_data['paths'], op_data.get('transform'))
+
+    @timed("canvas.set_operation_preview")
+    def set_operation_preview(self, op_id, color_hex, paths_list, transform=None):
+        """
+        Crea o reemplaza SOLO la previsualización de una operación.
+        Los caminos van en el sistema del diseño y 'transform' (m11, m12, m21, m22, dx, dy)
+        los coloca en la escena: mover la operación solo cambia la transformación del ítem.
+        """
+        # Crear el camino gráfico
+        painter_path = QPainterPath()
+        
+        for poly in paths_list:
+            if len(poly) == 0: continue
+            # Los caminos pueden llegar como arrays NumPy: a floats nativos de una vez
+            points = poly.tolist() if hasattr(poly, 'tolist') else poly
+            painter_path.moveTo(points[0][0], points[0][1])
+            for point in points[1:]:
+                painter_path.lineTo(point[0], point[1])
+
+        item = self.preview_items.get(op_id)
+        if item is None:
             # Crear item y añadir a escena
-            item = QGraphicsPathItem(painter_path)
-            item.setPen(pen)
+            item = QGraphicsPathItem()
             item.setZValue(10) # Asegurar que se pinte ENCIMA del DXF original (Z=0)
-            
             self.scene.addItem(item)
-            self.preview_items.append(item)
+            self.preview_items[op_id] = item
+
+        item.setPath(painter_path)
+        item.setPen(self._preview_pen(color_hex))
+        self.set_operation_preview_transform(op_id, transform)
+
+    def set_operation_preview_transform(self, op_id, transform):
+        """Recoloca una previsualización (mover/girar el diseño) sin recalcular su geometría."""
+        item = self.preview_items.get(op_id)
+        if item is None:
+            return
+        qt_transform = QTransform() if transform is None else QTransform(*transform)
+        if item.transform() != qt_transform:
+            item.setTransform(qt_transform)
+
+    def set_operation_preview_color(self, op_id, color_hex):
+        """Cambia el color de una previsualización sin recalcular su geometría."""
+        item = self.preview_items.get(op_id)
+        if item is not None:
+            item.setPen(self._preview_pen(color_hex))
+
+    def remove_operation_preview(self, op_id):
+        item = self.preview_items.pop(op_id, None)
+        if item is not None:
+            self.scene.removeItem(item)
+
+    def clear_previews(self):
+        for item in self.preview_items.values():
+            self.scene.removeItem(item)
+        self.preview_items.clear()
+
+    def highlight_segment(self, points):
+        """
+        Resalta el tramo de una línea del G-Code (la lista de puntos que recorre,
+        varios si es un arco), en coordenadas de escena (las del programa), y lo
+        lleva a la vista.
+        """
+        start = points[0]
+        painter_path = QPainterPath()
+        painter_path.moveTo(start[0], start[1])
+        if len(points) < 2:
+            # Línea sin desplazamiento (Z, cambio de inyector): marcar el punto
+            painter_path.addEllipse(start[0] - 0.75, start[1] - 0.75, 1.5, 1.5)
+        else:
+            for x, y in points[1:]:
+                painter_path.lineTo(x, y)
+
+        if self.highlight_item is None:
+            self.highlight_item = QGraphicsPathItem()
+            self.highlight_item.setZValue(20) # Por encima de las previsualizaciones
+            pen = QPen(QColor(255, 0, 0))
+            pen.setWidth(3)
+            pen.setCosmetic(True)
+            self.highlight_item.setPen(pen)
+            self.scene.addItem(self.highlight_item)
+        self.highlight_item.setPath(painter_path)
+        self.highlight_item.setVisible(True)
+        self.ensureVisible(self.highlight_item)
+
+    def clear_highlight(self):
+        if self.highlight_item is not None:
+            self.highlight_item.setVisible(False)
+
+    def _preview_pen(self, color_hex):
+        # Configurar Lápiz: Punteado, del color de la operación
+        pen = QPen(QColor(color_hex))
+        pen.setWidth(0) # 'Cosmetic' (siempre fino)
+        pen.setStyle(Qt.DotLine) # <--- LINEA PUNTEADA
+        return pen
 
     def draw_pins(self):
         diameter = 3.175
@@ -82,25 +182,89 @@ class ViewerCanvas(QGraphicsView):
         for cx, cy in pin_positions:
             self.scene.addEllipse(cx-radius, cy-radius, diameter, diameter, pen, brush)
 
+    @timed("canvas.add_dxf_object")
     def add_dxf_object(self, paths_list):
         """
         Agrega los objetos del DXF a la escena.
         MODIFICADO: Se crea un DXFGraphicsItem independiente por cada camino (entidad)
         para permitir selección y manipulación individual.
         """
+        self.add_dxf_groups([[single_path] for single_path in paths_list])
+
+    @timed("canvas.add_dxf_groups")
+    def add_dxf_groups(self, groups):
+        """
+        Agrega un DXFGraphicsItem por grupo de caminos (una entidad suelta o una
+        figura de entidades conectadas). Al crearse, cada ítem calcula su propio
+        centro (bounding box) y se posiciona en el espacio absoluto de la escena.
+        Devuelve los ítems creados.
+        """
         self.scene.clearSelection()
-        
-        for single_path in paths_list:
-            # DXFGraphicsItem espera una lista de caminos, así que pasamos una lista con un solo elemento.
-            # Al crearse, cada ítem calculará su propio centro (bounding box) y se posicionará correctamente
-            # en el espacio absoluto de la escena.
-            item = DXFGraphicsItem([single_path])
+
+        items = []
+        for group in groups:
+            item = DXFGraphicsItem(group)
             self.scene.addItem(item)
-            
+            items.append(item)
+
         # Nota: No seleccionamos nada automáticamente al cargar para no abrumar al usuario
         # si el archivo contiene muchas líneas sueltas.
+        self._render_cache_timer.start()
+        return items
+
+    def replace_dxf_items(self, items, groups):
+        """
+        Sustituye ítems ya mostrados (p. ej. las entidades sueltas que se ven
+        mientras se lee el DXF) por los grupos definitivos.
+        """
+        self.scene.clearSelection()
+        for item in items:
+            if item.scene() is self.scene:
+                self.scene.removeItem(item)
+        return self.add_dxf_groups(groups)
+
+    def begin_bulk_add(self):
+        """
+        Antes de añadir miles de ítems: sin índice espacial, cada addItem no
+        reequilibra el árbol BSP.
+        """
+        self.scene.setItemIndexMethod(QGraphicsScene.NoIndex)
+
+    @timed("canvas.end_bulk_add")
+    def end_bulk_add(self):
+        """Reconstruye el índice BSP una sola vez, con la profundidad acorde al nº de ítems."""
+        n_items = len(self.scene.items())
+        self.scene.setItemIndexMethod(QGraphicsScene.BspTreeIndex)
+        # ~4 ítems por hoja; con 0 Qt recalcula la profundidad a cada cambio
+        self.scene.setBspTreeDepth(min(self.BSP_MAX_DEPTH, max(4, int(math.log2(max(n_items, 4) / 4)))))
+
+    def update_render_cache(self):
+        """
+        Activa la caché de pixmap solo en los ítems DXF que caben en el presupuesto
+        de memoria al zoom actual, empezando por los pequeños. Si se cachearan todos,
+        con miles de entidades grandes QPixmapCache expulsaría pixmaps en cada
+        repintado y cada fotograma costaría más que sin caché.
+        """
+        viewport = self.viewport().rect()
+        view_transform = self.transform()
+        costs = []
+        for item in self.scene.items():
+            if not isinstance(item, DXFGraphicsItem):
+                continue
+            rect = view_transform.mapRect(item.sceneBoundingRect())
+            # Qt solo guarda la parte visible: como mucho, el tamaño de la vista
+            w = min(rect.width(), viewport.width()) + 2
+            h = min(rect.height(), viewport.height()) + 2
+            costs.append((w * h * 4, item))
+
+        budget = self.RENDER_CACHE_KB * 1024 * 0.75
+        costs.sort(key=lambda c: c[0])
+        for cost, item in costs:
+            item.set_render_cache(cost <= budget)
+            budget -= cost
 
     def on_selection_changed(self):
+        # Llamado por el temporizador: un único aviso por ráfaga de cambios
         items = self.scene.selectedItems()
         self.items_selected.emit(items)
 
@@ -110,10 +274,12 @@ class ViewerCanvas(QGraphicsView):
             self.fitInView(self.sceneRect(), Qt.KeepAspectRatio)
             if self.transform().m22() > 0: self.scale(1, -1)
             self.first_show = False
+        self._render_cache_timer.start()
 
     def wheelEvent(self, event: QWheelEvent):
         zoom = 1.15 if event.angleDelta().y() > 0 else 1/1.15
         self.scale(zoom, zoom)
+        self._render_cache_timer.start()
 
     def mousePressEvent(self, event: QMouseEvent):
         if event.button() == Qt.MiddleButton:
@@ -132,6 +298,9 @@ class ViewerCanvas(QGraphicsView):
         else:
             super().mouseReleaseEvent(event)
             #self.on_selection_changed()
+            if event.button() == Qt.LeftButton and self.scene.selectedItems():
+                # Puede que se hayan arrastrado objetos: las operaciones deben seguirlos
+                self.items_moved.emit()
 
     def mouseMoveEvent(self, event: QMouseEvent):
         if self._panning:
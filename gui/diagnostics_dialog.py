@@ -0,0 +1,120 @@
+"""
+gui/diagnostics_dialog.py
+Diálogo de diagnóstico: tiempos y memoria por etapa (core.instrumentation).
+Permite activar la medición, reiniciarla y exportar el resumen a JSON.
+"""
+from PySide6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QCheckBox, QPushButton,
+                               QTableWidget, QTableWidgetItem, QHeaderView, QFileDialog,
+                               QMessageBox, QLabel)
+from PySide6.QtCore import Qt, QTimer
+from core import instrumentation
+
+COLUMNS = ("Etapa", "Llamadas", "Total", "Media", "p50", "p95", "Máx", "Pico mem. (proceso)")
+
+
+def _format_seconds(seconds):
+    if seconds >= 1.0:
+        return f"{seconds:.2f} s"
+    return f"{seconds * 1000:.1f} ms"
+
+
+def summary_text(limit=3):
+    """Las etapas más costosas en una línea (para la barra de estado)."""
+    spans = instrumentation.report()
+    if not spans:
+        return "Diagnóstico: sin datos"
+    top = list(spans.items())[:limit]
+    return "Diagnóstico: " + " · ".join(f"{name} {_format_seconds(s['total_s'])}" for name, s in top)
+
+
+class DiagnosticsDialog(QDialog):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Diagnóstico de rendimiento")
+        self.resize(760, 420)
+
+        layout = QVBoxLayout(self)
+        options = QHBoxLayout()
+        self.chk_enabled = QCheckBox("Medir etapas")
+        self.chk_enabled.setChecked(instrumentation.is_enabled())
+        self.chk_memory = QCheckBox("Incluir memoria (más lento)")
+        self.chk_memory.setChecked(instrumentation.memory_tracking())
+        self.chk_memory.setToolTip("Pico de memoria de todo el proceso mientras la etapa está abierta.\n"
+                                   "Solo se mide en las etapas del hilo de la ventana: las que corren en\n"
+                                   "segundo plano (rellenos, previsualización, generación) muestran '-'.")
+        self.chk_enabled.toggled.connect(self.apply_settings)
+        self.chk_memory.toggled.connect(self.apply_settings)
+        options.addWidget(self.chk_enabled)
+        options.addWidget(self.chk_memory)
+        options.addStretch()
+        layout.addLayout(options)
+
+        self.table = QTableWidget(0, len(COLUMNS))
+        self.table.setHorizontalHeaderLabels(COLUMNS)
+        self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.table.verticalHeader().setVisible(False)
+        layout.addWidget(self.table)
+
+        self.lbl_hint = QLabel("Activa la medición y repite la operación lenta (cargar, previsualizar, generar).")
+        self.lbl_hint.setStyleSheet("color: gray;")
+        layout.addWidget(self.lbl_hint)
+
+        buttons = QHBoxLayout()
+        self.btn_reset = QPushButton("Reiniciar")
+        self.btn_reset.clicked.connect(self.reset)
+        self.btn_export = QPushButton("Exportar JSON...")
+        self.btn_export.clicked.connect(self.export_json)
+        self.btn_close = QPushButton("Cerrar")
+        self.btn_close.clicked.connect(self.close)
+        buttons.addWidget(self.btn_reset)
+        buttons.addWidget(self.btn_export)
+        buttons.addStretch()
+        buttons.addWidget(self.btn_close)
+        layout.addLayout(buttons)
+
+        # Mientras está abierto, la tabla se refresca sola
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setInterval(1000)
+        self.refresh_timer.timeout.connect(self.refresh)
+
+    def showEvent(self, event):
+        self.refresh()
+        self.refresh_timer.start()
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        self.refresh_timer.stop()
+        super().hideEvent(event)
+
+    def apply_settings(self):
+        if self.chk_enabled.isChecked():
+            instrumentation.enable(memory=self.chk_memory.isChecked())
+        else:
+            instrumentation.disable()
+
+    def reset(self):
+        instrumentation.reset()
+        self.refresh()
+
+    def refresh(self):
+        spans = instrumentation.report()
+        self.table.setRowCount(len(spans))
+        for row, (name, s) in enumerate(spans.items()):
+            peak = "-" if s['peak_mb'] is None else f"{s['peak_mb']:.1f} MB"
+            values = (name, str(s['count']), _format_seconds(s['total_s']), _format_seconds(s['mean_s']),
+                      _format_seconds(s['p50_s']), _format_seconds(s['p95_s']), _format_seconds(s['max_s']), peak)
+            for col, value in enumerate(values):
+                item = QTableWidgetItem(value)
+                if col > 0:
+                    item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                self.table.setItem(row, col, item)
+
+    def export_json(self):
+        filename, _ = QFileDialog.getSaveFileName(self, "Exportar diagnóstico", "diagnostico.json", "JSON (*.json)")
+        if not filename:
+            return
+        try:
+            instrumentation.dump_json(filename)
+        except OSError as e:
+            QMessageBox.critical(self, "Error", f"No se pudo guardar:\n{e}")
@@ -4,33 +4,53 @@ Clase que encapsula un archivo DXF importado.
 Maneja su propia geometría, selección y cambio de color.
 MODIFICADO: La geometría se centra en (0,0) local para que la rotación/escala
 sea desde el centro, y la posición corresponda al centro en la grilla.
+Guarda además versiones simplificadas (LOD) que se dibujan al alejar el zoom.
 """
-from PySide6.QtWidgets import QGraphicsPathItem, QStyle
+import numpy as np
+from PySide6.QtWidgets import QGraphicsItem, QGraphicsPathItem, QStyle
 from PySide6.QtGui import QPen, QColor, QPainterPath
-from PySide6.QtCore import Qt
+from PySide6.QtCore import Qt, QPointF
+from core.path_utils import decimate_to_grid
+
+def build_painter_path(paths_list):
+    """QPainterPath con una subruta por cada array Nx2 (floats nativos de una vez)."""
+    painter_path = QPainterPath()
+    for vertices in paths_list:
+        if len(vertices) < 2: continue
+        points = vertices.tolist()
+        painter_path.moveTo(points[0][0], points[0][1])
+        for x, y in points[1:]:
+            painter_path.lineTo(x, y)
+    return painter_path
 
 class DXFGraphicsItem(QGraphicsPathItem):
+    # Tamaño de celda (mm de escena) de los niveles de detalle simplificados
+    LOD_CELLS = (0.25, 1.0, 4.0)
+    # Error máximo admitido en pantalla (píxeles) al elegir nivel
+    LOD_MAX_ERROR_PX = 0.5
+    # Por debajo de este tamaño en pantalla (píxeles) se dibuja solo la caja
+    SMALL_ITEM_PX = 4
+
     def __init__(self, paths_list):
         super().__init__()
         
-        # 1. Construir un "Path" unificado con todas las líneas del DXF
-        raw_path = QPainterPath()
-        for vertices in paths_list:
-            if len(vertices) < 2: continue
-            raw_path.moveTo(vertices[0].x, vertices[0].y)
-            for i in range(1, len(vertices)):
-                raw_path.lineTo(vertices[i].x, vertices[i].y)
-        
-        # 2. CENTRAR GEOMETRÍA (Lógica clave para rotación/escala correcta)
+        # 1. CENTRAR GEOMETRÍA (Lógica clave para rotación/escala correcta)
         # Obtenemos el rectángulo que encierra todo el dibujo original
-        bbox = raw_path.boundingRect()
-        center = bbox.center() # Este es el punto medio original (ej: 50, 50)
+        paths_list = [v for v in paths_list if len(v) >= 2]
+        mins = np.min([v.min(axis=0) for v in paths_list], axis=0) if paths_list else (0.0, 0.0)
+        maxs = np.max([v.max(axis=0) for v in paths_list], axis=0) if paths_list else (0.0, 0.0)
+        # Este es el punto medio original (ej: 50, 50)
+        center = QPointF((float(mins[0]) + float(maxs[0])) / 2, (float(mins[1]) + float(maxs[1])) / 2)
         
         # Desplazamos el dibujo para que su centro quede en (0,0) local
         # Al hacer esto, el punto de pivote natural (0,0) coincide con el centro visual
-        raw_path.translate(-center.x(), -center.y())
+        self.local_paths = [v - (center.x(), center.y()) for v in paths_list]
         
-        self.setPath(raw_path)
+        # 2. Construir un "Path" unificado con todas las líneas del DXF
+        self.setPath(build_painter_path(self.local_paths))
+
+        # Niveles de detalle: se construyen la primera vez que hacen falta
+        self._lod_paths = {}
         
         # 3. Posicionar el ítem en la escena
         # Para que el dibujo no "salte" visualmente al cargarlo, movemos 
@@ -53,22 +73,66 @@ class DXFGraphicsItem(QGraphicsPathItem):
         
         self.setPen(self.pen_normal)
 
+    def set_render_cache(self, enabled):
+        """
+        Caché de renderizado: el ítem se rasteriza una vez en coordenadas de
+        dispositivo y al desplazar la vista se reutiliza el pixmap. Qt la invalida
+        sola al cambiar la escala/rotación de la vista o al llamar a update()
+        (p. ej. al cambiar la selección). La decide el canvas según la memoria.
+        """
+        mode = QGraphicsItem.DeviceCoordinateCache if enabled else QGraphicsItem.NoCache
+        if self.cacheMode() != mode:
+            self.setCacheMode(mode)
+
     def paint(self, painter, option, widget=None):
         """
         Sobreescribimos el pintado para cambiar el lápiz según el estado.
+        No se modifica el estado del ítem aquí (setPen programaría otro repintado):
+        el lápiz solo se aplica al painter.
         """
+        # Con zoom alejado se dibuja una versión simplificada (muchos menos vértices)
+        lod = option.levelOfDetailFromTransform(painter.worldTransform())
         # Usamos QStyle.State_Selected para detectar selección en PySide6
-        if option.state & QStyle.State_Selected:
-            self.setPen(self.pen_selected)
+        selected = bool(option.state & QStyle.State_Selected)
+
+        painter.setPen(self.pen_selected if selected else self.pen_normal)
+        painter.setBrush(Qt.NoBrush)
+
+        rect = self.path().boundingRect()
+        if max(rect.width(), rect.height()) * lod < self.SMALL_ITEM_PX:
+            # Ocupa unos pocos píxeles: basta con su contorno
+            painter.drawRect(rect)
+        else:
+            painter.drawPath(self.lod_path(lod))
+
+        if selected:
             # Opcional: dibujar un pequeño punto en el centro para referencia visual
             painter.setPen(QPen(QColor(255, 0, 0), 0))
             painter.drawPoint(0, 0)
-        else:
-            self.setPen(self.pen_normal)
-            
-        super().paint(painter, option, widget)
+
+    def lod_path(self, lod):
+        """
+        Devuelve el camino más simple cuyo error en pantalla no supera LOD_MAX_ERROR_PX.
+        'lod' son píxeles por mm de escena.
+        """
+        if lod <= 0:
+            return self.path()
+        allowed = self.LOD_MAX_ERROR_PX / lod
+        chosen = None
+        for cell in self.LOD_CELLS:
+            # El error de la rejilla está acotado por la diagonal de la celda
+            if cell * 1.4143 <= allowed:
+                chosen = cell
+        if chosen is None:
+            return self.path()
+        painter_path = self._lod_paths.get(chosen)
+        if painter_path is None:
+            painter_path = build_painter_path([decimate_to_grid(v, chosen) for v in self.local_paths])
+            self._lod_paths[chosen] = painter_path
+        return painter_path
 
     def itemChange(self, change, value):
-        if change == QGraphicsPathItem.ItemSelectedChange:
-            pass 
+        if change == QGraphicsPathItem.ItemSelectedHasChanged:
+            # El lápiz depende de la selección: invalidar el pixmap en caché
+            self.update()
         return super().itemChange(change, value)
\ No newline at end of file
@@ -1,10 +1,12 @@
-from PySide6.QtWidgets import (QWidget, QVBoxLayout, QPushButton, QGroupBox)
+from PySide6.QtWidgets import (QWidget, QVBoxLayout, QPushButton, QGroupBox, QComboBox, QLabel, QCheckBox)
 from PySide6.QtCore import Signal
+from core.path_utils import CONNECT_TOLERANCE
 
 class FilePanel(QWidget):
     # Señales para comunicar al exterior qué botón se presionó
     signal_load = Signal()
     signal_gcode = Signal()
+    signal_clear_cache = Signal()
 
     def __init__(self):
         super().__init__()
@@ -23,6 +25,19 @@ class FilePanel(QWidget):
         self.btn_load = QPushButton("📂 Cargar DXF")
         self.btn_load.setMinimumHeight(35) # Un poco más alto para que destaque
         self.btn_load.clicked.connect(self.signal_load.emit)
+
+        # Calidad de curva al importar (None = automática según la boquilla)
+        self.combo_quality = QComboBox()
+        self.combo_quality.addItem("Automática (según boquilla)", None)
+        self.combo_quality.addItem("Fina (0.05 mm)", 0.05)
+        self.combo_quality.addItem("Normal (0.1 mm)", 0.1)
+        self.combo_quality.addItem("Rápida (0.25 mm)", 0.25)
+        self.combo_quality.setToolTip("Error máximo al convertir curvas en segmentos")
+
+        # Unir las entidades que se tocan (dibujos "explotados" en líneas y arcos)
+        self.chk_merge = QCheckBox("Agrupar entidades conectadas")
+        self.chk_merge.setChecked(True)
+        self.chk_merge.setToolTip("Une líneas y arcos que comparten extremos en una sola figura")
         
         # Botón Guardar (inicia desactivado)
         self.btn_gcode = QPushButton("💾 Generar G-Code")
@@ -30,13 +45,31 @@ class FilePanel(QWidget):
         self.btn_gcode.setEnabled(False)
         self.btn_gcode.setStyleSheet("background-color: #e1e1e1;") # Visualmente desactivado
         self.btn_gcode.clicked.connect(self.signal_gcode.emit)
+
+        # Vaciar la caché en disco de DXF aplanados (se poda sola, esto la borra entera)
+        self.btn_clear_cache = QPushButton("🧹 Vaciar caché de DXF")
+        self.btn_clear_cache.setFlat(True)
+        self.btn_clear_cache.setToolTip("Borra los DXF aplanados guardados en disco para abrirlos más rápido")
+        self.btn_clear_cache.clicked.connect(self.signal_clear_cache.emit)
         
         group_layout.addWidget(self.btn_load)
+        group_layout.addWidget(QLabel("Calidad de curva:"))
+        group_layout.addWidget(self.combo_quality)
+        group_layout.addWidget(self.chk_merge)
         group_layout.addWidget(self.btn_gcode)
+        group_layout.addWidget(self.btn_clear_cache)
         group.setLayout(group_layout)
         
         layout.addWidget(group)
 
+    def flattening_distance(self):
+        """Tolerancia elegida en mm, o None si es automática."""
+        return self.combo_quality.currentData()
+
+    def merge_tolerance(self):
+        """Tolerancia para unir entidades conectadas, o None si se importan sueltas."""
+        return CONNECT_TOLERANCE if self.chk_merge.isChecked() else None
+
     def enable_gcode_button(self, enable=True):
         """Activa o desactiva el botón de guardar visualmente"""
         self.btn_gcode.setEnabled(enable)
@@ -1,12 +1,38 @@
 from PySide6.QtWidgets import (QWidget, QVBoxLayout, QGroupBox, QComboBox, 
                                QPushButton, QFormLayout, QListWidget, QColorDialog, 
-                               QHBoxLayout, QLabel, QMessageBox, QLineEdit, QDoubleSpinBox)
+                               QHBoxLayout, QLabel, QMessageBox, QLineEdit, QDoubleSpinBox,
+                               QProgressBar, QCheckBox)
 from PySide6.QtGui import QColor
-from PySide6.QtCore import Signal
+from PySide6.QtCore import Signal, QThreadPool
 from core.gcode_generator import GCodeGenerator
+from core.geometry import PolygonSet
+from gui.workers import GeneratorTask
+
+# Entradas del combo "Tipo": (tipo de operación, patrón de relleno)
+OP_KINDS = [
+    ("Línea (Borde)", "line", "concentric"),
+    ("Relleno concéntrico", "fill", "concentric"),
+    ("Relleno raster (líneas)", "fill", "raster"),
+    ("Relleno zigzag", "fill", "zigzag"),
+    ("Relleno híbrido (perímetro + zigzag)", "fill", "hybrid"),
+]
+
+def item_transform(item):
+    """Transformación local -> escena de un ítem como tupla (m11, m12, m21, m22, dx, dy)."""
+    t = item.sceneTransform()
+    return (t.m11(), t.m12(), t.m21(), t.m22(), t.dx(), t.dy())
+
+def _format_time(seconds):
+    minutes, secs = divmod(int(round(max(seconds, 0))), 60)
+    return f"{minutes}:{secs:02d} min"
+
+def _encoded(result):
+    """(código, informe, estimación) con el código ya en bytes, codificado en el hilo de trabajo."""
+    code, report, estimate = result
+    return code.encode("utf-8"), report, estimate
 
 class GCodePanel(QWidget):
-    gcode_generated = Signal(str)
+    gcode_generated = Signal(object) # programa en bytes UTF-8 (sin copia a QString)
     operations_changed = Signal() # <--- NUEVA SEÑAL
 
     def __init__(self):
@@ -15,6 +41,11 @@ class GCodePanel(QWidget):
         self.generator = GCodeGenerator()
         self.current_color = "#000000"
         self.editing_index = None 
+        self.thread_pool = QThreadPool.globalInstance()
+        self.active_tasks = [] # Cálculos en segundo plano en curso
+        self.op_times = {} # id de operación -> segundos estimados (vacío si está desfasado)
+        self.op_items = {} # id de operación -> objeto del canvas del que sale (para seguirlo)
+        self._estimate_version = 0 # se incrementa con cada cambio que invalida la estimación
         self.setup_ui()
         self.setEnabled(True) 
 
@@ -27,8 +58,21 @@ class GCodePanel(QWidget):
         self.txt_name.setPlaceholderText("Ej: Contorno Exterior")
         form.addRow("Nombre:", self.txt_name)
         self.combo_type = QComboBox()
-        self.combo_type.addItems(["Línea (Borde)", "Relleno (Trama)"])
+        self.combo_type.addItems([kind[0] for kind in OP_KINDS])
+        self.combo_type.setToolTip("Raster y zigzag se calculan mucho más rápido que el concéntrico\n"
+                                   "y generan menos movimientos, más largos")
         form.addRow("Tipo:", self.combo_type)
+        # Ángulo de las líneas de los rellenos por barrido
+        self.spin_angle = QDoubleSpinBox()
+        self.spin_angle.setRange(-90.0, 90.0)
+        self.spin_angle.setDecimals(1)
+        self.spin_angle.setSingleStep(15.0)
+        self.spin_angle.setValue(45.0)
+        self.spin_angle.setSuffix(" °")
+        self.spin_angle.setEnabled(False)
+        self.combo_type.currentIndexChanged.connect(
+            lambda index: self.spin_angle.setEnabled(OP_KINDS[index][2] != "concentric"))
+        form.addRow("Ángulo:", self.spin_angle)
         self.combo_injector = QComboBox()
         self.combo_injector.addItems(["1", "2", "3", "4"])
         form.addRow("Inyector:", self.combo_injector)
@@ -38,6 +82,24 @@ class GCodePanel(QWidget):
         self.spin_nozzle.setValue(2.0)
         self.spin_nozzle.setSuffix(" mm")
         form.addRow("Boquilla:", self.spin_nozzle)
+
+        # Simplificación de bordes (solo operaciones de línea): 0 = automática según boquilla
+        tol_layout = QHBoxLayout()
+        self.chk_simplify = QCheckBox("Simplificar")
+        self.chk_simplify.setChecked(True)
+        self.chk_simplify.setToolTip("Elimina vértices de los bordes sin alejarse más de la tolerancia\n"
+                                     "(DXF trazados o con ruido generan miles de micro-movimientos)")
+        self.spin_tolerance = QDoubleSpinBox()
+        self.spin_tolerance.setRange(0.0, 1.0)
+        self.spin_tolerance.setDecimals(3)
+        self.spin_tolerance.setSingleStep(0.01)
+        self.spin_tolerance.setSuffix(" mm")
+        self.spin_tolerance.setSpecialValueText("Automática")
+        self.spin_tolerance.setValue(0.0)
+        self.chk_simplify.toggled.connect(self.spin_tolerance.setEnabled)
+        tol_layout.addWidget(self.chk_simplify)
+        tol_layout.addWidget(self.spin_tolerance)
+        form.addRow("Tolerancia:", tol_layout)
         color_layout = QHBoxLayout()
         self.btn_color = QPushButton()
         self.btn_color.setFixedWidth(50)
@@ -60,11 +122,52 @@ class GCodePanel(QWidget):
         self.group_config.setLayout(form)
         layout.addWidget(self.group_config)
         
-        layout.addWidget(QLabel("Cola de trabajo:"))
+        queue_header = QHBoxLayout()
+        queue_header.addWidget(QLabel("Cola de trabajo:"))
+        queue_header.addStretch()
+        self.btn_estimate = QPushButton("⏱ Estimar tiempo")
+        self.btn_estimate.setToolTip("Tiempo de ejecución por operación y total, con aceleración\n"
+                                     "y velocidad en esquinas según los límites de la máquina")
+        self.btn_estimate.clicked.connect(self.estimate_cycle_time)
+        queue_header.addWidget(self.btn_estimate)
+        layout.addLayout(queue_header)
         self.list_ops = QListWidget()
         self.list_ops.setSelectionMode(QListWidget.SingleSelection)
         self.list_ops.itemClicked.connect(self.on_list_item_clicked)
         layout.addWidget(self.list_ops)
+
+        # Límites de la máquina para la estimación de tiempo
+        machine = self.generator.machine
+        machine_layout = QHBoxLayout()
+        self.spin_max_feed = QDoubleSpinBox()
+        self.spin_max_feed.setRange(100.0, 50000.0)
+        self.spin_max_feed.setDecimals(0)
+        self.spin_max_feed.setSingleStep(100.0)
+        self.spin_max_feed.setValue(machine.max_feed)
+        self.spin_max_feed.setSuffix(" mm/min")
+        self.spin_max_feed.setToolTip("Avance máximo de la máquina")
+        self.spin_accel = QDoubleSpinBox()
+        self.spin_accel.setRange(1.0, 20000.0)
+        self.spin_accel.setDecimals(0)
+        self.spin_accel.setSingleStep(50.0)
+        self.spin_accel.setValue(machine.acceleration)
+        self.spin_accel.setSuffix(" mm/s²")
+        self.spin_accel.setToolTip("Aceleración")
+        self.spin_junction = QDoubleSpinBox()
+        self.spin_junction.setRange(0.001, 1.0)
+        self.spin_junction.setDecimals(3)
+        self.spin_junction.setSingleStep(0.005)
+        self.spin_junction.setValue(machine.junction_deviation)
+        self.spin_junction.setSuffix(" mm")
+        self.spin_junction.setToolTip("Desviación de esquina (junction deviation): cuánto se frena en los giros")
+        for spin in (self.spin_max_feed, self.spin_accel, self.spin_junction):
+            spin.valueChanged.connect(self.on_machine_settings_changed)
+            machine_layout.addWidget(spin)
+        layout.addLayout(machine_layout)
+
+        self.lbl_cycle = QLabel("")
+        self.lbl_cycle.setStyleSheet("font-weight: bold;")
+        layout.addWidget(self.lbl_cycle)
         
         list_btns_layout = QHBoxLayout()
         self.btn_edit = QPushButton("✏️ Editar")
@@ -81,12 +184,58 @@ class GCodePanel(QWidget):
         self.btn_clear.clicked.connect(self.clear_queue)
         layout.addWidget(self.btn_clear)
         layout.addStretch()
+
+        # Reordenar caminos y costuras para acortar los G0 (en la GUI, activado)
+        self.chk_optimize = QCheckBox("Optimizar recorridos (G0)")
+        self.chk_optimize.setToolTip("Ordena los caminos de cada operación y elige su punto de inicio\n"
+                                     "para reducir los desplazamientos en vacío")
+        self.chk_optimize.toggled.connect(self.on_optimize_changed)
+        self.chk_optimize.setChecked(True)
+        layout.addWidget(self.chk_optimize)
+
+        # Ajuste de arcos: G2/G3 en lugar de cientos de G1 en las curvas
+        arc_layout = QHBoxLayout()
+        self.chk_arcs = QCheckBox("Ajustar arcos (G2/G3)")
+        self.chk_arcs.setToolTip("Sustituye los tramos curvos de G1 por arcos; archivos mucho más cortos")
+        self.spin_arc_tol = QDoubleSpinBox()
+        self.spin_arc_tol.setRange(0.005, 0.5)
+        self.spin_arc_tol.setDecimals(3)
+        self.spin_arc_tol.setSingleStep(0.005)
+        self.spin_arc_tol.setValue(self.generator.arc_tolerance)
+        self.spin_arc_tol.setSuffix(" mm")
+        self.spin_arc_tol.setToolTip("Error máximo admitido entre el arco y el trayecto original (vértices y cuerdas)")
+        self.chk_arcs.toggled.connect(self.on_arc_settings_changed)
+        self.spin_arc_tol.valueChanged.connect(self.on_arc_settings_changed)
+        arc_layout.addWidget(self.chk_arcs)
+        arc_layout.addWidget(self.spin_arc_tol)
+        layout.addLayout(arc_layout)
+
+        self.lbl_travel = QLabel("")
+        self.lbl_travel.setWordWrap(True)
+        self.lbl_travel.setStyleSheet("color: gray; font-size: 11px;")
+        layout.addWidget(self.lbl_travel)
+
         self.btn_generate = QPushButton("💾 GENERAR CÓDIGO FINAL")
         self.btn_generate.setMinimumHeight(40)
         self.btn_generate.setStyleSheet("background-color: #28a745; color: white; font-weight: bold;")
         self.btn_generate.clicked.connect(self.generate_final_code)
         layout.addWidget(self.btn_generate)
 
+        # --- Progreso de cálculos en segundo plano ---
+        self.task_box = QWidget()
+        task_layout = QHBoxLayout(self.task_box)
+        task_layout.setContentsMargins(0, 0, 0, 0)
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setTextVisible(True)
+        self.btn_cancel_task = QPushButton("✖")
+        self.btn_cancel_task.setFixedWidth(30)
+        self.btn_cancel_task.setToolTip("Cancelar cálculo")
+        self.btn_cancel_task.clicked.connect(self.cancel_tasks)
+        task_layout.addWidget(self.progress_bar)
+        task_layout.addWidget(self.btn_cancel_task)
+        self.task_box.setVisible(False)
+        layout.addWidget(self.task_box)
+
     def choose_color(self):
         color = QColorDialog.getColor()
         if color.isValid():
@@ -104,13 +253,30 @@ class GCodePanel(QWidget):
         self.btn_edit.setEnabled(True)
         self.btn_delete.setEnabled(True)
 
+    def _op_text(self, i, op):
+        t = "LINE" if op['type'] == 'line' else "FILL"
+        if op['type'] == 'fill' and op['pattern'] != 'concentric':
+            t += f"/{op['pattern'].upper()} {op['angle']:g}°"
+        name = op['name'] if op['name'] else "(Sin nombre)"
+        text = f"{i+1}. {name} [{t}] - Inj:{op['injector']} - Noz:{op['nozzle']}mm"
+        if op['type'] == 'line' and self.generator.line_tolerance(op) > 0:
+            # Informe de la simplificación: vértices eliminados. El recuento llega
+            # con la previsualización (en segundo plano); hasta entonces, "…"
+            before, after = self.generator.simplification_stats(op)
+            if after is None:
+                text += f" - Pts: …/{before}"
+            else:
+                text += f" - Pts: {after}/{before} (-{before - after})"
+        if op['id'] in self.op_times:
+            text += f" - ⏱ {_format_time(self.op_times[op['id']])}"
+        return text
+
     def refresh_list(self):
+        # Cualquier cambio en la cola deja desfasada la estimación de tiempo
+        self.clear_cycle_time()
         self.list_ops.clear()
         for i, op in enumerate(self.generator.operations):
-            t = "LINE" if op['type'] == 'line' else "FILL"
-            name = op['name'] if op['name'] else "(Sin nombre)"
-            text = f"{i+1}. {name} [{t}] - Inj:{op['injector']} - Noz:{op['nozzle']}mm"
-            self.list_ops.addItem(text)
+            self.list_ops.addItem(self._op_text(i, op))
         self.btn_edit.setEnabled(False)
         self.btn_delete.setEnabled(False)
         
@@ -118,38 +284,72 @@ class GCodePanel(QWidget):
         self.operations_changed.emit()
 
     def action_add_or_save(self):
-        op_type = "line" if self.combo_type.currentIndex() == 0 else "fill"
+        _, op_type, pattern = OP_KINDS[self.combo_type.currentIndex()]
+        angle = self.spin_angle.value()
         inj = self.combo_injector.currentText()
         col = self.current_color
         name = self.txt_name.text()
         nozzle = self.spin_nozzle.value()
+        tolerance = self.selected_tolerance()
 
         if self.editing_index is None:
             if not self.current_item:
                 QMessageBox.warning(self, "Atención", "Selecciona un objeto en el diseño primero.")
                 return
-            transform = self.current_item.sceneTransform()
-            path_local = self.current_item.path()
-            polygons = list(path_local.toSubpathPolygons(transform))
-            self.generator.add_operation(polygons, op_type, inj, col, name, nozzle)
+            # Geometría local del objeto (buffer compacto de floats) + su transformación actual:
+            # si luego se mueve o gira, la operación lo sigue sin recalcular el relleno
+            polygons = PolygonSet.from_paths(self.current_item.local_paths)
+            op_id = self.generator.add_operation(polygons, op_type, inj, col, name, nozzle, tolerance, pattern, angle,
+                                                 item_transform(self.current_item))
+            self.op_items[op_id] = self.current_item
         else:
-            self.generator.update_operation(self.editing_index, op_type, inj, col, name, nozzle)
+            self.generator.update_operation(self.editing_index, op_type, inj, col, name, nozzle, tolerance,
+                                            pattern, angle)
             self.cancel_editing()
 
         self.refresh_list()
         if self.editing_index is None: self.txt_name.clear()
 
+    def sync_transforms(self):
+        """
+        Copia a las operaciones la transformación actual de sus objetos
+        (tras arrastrarlos o cambiar posición, escala o rotación en el panel).
+        """
+        changed = False
+        for i, op in enumerate(self.generator.operations):
+            item = self.op_items.get(op['id'])
+            if item is None:
+                continue
+            transform = item_transform(item)
+            if transform != op['transform']:
+                self.generator.set_operation_transform(i, transform)
+                changed = True
+        if changed:
+            self.refresh_list()
+
+    def selected_tolerance(self):
+        """Tolerancia de la operación: None (sin simplificar), 'auto' o mm."""
+        if not self.chk_simplify.isChecked():
+            return None
+        value = self.spin_tolerance.value()
+        return 'auto' if value == 0.0 else value
+
     def start_editing(self):
         row = self.list_ops.currentRow()
         if row < 0: return
         op = self.generator.operations[row]
         self.editing_index = row
         self.txt_name.setText(op['name'])
-        idx_type = 0 if op['type'] == 'line' else 1
+        pattern = op['pattern'] if op['type'] == 'fill' else "concentric"
+        idx_type = next(i for i, kind in enumerate(OP_KINDS) if kind[1:] == (op['type'], pattern))
         self.combo_type.setCurrentIndex(idx_type)
+        self.spin_angle.setValue(op['angle'])
         combo_idx = self.combo_injector.findText(str(op['injector']))
         if combo_idx >= 0: self.combo_injector.setCurrentIndex(combo_idx)
         self.spin_nozzle.setValue(op['nozzle'])
+        tolerance = op.get('tolerance')
+        self.chk_simplify.setChecked(tolerance is not None)
+        self.spin_tolerance.setValue(0.0 if tolerance in (None, 'auto') else float(tolerance))
         self.current_color = op['color']
         self._update_color_btn()
         self.group_config.setTitle(f"Editando Operación #{row+1}")
@@ -172,12 +372,14 @@ class GCodePanel(QWidget):
         if row < 0: return
         confirm = QMessageBox.question(self, "Confirmar", "¿Borrar esta operación?", QMessageBox.Yes | QMessageBox.No)
         if confirm == QMessageBox.Yes:
+            self.op_items.pop(self.generator.operations[row]['id'], None)
             self.generator.delete_operation(row)
             if self.editing_index == row: self.cancel_editing()
             self.refresh_list()
 
     def clear_queue(self):
         self.generator.clear_operations()
+        self.op_items.clear()
         self.cancel_editing()
         self.refresh_list()
 
@@ -185,5 +387,112 @@ class GCodePanel(QWidget):
         if len(self.generator.operations) == 0:
             QMessageBox.warning(self, "Vacío", "No has agregado operaciones.")
             return
-        full_code = self.generator.generate_full_code()
-        self.gcode_generated.emit(full_code)
\ No newline at end of file
+        # El cálculo se hace sobre una copia para no bloquear la GUI,
+        # repartiendo los rellenos entre todos los núcleos
+        snapshot = self.generator.snapshot()
+
+        # Programa, informe de recorridos y estimación de una sola pasada
+        task = GeneratorTask(lambda progress: _encoded(
+            snapshot.generate_with_report(progress=progress, parallel=True)))
+        task.signals.result.connect(self._on_code_generated)
+        self.btn_generate.setEnabled(False)
+        task.signals.finished.connect(lambda: self.btn_generate.setEnabled(True))
+        self.run_task(task, "Generando G-Code")
+
+    def estimate_cycle_time(self):
+        if len(self.generator.operations) == 0:
+            return
+        snapshot = self.generator.snapshot()
+        version = self._estimate_version
+        task = GeneratorTask(lambda progress: snapshot.estimate_cycle_time(progress=progress, parallel=True))
+        # Si la cola cambió mientras se calculaba, el resultado ya no vale
+        task.signals.result.connect(
+            lambda estimate: version == self._estimate_version and self.show_cycle_time(estimate))
+        self.btn_estimate.setEnabled(False)
+        task.signals.finished.connect(lambda: self.btn_estimate.setEnabled(True))
+        self.run_task(task, "Estimando tiempo")
+
+    def show_cycle_time(self, estimate):
+        """Tiempo por operación (en la cola) y total del programa."""
+        self.op_times = estimate['operations']
+        self.update_op_texts()
+        self.lbl_cycle.setText(f"Tiempo estimado: {_format_time(estimate['total_s'])}")
+
+    def clear_cycle_time(self):
+        self._estimate_version += 1
+        if self.op_times:
+            self.op_times = {}
+            self.update_op_texts()
+        self.lbl_cycle.setText("")
+
+    def update_op_texts(self):
+        """Rehace el texto de cada operación de la lista sin reconstruirla."""
+        for i, op in enumerate(self.generator.operations):
+            item = self.list_ops.item(i)
+            if item is not None:
+                item.setText(self._op_text(i, op))
+
+    def on_machine_settings_changed(self, *args):
+        machine = self.generator.machine
+        machine.max_feed = self.spin_max_feed.value()
+        machine.acceleration = self.spin_accel.value()
+        machine.junction_deviation = self.spin_junction.value()
+        self.clear_cycle_time()
+
+    def on_optimize_changed(self, checked):
+        self.generator.optimize_travel = checked
+        self.clear_cycle_time()
+
+    def on_arc_settings_changed(self, *args):
+        self.generator.arc_fitting = self.chk_arcs.isChecked()
+        self.generator.arc_tolerance = self.spin_arc_tol.value()
+        self.clear_cycle_time()
+        # La previsualización muestra los arcos ajustados: hay que rehacerla
+        self.operations_changed.emit()
+
+    def _on_code_generated(self, result):
+        code, report, estimate = result
+        self.show_travel_report(report)
+        self.show_cycle_time(estimate)
+        self.gcode_generated.emit(code)
+
+    def show_travel_report(self, report):
+        """Recorrido en vacío y tiempo estimado, sin optimizar -> optimizado."""
+        before, after = report['before'], report['after']
+        current = after if self.generator.optimize_travel else before
+        saved = before['time_s'] - after['time_s']
+        self.lbl_travel.setText(
+            f"En vacío: {before['rapid_mm'] / 1000:.2f} m → {after['rapid_mm'] / 1000:.2f} m. "
+            f"Tiempo estimado: {_format_time(before['time_s'])} → {_format_time(after['time_s'])} "
+            f"(-{_format_time(saved)}). Programa actual: {_format_time(current['time_s'])}.")
+
+    # --- TAREAS EN SEGUNDO PLANO ---
+    def run_task(self, task, description):
+        """Lanza una GeneratorTask en el pool mostrando su progreso en el panel."""
+        task.signals.progress.connect(
+            lambda done, total: self._on_task_progress(description, done, total))
+        task.signals.error.connect(self._on_task_error)
+        task.signals.finished.connect(lambda: self._on_task_finished(task))
+        self.active_tasks.append(task)
+        self.progress_bar.setRange(0, 0) # Indeterminado hasta el primer aviso
+        self.progress_bar.setFormat(f"{description}...")
+        self.task_box.setVisible(True)
+        self.thread_pool.start(task)
+
+    def cancel_tasks(self):
+        for task in self.active_tasks:
+            task.cancel()
+
+    def _on_task_progress(self, description, done, total):
+        self.progress_bar.setRange(0, max(total, 1))
+        self.progress_bar.setValue(done)
+        self.progress_bar.setFormat(f"{description}: %v/%m")
+
+    def _on_task_error(self, message):
+        QMessageBox.critical(self, "Error", f"Falló el cálculo:\n{message}")
+
+    def _on_task_finished(self, task):
+        if task in self.active_tasks:
+            self.active_tasks.remove(task)
+        if not self.active_tasks:
+            self.task_box.setVisible(False)
@@ -0,0 +1,254 @@
+"""
+gui/gcode_viewer.py
+Visor del G-Code generado para programas de millones de líneas.
+El texto se guarda una sola vez como bytes UTF-8 junto a un índice con el
+inicio de cada línea; la vista (QListView) solo pide las líneas visibles.
+Búsqueda y salto a línea trabajan sobre los bytes y el índice.
+"""
+import re
+import numpy as np
+from core.arc_fit import arc_points
+from PySide6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QListView, QLineEdit,
+                               QPushButton, QSpinBox, QLabel, QAbstractItemView)
+from PySide6.QtGui import QFont
+from PySide6.QtCore import Qt, Signal, QAbstractListModel, QModelIndex
+
+# Coordenadas X/Y de una línea de movimiento
+XY_PATTERN = re.compile(r"X(-?[\d.]+)\s+Y(-?[\d.]+)")
+# Arco: G2/G3 con el centro I/J relativo al punto anterior
+ARC_PATTERN = re.compile(r"^\s*G0?([23])\b.*?\bI(-?[\d.]+)\s+J(-?[\d.]+)")
+# Desviación máxima (mm) de la cuerda al arco al resaltarlo en el canvas
+ARC_DISPLAY_TOLERANCE = 0.01
+
+class GCodeLineModel(QAbstractListModel):
+    """
+    Modelo de solo lectura: la línea i es data[starts[i]:ends[i]].
+    Ninguna línea se decodifica hasta que la vista la pinta.
+    """
+    # Líneas hacia atrás que se miran como mucho para encontrar el punto anterior
+    MAX_LOOKBACK = 10000
+    # Bytes que se pasan a minúsculas de cada vez en la búsqueda sin mayúsculas
+    SEARCH_CHUNK = 1 << 20
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._data = b""
+        self._starts = np.zeros(0, dtype=np.int64)
+        self._ends = np.zeros(0, dtype=np.int64)
+
+    def set_text(self, text):
+        """Reemplaza el programa por 'text' (str)."""
+        self.set_data(text.encode("utf-8"))
+
+    def set_data(self, data):
+        """Reemplaza el programa (bytes UTF-8) y reconstruye el índice de líneas (vectorizado)."""
+        self.beginResetModel()
+        self._data = data
+        newlines = np.flatnonzero(np.frombuffer(self._data, dtype=np.uint8) == 10)
+        self._starts = np.concatenate(([0], newlines + 1)).astype(np.int64)
+        self._ends = np.concatenate((newlines, [len(self._data)])).astype(np.int64)
+        if not self._data:
+            self._starts = self._ends = np.zeros(0, dtype=np.int64)
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._starts)
+
+    def line(self, row):
+        return self._data[self._starts[row]:self._ends[row]].decode("utf-8")
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role != Qt.DisplayRole:
+            return None
+        row = index.row()
+        return f"{row + 1:>8}  {self.line(row)}"
+
+    @property
+    def nbytes(self):
+        return len(self._data) + self._starts.nbytes + self._ends.nbytes
+
+    def row_at_offset(self, offset):
+        """Línea que contiene el byte 'offset'."""
+        return int(np.searchsorted(self._starts, offset, side="right")) - 1
+
+    def find(self, query, from_row=-1, backward=False, case_sensitive=False):
+        """
+        Siguiente (o anterior) línea que contiene 'query' a partir de from_row,
+        dando la vuelta al llegar al final. Devuelve -1 si no aparece.
+        """
+        if not query or not len(self._starts):
+            return -1
+        needle = query.encode("utf-8")
+        if not case_sensitive:
+            needle = needle.lower()
+        size = len(self._data)
+        if backward:
+            end = int(self._starts[from_row]) if from_row >= 0 else size
+            pos = self._search(needle, 0, max(end - 1, 0), backward, case_sensitive)
+            if pos < 0:
+                pos = self._search(needle, 0, size, backward, case_sensitive)
+        else:
+            start = int(self._ends[from_row]) if from_row >= 0 else 0
+            pos = self._search(needle, start, size, backward, case_sensitive)
+            if pos < 0:
+                pos = self._search(needle, 0, size, backward, case_sensitive)
+        return -1 if pos < 0 else self.row_at_offset(pos)
+
+    def _search(self, needle, lo, hi, backward, case_sensitive):
+        """
+        Posición de la primera (o última) aparición de 'needle' dentro de
+        data[lo:hi], o -1. Sin distinguir mayúsculas se pasa a minúsculas un
+        bloque de SEARCH_CHUNK bytes cada vez (solapados len(needle) - 1 para
+        no perder las apariciones partidas), nunca una copia del programa entero.
+        """
+        data = self._data
+        if case_sensitive:
+            return data.rfind(needle, lo, hi) if backward else data.find(needle, lo, hi)
+        chunk, overlap = self.SEARCH_CHUNK, len(needle) - 1
+        if backward:
+            pos = hi
+            while pos > lo:
+                begin = max(pos - chunk, lo)
+                found = data[begin:min(pos + overlap, hi)].lower().rfind(needle)
+                if found >= 0:
+                    return begin + found
+                pos = begin
+        else:
+            pos = lo
+            while pos < hi:
+                found = data[pos:min(pos + chunk + overlap, hi)].lower().find(needle)
+                if found >= 0:
+                    return pos + found
+                pos += chunk
+        return -1
+
+    def point_at(self, row):
+        """(x, y) de la línea o None si no tiene coordenadas."""
+        match = XY_PATTERN.search(self.line(row))
+        return (float(match.group(1)), float(match.group(2))) if match else None
+
+    def segment_at(self, row):
+        """
+        Puntos del tramo que recorre la línea, del punto anterior al de la línea.
+        El punto anterior es el último X/Y de las líneas previas (None si no hay).
+        Un G2/G3 se devuelve muestreado a lo largo del arco (centro = punto
+        anterior + I/J); una línea recta son sus dos extremos y una línea sin X/Y
+        (Z, T...) es solo la posición actual.
+        """
+        end = self.point_at(row)
+        start = None
+        for prev in range(row - 1, max(row - self.MAX_LOOKBACK, 0) - 1, -1):
+            start = self.point_at(prev)
+            if start is not None:
+                break
+        if end is None:
+            return [start] if start is not None else None
+        if start is None:
+            return [end]
+        arc = ARC_PATTERN.match(self.line(row))
+        if arc is None:
+            return [start, end]
+        center = (start[0] + float(arc.group(2)), start[1] + float(arc.group(3)))
+        points = arc_points(start, end, center, arc.group(1) == "3", ARC_DISPLAY_TOLERANCE)
+        return [start] + [tuple(p) for p in points.tolist()]
+
+
+class GCodeViewer(QWidget):
+    """Lista virtualizada con búsqueda y salto a línea."""
+    line_selected = Signal(int)   # fila (0-based) elegida por el usuario
+    line_activated = Signal(int)  # doble clic / Enter
+
+    def __init__(self):
+        super().__init__()
+        self.model = GCodeLineModel(self)
+        self.setup_ui()
+
+    def setup_ui(self):
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+
+        # --- Barra: búsqueda y salto ---
+        bar = QHBoxLayout()
+        self.txt_search = QLineEdit()
+        self.txt_search.setPlaceholderText("Buscar (p. ej. T1, Z-1, X10.5)")
+        self.txt_search.returnPressed.connect(self.find_next)
+        self.btn_prev = QPushButton("▲")
+        self.btn_prev.setToolTip("Anterior")
+        self.btn_prev.clicked.connect(self.find_previous)
+        self.btn_next = QPushButton("▼")
+        self.btn_next.setToolTip("Siguiente")
+        self.btn_next.clicked.connect(self.find_next)
+
+        self.spin_line = QSpinBox()
+        self.spin_line.setRange(1, 1)
+        self.spin_line.setPrefix("Línea ")
+        self.btn_goto = QPushButton("Ir")
+        self.btn_goto.clicked.connect(lambda: self.go_to_line(self.spin_line.value()))
+
+        self.lbl_info = QLabel("Genera el código desde el panel derecho para verlo aquí.")
+        self.lbl_info.setStyleSheet("color: gray;")
+
+        bar.addWidget(self.txt_search, stretch=1)
+        bar.addWidget(self.btn_prev)
+        bar.addWidget(self.btn_next)
+        bar.addSpacing(10)
+        bar.addWidget(self.spin_line)
+        bar.addWidget(self.btn_goto)
+        layout.addLayout(bar)
+
+        # --- Lista: solo se materializan las filas visibles ---
+        self.list_view = QListView()
+        self.list_view.setModel(self.model)
+        self.list_view.setUniformItemSizes(True) # Sin esto Qt mediría cada fila
+        self.list_view.setLayoutMode(QListView.Batched)
+        self.list_view.setSelectionMode(QAbstractItemView.SingleSelection)
+        font = QFont("Consolas")
+        font.setStyleHint(QFont.Monospace)
+        font.setPointSize(10)
+        self.list_view.setFont(font)
+        self.list_view.setStyleSheet("color: #333;")
+        self.list_view.selectionModel().currentChanged.connect(
+            lambda current, previous: self.line_selected.emit(current.row()) if current.isValid() else None)
+        self.list_view.activated.connect(lambda index: self.line_activated.emit(index.row()))
+
+        layout.addWidget(self.list_view)
+        layout.addWidget(self.lbl_info)
+
+    def set_text(self, text):
+        self.set_data(text.encode("utf-8"))
+
+    def set_data(self, data):
+        """Muestra el programa ya codificado (bytes UTF-8), sin copiarlo."""
+        self.model.set_data(data)
+        n_lines = self.model.rowCount()
+        self.spin_line.setRange(1, max(n_lines, 1))
+        self.lbl_info.setText(f"{n_lines} líneas ({self.model.nbytes / (1024 * 1024):.1f} MB)")
+
+    def current_row(self):
+        index = self.list_view.currentIndex()
+        return index.row() if index.isValid() else -1
+
+    def go_to_line(self, number):
+        """Selecciona y centra la línea 'number' (1-based)."""
+        row = number - 1
+        if not 0 <= row < self.model.rowCount():
+            return
+        index = self.model.index(row)
+        self.list_view.setCurrentIndex(index)
+        self.list_view.scrollTo(index, QAbstractItemView.PositionAtCenter)
+
+    def find_next(self):
+        self._find(backward=False)
+
+    def find_previous(self):
+        self._find(backward=True)
+
+    def _find(self, backward):
+        query = self.txt_search.text()
+        row = self.model.find(query, self.current_row(), backward=backward)
+        if row < 0:
+            if query:
+                self.lbl_info.setText(f"'{query}' no aparece en el programa.")
+            return
+        self.go_to_line(row + 1)
+        self.lbl_info.setText(f"Línea {row + 1} de {self.model.rowCount()}")
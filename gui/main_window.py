@@ -1,13 +1,18 @@
 from PySide6.QtWidgets import (QMainWindow, QHBoxLayout, QVBoxLayout, QWidget, 
-                               QFileDialog, QMessageBox, QLabel, QTabWidget, QTextEdit)
+                               QFileDialog, QMessageBox, QLabel, QTabWidget, QPushButton)
+from PySide6.QtCore import QTimer
 
 from gui.canvas import ViewerCanvas
 from gui.control_panel import ControlPanel
 from gui.file_panel import FilePanel
 from gui.gcode_panel import GCodePanel
+from gui.gcode_viewer import GCodeViewer
 from gui.collapsible_box import CollapsibleBox  # <--- IMPORTACIÓN NUEVA
-from core.dxf_processor import DXFReader
+from gui.diagnostics_dialog import DiagnosticsDialog, summary_text
+from core import instrumentation
+from core.dxf_processor import DXFReader, flattening_distance_for_nozzle
 from core.transformer import TransformManager
+from gui.workers import GeneratorTask, DXFLoadTask
 
 class MainWindow(QMainWindow):
     def __init__(self):
@@ -18,6 +23,11 @@ class MainWindow(QMainWindow):
         self.dxf_reader = DXFReader()
         self.transformer = TransformManager()
 
+        # Estado de la previsualización dibujada: id de operación -> (clave de geometría, color)
+        self.preview_state = {}
+        self.preview_task = None
+        self.diagnostics_dialog = None
+
         self.setup_ui()
         self.setup_connections()
 
@@ -47,10 +57,8 @@ class MainWindow(QMainWindow):
         self.layout_viewer = QVBoxLayout(self.tab_viewer)
         self.layout_viewer.setContentsMargins(0,0,0,0)
         
-        self.gcode_display = QTextEdit()
-        self.gcode_display.setPlaceholderText("Genera el código desde el panel derecho para verlo aquí.")
-        self.gcode_display.setReadOnly(True)
-        self.gcode_display.setStyleSheet("font-family: Consolas, monospace; font-size: 13px; color: #333;")
+        # Vista virtualizada: solo se dibujan las líneas visibles
+        self.gcode_display = GCodeViewer()
         
         self.layout_viewer.addWidget(self.gcode_display)
 
@@ -89,12 +97,29 @@ class MainWindow(QMainWindow):
         self.main_layout.addWidget(self.tabs, stretch=1)
         self.main_layout.addWidget(self.sidebar, stretch=0)
 
+        # --- C. BARRA DE ESTADO: resumen del diagnóstico por etapas ---
+        self.lbl_diagnostics = QLabel("")
+        self.btn_diagnostics = QPushButton("📊 Diagnóstico")
+        self.btn_diagnostics.setFlat(True)
+        self.btn_diagnostics.clicked.connect(self.show_diagnostics)
+        self.statusBar().addPermanentWidget(self.lbl_diagnostics)
+        self.statusBar().addPermanentWidget(self.btn_diagnostics)
+        # Solo trabaja con la medición activada (desactivada no hay nada que mostrar)
+        self.diagnostics_timer = QTimer(self)
+        self.diagnostics_timer.setInterval(1000)
+        self.diagnostics_timer.timeout.connect(self.update_diagnostics_status)
+        self.diagnostics_timer.start()
+
     def setup_connections(self):
-        # Carga
+        # Carga / Guardado
         self.file_panel.signal_load.connect(self.action_load_file)
+        self.file_panel.signal_gcode.connect(self.action_save_gcode)
+        self.file_panel.signal_clear_cache.connect(self.action_clear_cache)
         
         # Canvas -> Selección
         self.canvas.items_selected.connect(self.on_items_selected)
+        # Canvas -> Operaciones: siguen a sus objetos al arrastrarlos
+        self.canvas.items_moved.connect(self.gcode_panel.sync_transforms)
         
         # Panel Control -> Transformación
         self.control_panel.value_changed.connect(self.apply_transformations)
@@ -102,18 +127,75 @@ class MainWindow(QMainWindow):
         # Panel GCode -> Visor
         self.gcode_panel.gcode_generated.connect(self.display_gcode_result)
 
+        # Visor -> Canvas: la línea elegida se resalta en el diseño
+        self.gcode_display.line_selected.connect(self.on_gcode_line_selected)
+        self.gcode_display.line_activated.connect(lambda row: self.tabs.setCurrentIndex(0))
+
         self.gcode_panel.operations_changed.connect(self.update_canvas_preview)
 
     def action_load_file(self):
         filename, _ = QFileDialog.getOpenFileName(self, "Importar DXF", "", "DXF (*.dxf)")
         if filename:
-            paths = self.dxf_reader.read(filename)
-            if paths:
-                self.canvas.add_dxf_object(paths)
-                self.lbl_info.setText(f"Añadido: {filename.split('/')[-1]}")
-                self.tabs.setCurrentIndex(0)
-            else:
-                QMessageBox.critical(self, "Error", "DXF inválido.")
+            # Lectura en segundo plano: cada lote aplanado se añade al canvas en cuanto llega
+            short_name = filename.split('/')[-1]
+            self.lbl_info.setText(f"Cargando: {short_name}...")
+            self.tabs.setCurrentIndex(0)
+            # Calidad de curva: la elegida o, en automático, la adecuada a la boquilla actual
+            distance = self.file_panel.flattening_distance()
+            if distance is None:
+                distance = flattening_distance_for_nozzle(self.gcode_panel.spin_nozzle.value())
+            task = DXFLoadTask(self.dxf_reader, filename, distance, self.file_panel.merge_tolerance())
+            # Miles de ítems: el índice espacial se reconstruye una sola vez al final
+            self.canvas.begin_bulk_add()
+            # Las entidades sueltas se ven en cuanto llegan; si se agrupan, al final
+            # se sustituyen por las figuras unidas
+            streamed = []
+            task.signals.partial.connect(lambda groups: streamed.extend(self.canvas.add_dxf_groups(groups)))
+            task.signals.replace.connect(lambda groups: self.canvas.replace_dxf_items(streamed, groups))
+            task.signals.result.connect(lambda report: self.on_dxf_loaded(short_name, report))
+            task.signals.finished.connect(self.canvas.end_bulk_add)
+            self.gcode_panel.run_task(task, "Cargando DXF")
+
+    def show_diagnostics(self):
+        if self.diagnostics_dialog is None:
+            self.diagnostics_dialog = DiagnosticsDialog(self)
+        self.diagnostics_dialog.show()
+        self.diagnostics_dialog.raise_()
+
+    def update_diagnostics_status(self):
+        self.lbl_diagnostics.setText(summary_text() if instrumentation.is_enabled() else "")
+
+    def on_dxf_loaded(self, short_name, report):
+        if report is None or report.paths == 0:
+            QMessageBox.critical(self, "Error", "DXF inválido.")
+            return
+        self.lbl_info.setText(f"Añadido: {short_name} ({report.summary()})")
+
+    def action_save_gcode(self):
+        """
+        Escribe el programa directamente a disco en segundo plano.
+        Se usa la escritura en streaming del generador: memoria constante
+        aunque el programa tenga cientos de miles de líneas.
+        """
+        generator = self.gcode_panel.generator
+        if not generator.operations:
+            QMessageBox.warning(self, "Vacío", "No has agregado operaciones.")
+            return
+        default_name = f"{generator.design_name}.gcode"
+        filename, _ = QFileDialog.getSaveFileName(self, "Guardar G-Code", default_name, "G-Code (*.gcode *.nc)")
+        if not filename:
+            return
+
+        snapshot = generator.snapshot()
+
+        def write_file(progress):
+            with open(filename, "w", encoding="utf-8", newline="\n", buffering=1024 * 1024) as f:
+                return snapshot.write_to(f, progress=progress, parallel=True)
+
+        task = GeneratorTask(write_file)
+        task.signals.result.connect(
+            lambda n_lines: self.lbl_info.setText(f"Guardado: {filename.split('/')[-1]} ({n_lines} líneas)"))
+        self.gcode_panel.run_task(task, "Guardando G-Code")
 
     def on_items_selected(self, items):
         """
@@ -142,16 +224,103 @@ class MainWindow(QMainWindow):
 
     def apply_transformations(self, x, y, scale, rotation):
         self.transformer.apply(x, y, scale, rotation)
+        self.gcode_panel.sync_transforms()
+
+    def action_clear_cache(self):
+        freed = self.dxf_reader.clear_cache()
+        self.statusBar().showMessage(f"Caché de DXF vaciada ({freed / (1024 * 1024):.1f} MB)", 5000)
 
-    def display_gcode_result(self, text):
-        self.gcode_display.setText(text)
+    def display_gcode_result(self, data):
+        self.gcode_display.set_data(data)
+        self.canvas.clear_highlight()
         self.tabs.setCurrentIndex(1)
         self.file_panel.enable_gcode_button(True)
 
+    def on_gcode_line_selected(self, row):
+        """Resalta en el canvas el tramo que recorre la línea (doble clic para verlo)."""
+        segment = self.gcode_display.model.segment_at(row)
+        if segment is None:
+            self.canvas.clear_highlight()
+        else:
+            self.canvas.highlight_segment(segment)
+
     def update_canvas_preview(self):
-        """Pide al generador los caminos calculados y se los manda al canvas"""
-        # 1. Obtener datos de geometría (rutas de relleno o borde)
-        preview_data = self.gcode_panel.generator.get_all_preview_paths()
-        
-        # 2. Mandarlos a pintar
-        self.canvas.draw_preview_paths(preview_data)
\ No newline at end of file
+        """
+        Sincroniza la previsualización con la cola de operaciones.
+        Solo se recalcula y redibuja la operación que cambió (añadida, re-tipada,
+        con otra boquilla o escalada); un cambio de color solo cambia el lápiz,
+        mover o girar el diseño solo recoloca su ítem y las operaciones borradas
+        se quitan de la escena. El resto no se toca.
+        El recálculo se hace en segundo plano para no congelar la ventana.
+        """
+        generator = self.gcode_panel.generator
+        current_ids = set()
+        pending = []
+
+        for op in generator.operations:
+            op_id = op['id']
+            current_ids.add(op_id)
+            key = generator.preview_key(op)
+            state = self.preview_state.get(op_id)
+
+            if state is None or state[0] != key:
+                # 1. Geometría nueva o modificada: recalcular solo esta operación
+                pending.append(dict(op))
+            else:
+                # 2. Misma geometría: como mucho cambió el color o la posición
+                if state[1] != op['color']:
+                    self.canvas.set_operation_preview_color(op_id, op['color'])
+                    self.preview_state[op_id] = (key, op['color'])
+                self.canvas.set_operation_preview_transform(op_id, generator.preview_transform(op))
+
+        # 3. Quitar las operaciones que ya no existen
+        for op_id in list(self.preview_state):
+            if op_id not in current_ids:
+                self.canvas.remove_operation_preview(op_id)
+                del self.preview_state[op_id]
+
+        # 4. Lanzar el cálculo (el anterior, si sigue en curso, queda obsoleto)
+        if self.preview_task is not None:
+            self.preview_task.cancel()
+            self.preview_task = None
+        if not pending:
+            return
+
+        snapshot = generator.snapshot()
+        keys = {op['id']: generator.preview_key(op) for op in pending}
+        task = GeneratorTask(lambda progress: snapshot.get_all_preview_paths(pending, progress))
+        task.signals.result.connect(lambda previews: self.apply_preview_result(previews, keys))
+        self.preview_task = task
+        self.gcode_panel.run_task(task, "Previsualizando")
+
+    def apply_preview_result(self, previews, keys):
+        """Dibuja las previsualizaciones calculadas en segundo plano si siguen vigentes."""
+        generator = self.gcode_panel.generator
+        current = {op['id']: op for op in generator.operations}
+        drawn = set()
+        stats_changed = False
+
+        for preview in previews:
+            op_id = preview['id']
+            drawn.add(op_id)
+            op = current.get(op_id)
+            # La operación se borró o cambió mientras se calculaba: resultado obsoleto
+            if op is None or generator.preview_key(op) != keys[op_id]:
+                continue
+            # La posición actual de la operación (pudo moverse mientras se calculaba)
+            self.canvas.set_operation_preview(op_id, op['color'], preview['paths'], generator.preview_transform(op))
+            self.preview_state[op_id] = (keys[op_id], op['color'])
+            if preview['line_stats'] is not None:
+                stats_key, count = preview['line_stats']
+                generator.line_stats[stats_key] = count
+                stats_changed = True
+
+        # Operaciones sin caminos: se registran para no recalcularlas otra vez
+        for op_id, key in keys.items():
+            op = current.get(op_id)
+            if op_id not in drawn and op is not None and generator.preview_key(op) == key:
+                self.canvas.remove_operation_preview(op_id)
+                self.preview_state[op_id] = (key, op['color'])
+        # Recuento de vértices de las líneas simplificadas (ver GCodeGenerator.simplification_stats)
+        if stats_changed:
+            self.gcode_panel.update_op_texts()
@@ -0,0 +1,108 @@
+"""
+gui/workers.py
+Tareas en segundo plano (QThreadPool) para los cálculos pesados:
+rellenos, previsualización y generación de G-Code.
+Los resultados vuelven al hilo de la GUI mediante señales.
+"""
+import threading
+import traceback
+import ezdxf
+from PySide6.QtCore import QObject, QRunnable, Signal
+
+from core.dxf_processor import FlattenReport, DEFAULT_FLATTENING_DISTANCE
+from core.gcode_generator import GenerationCancelled
+from core.instrumentation import span, timed
+from core.path_utils import merge_connected_paths, merge_nested_groups
+
+
+class WorkerSignals(QObject):
+    """Las señales deben vivir en un QObject; QRunnable no lo es."""
+    progress = Signal(int, int)  # hechos, total
+    partial = Signal(object)     # resultados parciales (p. ej. lotes de caminos)
+    replace = Signal(object)     # resultado que sustituye a todos los parciales emitidos
+    result = Signal(object)
+    error = Signal(str)
+    cancelled = Signal()
+    finished = Signal()
+
+
+class GeneratorTask(QRunnable):
+    """
+    Ejecuta fn(progress) en un hilo del pool.
+    'progress(done, total)' informa del avance y lanza GenerationCancelled
+    si se pidió la cancelación, cortando el cálculo en el siguiente polígono.
+    """
+    def __init__(self, fn):
+        super().__init__()
+        self.fn = fn
+        self.signals = WorkerSignals()
+        self._cancel_event = threading.Event()
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    def is_cancelled(self):
+        return self._cancel_event.is_set()
+
+    def _progress(self, done, total):
+        if self._cancel_event.is_set():
+            raise GenerationCancelled()
+        self.signals.progress.emit(done, total)
+
+    def run(self):
+        try:
+            result = self.fn(self._progress)
+        except GenerationCancelled:
+            self.signals.cancelled.emit()
+        except Exception:
+            self.signals.error.emit(traceback.format_exc())
+        else:
+            if self._cancel_event.is_set():
+                self.signals.cancelled.emit()
+            else:
+                self.signals.result.emit(result)
+        finally:
+            self.signals.finished.emit()
+
+
+class DXFLoadTask(GeneratorTask):
+    """
+    Lee un DXF en segundo plano emitiendo grupos de caminos (señal 'partial'):
+    cada grupo será un objeto del canvas.
+    Mientras se lee, un grupo por entidad, emitidos por lotes en cuanto se aplanan
+    para que el canvas los muestre sin esperar al final.
+    Agrupando ('merge_tolerance' en mm), al terminar la lectura se cosen las
+    entidades conectadas y se emiten por 'replace' (un objeto por figura), que
+    sustituyen a las entidades sueltas ya mostradas. Los contornos cerrados que
+    quedan dentro de otro (huecos) van en el objeto de su exterior, para que
+    una operación de relleno creada con él respete los huecos.
+    El resultado final es el FlattenReport; si el DXF no es válido, 'result' emite None.
+    """
+    def __init__(self, reader, filename, distance=DEFAULT_FLATTENING_DISTANCE, merge_tolerance=None):
+        super().__init__(self._load)
+        self.reader = reader
+        self.filename = filename
+        self.distance = distance
+        self.merge_tolerance = merge_tolerance
+
+    @timed("dxf.load")
+    def _load(self, progress):
+        report = FlattenReport()
+        collected = []
+        try:
+            for batch in self.reader.iter_paths(self.filename, self.distance, report):
+                if self.is_cancelled():
+                    raise GenerationCancelled()
+                if not batch:
+                    continue
+                self.signals.partial.emit([[p] for p in batch])
+                if self.merge_tolerance is not None:
+                    collected.extend(batch)
+        except (IOError, ezdxf.DXFStructureError):
+            return None
+        if collected:
+            with span("dxf.merge"):
+                groups = merge_connected_paths(collected, self.merge_tolerance)
+                groups = merge_nested_groups(groups, self.merge_tolerance)
+            self.signals.replace.emit(groups)
+        return report
@@ -1,8 +1,20 @@
+import os
 import sys
+import multiprocessing
 from PySide6.QtWidgets import QApplication
 from gui.main_window import MainWindow
+from core import instrumentation
 
 if __name__ == "__main__":
+    # Necesario para el pool de procesos del generador en ejecutables congelados
+    multiprocessing.freeze_support()
+
+    # GCODECOOKIES_PROFILE=1 activa la medición por etapas desde el arranque
+    # (=memory incluye también el pico de memoria)
+    profile = os.environ.get("GCODECOOKIES_PROFILE")
+    if profile:
+        instrumentation.enable(memory=profile == "memory")
+
     # Crear la aplicación Qt
     app = QApplication(sys.argv)
     
@@ -0,0 +1,48 @@
+"""
+tests/test_arc_fit.py
+El ajuste de arcos de core.arc_fit no se aleja del camino más que la tolerancia.
+"""
+import numpy as np
+from core.arc_fit import arc_points, fit_arcs
+
+def _deviation(points, i, j, arc):
+    # Distancia radial máxima de la polilínea points[i..j] a la circunferencia,
+    # en los vértices y en el punto de cada cuerda más cercano al centro
+    cx, cy, radius, _ = arc
+    rel = points[i:j + 1] - (cx, cy)
+    seg = rel[1:] - rel[:-1]
+    t = np.clip(-(rel[:-1] * seg).sum(axis=1) / (seg * seg).sum(axis=1), 0.0, 1.0)
+    closest = rel[:-1] + t[:, None] * seg
+    return max(np.abs(np.hypot(*rel.T) - radius).max(), radius - np.hypot(*closest.T).min())
+
+def _flattened_curves():
+    rng = np.random.default_rng(3)
+    t = np.linspace(0.0, 2.0 * np.pi, 400)
+    yield np.column_stack((20 * np.cos(t), 20 * np.sin(t)))
+    yield np.column_stack((30 * np.cos(t), 12 * np.sin(t))) # elipse: radio variable
+    yield np.column_stack((t * 10, 5 * np.sin(t * 3)))
+    yield np.cumsum(rng.normal(size=(300, 2)), axis=0)
+    # Circunferencia grande aplanada con flecha 0.1 mm (DXF típico)
+    step = 2 * np.arccos(1 - 0.1 / 500.0)
+    a = np.arange(0.0, 0.5, step)
+    yield np.column_stack((500 * np.cos(a), 500 * np.sin(a)))
+
+def test_fit_arcs_deviation_within_tolerance():
+    for tolerance in (0.01, 0.05, 0.2):
+        fitted = 0
+        for points in _flattened_curves():
+            prev = 0
+            for j, arc in fit_arcs(points, tolerance):
+                if arc is not None:
+                    fitted += 1
+                    assert _deviation(points, prev, j, arc) <= tolerance + 1e-9
+                prev = j
+        assert fitted > 0
+
+def test_arc_points_chords_within_tolerance():
+    for radius in (1.0, 50.0, 976.0):
+        points = arc_points((radius, 0.0), (0.0, radius), (0.0, 0.0), True, 0.05)
+        points = np.vstack(([(radius, 0.0)], points))
+        mid = (points[1:] + points[:-1]) / 2
+        assert radius - np.hypot(*mid.T).min() <= 0.05
+        assert np.allclose(points[-1], (0.0, radius))
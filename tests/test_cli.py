@@ -0,0 +1,44 @@
+"""
+tests/test_cli.py
+El conversor por lotes solo altera el programa con las opciones que lo piden.
+"""
+import ezdxf
+import pytest
+from core.cli import convert_file
+
+@pytest.fixture(autouse=True)
+def _cache_dir(tmp_path, monkeypatch):
+    # Caché de DXF aplanados dentro de la carpeta temporal, no en la del usuario
+    monkeypatch.setenv("GCODECOOKIES_CACHE", str(tmp_path / "cache"))
+
+def _dxf(tmp_path):
+    # Polilíneas en un orden malo para los G0, con vértices casi alineados
+    doc = ezdxf.new()
+    msp = doc.modelspace()
+    for x in (0, 200, 20, 180, 40):
+        msp.add_lwpolyline([(x, 0), (x + 5, 0.01), (x + 10, 0), (x + 10, 10)])
+    filename = tmp_path / "design.dxf"
+    doc.saveas(filename)
+    return str(filename)
+
+def _program(tmp_path, **options):
+    job = {"design_name": "test", "operations": [{"type": "line", "nozzle": 1.0}]}
+    job.update(options)
+    output = tmp_path / "out.gcode"
+    convert_file(_dxf(tmp_path), job, str(output), reader_workers=1)
+    return output.read_text(encoding="utf-8")
+
+def _starts(program):
+    return [line.split()[1] for line in program.splitlines() if line.startswith("G0 X")]
+
+def test_default_job_keeps_order_and_vertices(tmp_path):
+    program = _program(tmp_path)
+    assert _starts(program) == ["X0.000", "X200.000", "X20.000", "X180.000", "X40.000"]
+    assert program.count("G1 X") == 5 * 3
+    assert program == _program(tmp_path, optimize_travel=False)
+
+def test_options_change_the_program(tmp_path):
+    default = _program(tmp_path)
+    assert _starts(_program(tmp_path, optimize_travel=True)) != _starts(default)
+    simplified = _program(tmp_path, operations=[{"type": "line", "nozzle": 1.0, "tolerance": 0.1}])
+    assert simplified.count("G1 X") == 5 * 2
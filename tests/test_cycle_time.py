@@ -0,0 +1,41 @@
+"""
+tests/test_cycle_time.py
+Tiempos de core.cycle_time frente a perfiles de velocidad calculados a mano.
+"""
+import math
+import numpy as np
+from core.cycle_time import MachineProfile, segment_times
+
+PROFILE = MachineProfile(max_feed=5000.0, acceleration=500.0, junction_deviation=0.02)
+
+def _path(*xy):
+    return np.array([(x, y, 0.0) for x, y in xy])
+
+def test_trapezoid():
+    # 3000 mm/min = 50 mm/s; acelerar y frenar ocupan 2.5 mm cada uno
+    times = segment_times(_path((0, 0), (100, 0)), [3000.0], PROFILE)
+    assert math.isclose(times.sum(), 2 * 50 / 500 + (100 - 5) / 50)
+
+def test_triangle():
+    # 1 mm no da para llegar a 50 mm/s: acelera hasta la mitad y frena
+    times = segment_times(_path((0, 0), (1, 0)), [3000.0], PROFILE)
+    assert math.isclose(times.sum(), 2 * math.sqrt(1.0 / 500))
+
+def test_straight_junction_does_not_slow_down():
+    times = segment_times(_path((0, 0), (50, 0), (100, 0)), [3000.0, 3000.0], PROFILE)
+    assert math.isclose(times.sum(), 2 * 50 / 500 + (100 - 5) / 50)
+
+def test_right_angle_corner():
+    # Desviación de esquina a 90°: v² = a·δ·sin(45°) / (1 - sin(45°))
+    s = math.sqrt(0.5)
+    v_sq = 500 * 0.02 * s / (1 - s)
+    v = math.sqrt(v_sq)
+    cruise = 100 - 2500 / 1000 - (2500 - v_sq) / 1000
+    leg = 50 / 500 + (50 - v) / 500 + cruise / 50
+    times = segment_times(_path((0, 0), (100, 0), (100, 100)), [3000.0, 3000.0], PROFILE)
+    assert np.allclose(times, [leg, leg])
+
+def test_feed_is_capped_by_the_machine():
+    times = segment_times(_path((0, 0), (100, 0)), [60000.0], PROFILE)
+    v = 5000.0 / 60
+    assert math.isclose(times.sum(), 2 * v / 500 + (100 - v * v / 500) / v)
@@ -0,0 +1,56 @@
+"""
+tests/test_dxf_cache.py
+Poda LRU y vaciado de la caché en disco de core.dxf_processor.
+"""
+import os
+import time
+import ezdxf
+from core.dxf_processor import DXFReader
+
+def _dxf(tmp_path, name, n):
+    doc = ezdxf.new()
+    for k in range(n):
+        doc.modelspace().add_circle((10 * k, 0), 3)
+    filename = tmp_path / f"{name}.dxf"
+    doc.saveas(filename)
+    return str(filename)
+
+def _entries(reader):
+    return sorted(os.path.basename(files[0]).split(".", 1)[0] for _, _, files in reader._cache_entries())
+
+def _age(reader, seconds):
+    # Envejece todas las entradas: la siguiente escritura o acierto es más reciente
+    for _, _, files in reader._cache_entries():
+        for full in files:
+            stamp = time.time() - seconds
+            os.utime(full, (stamp, stamp))
+
+def test_entry_budget_keeps_the_most_recently_used(tmp_path):
+    reader = DXFReader(cache_dir=str(tmp_path / "cache"), workers=1)
+    reader.cache_max_entries = 2
+    files = [_dxf(tmp_path, name, k + 1) for k, name in enumerate("abc")]
+    reader.read(files[0])
+    _age(reader, 100)
+    reader.read(files[1])
+    _age(reader, 10)
+    reader.read(files[0]) # acierto: 'a' pasa a ser la más reciente
+    reader.read(files[2])
+    keys = {name: reader._cache_key(f, 0.1) for name, f in zip("abc", files)}
+    assert _entries(reader) == sorted([keys["a"], keys["c"]])
+
+def test_byte_budget(tmp_path):
+    reader = DXFReader(cache_dir=str(tmp_path / "cache"), workers=1)
+    reader.read(_dxf(tmp_path, "a", 50))
+    reader.cache_max_bytes = sum(size for _, size, _ in reader._cache_entries())
+    _age(reader, 100)
+    reader.read(_dxf(tmp_path, "b", 40))
+    # Caben 'b' y nada más: 'a' sale aunque sea la única anterior
+    assert len(reader._cache_entries()) == 1
+    assert sum(size for _, size, _ in reader._cache_entries()) <= reader.cache_max_bytes
+
+def test_clear_cache(tmp_path):
+    reader = DXFReader(cache_dir=str(tmp_path / "cache"), workers=1)
+    reader.read(_dxf(tmp_path, "a", 5))
+    assert reader.clear_cache() > 0
+    assert reader._cache_entries() == []
+    assert reader.read(_dxf(tmp_path, "a", 5)) # se vuelve a aplanar y guardar
@@ -0,0 +1,53 @@
+"""
+tests/test_fill_cache.py
+Aciertos, fallos y expulsión por presupuesto de memoria de core.fill_cache.
+"""
+import numpy as np
+from core.fill_cache import FillCache
+
+def _paths(n_points):
+    return [np.zeros((n_points, 2))]
+
+def _size(n_points):
+    return n_points * FillCache.BYTES_PER_POINT + FillCache.BYTES_PER_PATH
+
+def test_hits_and_misses():
+    cache = FillCache()
+    assert cache.get("a") is None
+    cache.put("a", _paths(10))
+    assert cache.get("a") is not None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 1, 1)
+
+def test_contains_does_not_count():
+    cache = FillCache()
+    cache.put("a", _paths(10))
+    assert "a" in cache and "b" not in cache
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"]) == (0, 0)
+    cache.record_misses(3)
+    assert cache.stats()["misses"] == 3
+
+def test_byte_budget_evicts_least_recently_used():
+    cache = FillCache(max_bytes=3 * _size(100))
+    for key in "abc":
+        cache.put(key, _paths(100))
+    cache.get("a") # 'b' pasa a ser la menos usada
+    cache.put("d", _paths(100))
+    assert "b" not in cache
+    assert all(key in cache for key in "acd")
+    assert cache.stats()["evictions"] == 1
+    assert cache.current_bytes <= cache.max_bytes
+
+def test_many_small_entries_fit_without_entry_cap():
+    # Miles de rellenos pequeños caben enteros: manda la memoria, no el nº de entradas
+    cache = FillCache()
+    for k in range(2000):
+        cache.put(k, _paths(20))
+    assert len(cache) == 2000
+    assert cache.stats()["evictions"] == 0
+
+def test_oversized_result_is_not_stored():
+    cache = FillCache(max_bytes=_size(10))
+    cache.put("big", _paths(1000))
+    assert "big" not in cache and cache.current_bytes == 0
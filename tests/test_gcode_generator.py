@@ -0,0 +1,53 @@
+"""
+tests/test_gcode_generator.py
+Invariantes del programa generado por core.gcode_generator.
+"""
+import numpy as np
+from core.gcode_generator import GCodeGenerator
+from core.geometry import IDENTITY
+
+def _circle(cx, cy, r, n=64):
+    t = np.linspace(0.0, 2.0 * np.pi, n)
+    return np.column_stack((cx + r * np.cos(t), cy + r * np.sin(t)))
+
+def _generator():
+    generator = GCodeGenerator()
+    circles = [_circle(40 * (k % 5), 40 * (k // 5), 5 + k) for k in range(12)]
+    generator.add_operation(circles, 'fill', 1, "#ff0000", "Relleno", 2.0)
+    generator.add_operation(circles, 'line', 2, "#000000", "Borde", 1.0)
+    return generator
+
+def test_parallel_output_matches_serial():
+    serial = _generator().generate_full_code()
+    generator = _generator()
+    generator.parallel_min_polygons = 1 # que use el pool aunque haya pocos rellenos
+    assert generator.generate_full_code(parallel=True) == serial
+
+def test_parallel_fills_run_in_the_pool():
+    generator = _generator()
+    generator.parallel_min_polygons = 1
+    prefetched, jobs = generator._parallel_fills()
+    assert jobs == 12 and len(prefetched) == 12
+
+def test_identity_transform_is_byte_identical():
+    plain = _generator()
+    explicit = GCodeGenerator()
+    for op in plain.operations:
+        explicit.add_operation(op['polygons'], op['type'], op['injector'], op['color'], op['name'], op['nozzle'],
+                               transform=IDENTITY)
+    assert explicit.generate_full_code() == plain.generate_full_code()
+
+def test_fill_cache_reused_under_rotation_and_translation():
+    generator = _generator()
+    generator.set_operation_transform(0, (0.0, 1.0, -1.0, 0.0, 10.0, 20.0)) # 90° + traslación
+    first = generator.generate_full_code()
+    misses = generator.fill_cache.stats()["misses"]
+    generator.set_operation_transform(0, (0.6, 0.8, -0.8, 0.6, -50.0, 3.0))
+    second = generator.generate_full_code()
+    stats = generator.fill_cache.stats()
+    assert stats["misses"] == misses and stats["hits"] > 0
+    assert first != second
+    # Con escala, en cambio, el relleno se recalcula
+    generator.set_operation_transform(0, (2.0, 0.0, 0.0, 2.0, 0.0, 0.0))
+    generator.generate_full_code()
+    assert generator.fill_cache.stats()["misses"] > misses
@@ -0,0 +1,42 @@
+"""
+tests/test_gcode_viewer.py
+Modelo del visor de G-Code: búsqueda por bloques y tramos de arco.
+"""
+import math
+import pytest
+
+pytest.importorskip("PySide6")
+
+from gui.gcode_viewer import GCodeLineModel
+
+def _model(lines):
+    model = GCodeLineModel()
+    model.set_text("\n".join(lines))
+    return model
+
+def test_find_matches_across_chunk_boundaries():
+    lines = [f"G1 X{i}.000 Y0.000 F1500.0" for i in range(400)] + ["M30 ; Fin DEL programa"]
+    model = _model(lines)
+    model.SEARCH_CHUNK = 7 # bloques diminutos: casi todas las apariciones quedan partidas
+    for query, backward in [("fin del", False), ("FIN DEL", True), ("x399.0", False), ("X12.000", True)]:
+        row = model.find(query, -1, backward=backward)
+        expected = [i for i, line in enumerate(lines) if query.lower() in line.lower()]
+        assert row == (expected[-1] if backward else expected[0])
+    assert model.find("X1.000", 1) == 1 # vuelta al principio tras el final
+    assert model.find("x1.000", 0, case_sensitive=True) == -1
+    assert model.find("zzz") == -1
+
+def test_segment_at_samples_arcs():
+    model = _model(["G0 X10.000 Y0.000",
+                    "G3 X0.000 Y10.000 I-10.000 J0.000 F1500.0",
+                    "G2 X10.000 Y0.000 I0.000 J-10.000 F1500.0",
+                    "G1 X20.000 Y0.000 F1500.0",
+                    "G1 Z-1.000"])
+    ccw = model.segment_at(1)
+    assert ccw[0] == (10.0, 0.0) and ccw[-1] == (0.0, 10.0) and len(ccw) > 3
+    assert all(abs(math.hypot(x, y) - 10) < 1e-9 for x, y in ccw)
+    assert all(x >= -1e-9 and y >= -1e-9 for x, y in ccw) # cuarto de vuelta antihorario
+    cw = model.segment_at(2)
+    assert cw[-1] == (10.0, 0.0) and all(abs(math.hypot(x, y) - 10) < 1e-9 for x, y in cw)
+    assert model.segment_at(3) == [(10.0, 0.0), (20.0, 0.0)]
+    assert model.segment_at(4) == [(20.0, 0.0)]
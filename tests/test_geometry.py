@@ -0,0 +1,38 @@
+"""
+tests/test_geometry.py
+Anidado de contornos y transformaciones afines de core.geometry.
+"""
+import math
+import numpy as np
+from core.geometry import IDENTITY, apply_affine, nest_polygons, split_affine
+
+def _square(r, c=0.0):
+    return np.array([[c - r, c - r], [c + r, c - r], [c + r, c + r], [c - r, c + r], [c - r, c - r]])
+
+def test_nest_even_odd():
+    # Anillo dentro de anillo dentro de anillo: exterior, hueco, isla, hueco de la isla
+    rings = [_square(1), _square(10), _square(4), _square(7), _square(2, 50)]
+    nested = sorted((outer, sorted(holes)) for outer, holes in nest_polygons(rings))
+    assert nested == [(1, [3]), (2, [0]), (4, [])]
+
+def test_nest_ignores_degenerate_paths():
+    rings = [_square(10), np.array([[0.0, 0.0], [1.0, 1.0]]), _square(5)]
+    assert nest_polygons(rings) == [(0, [2])]
+
+
+def _rotation(degrees, scale=1.0, dx=0.0, dy=0.0):
+    c, s = math.cos(math.radians(degrees)) * scale, math.sin(math.radians(degrees)) * scale
+    return (c, s, -s, c, dx, dy)
+
+def test_split_affine_round_trip():
+    points = np.random.default_rng(4).normal(size=(50, 2)) * 10
+    for transform in (_rotation(30, 1.0, 5, -3), _rotation(-120, 2.5, 100, 7), (2.0, 0.0, 0.3, 0.5, 1.0, 2.0),
+                      (-1.0, 0.0, 0.0, 1.0, 0.0, 0.0)):
+        shape, motion = split_affine(transform)
+        assert np.allclose(apply_affine(apply_affine(points, shape), motion), apply_affine(points, transform))
+    assert split_affine(IDENTITY) == (IDENTITY, IDENTITY)
+
+def test_rotation_and_translation_keep_the_shape():
+    # Solo la escala queda en 'forma': girar o mover no cambia la clave del relleno
+    assert split_affine(_rotation(30, 2.0, 5, 5))[0] == split_affine(_rotation(75, 2.0, -40, 9))[0]
+    assert split_affine(_rotation(30, 1.0, 5, 5))[0] == split_affine((1.0, 0.0, 0.0, 1.0, 3.0, 4.0))[0]
@@ -0,0 +1,58 @@
+"""
+tests/test_path_order.py
+Comprobaciones del orden de caminos de core.path_order.
+"""
+import time
+import numpy as np
+from core.path_order import is_closed, order_paths, rapid_distance
+
+def _segments(n, seed=1):
+    rng = np.random.default_rng(seed)
+    return [rng.random((2, 2)) * 100 for _ in range(n)]
+
+def test_start_far_outside_the_grid():
+    # La posición de reposo o la salida de la operación anterior pueden quedar
+    # muy lejos del diseño: la búsqueda no debe recorrer las celdas vacías
+    paths = _segments(50)
+    start = (1e5, 1e5)
+    t0 = time.perf_counter()
+    ordered = order_paths(paths, start)
+    assert time.perf_counter() - t0 < 1.0
+    assert len(ordered) == len(paths)
+    # El primero es el de la entrada más cercana al inicio (se admite invertirlo)
+    ends = np.concatenate([p[[0, -1]] for p in paths])
+    nearest = ends[np.argmin(np.hypot(*(ends - start).T))]
+    assert np.allclose(ordered[0][0], nearest)
+
+def _mixed(seed):
+    # Lazos cerrados y caminos abiertos, a veces ya en un buen orden
+    rng = np.random.default_rng(seed)
+    n = int(rng.integers(2, 40))
+    if seed % 2:
+        walk = np.cumsum(rng.normal(scale=5.0, size=(2 * n, 2)), axis=0)
+        return [walk[2 * k:2 * k + 2] for k in range(n)]
+    paths = []
+    for _ in range(n):
+        if rng.random() < 0.5:
+            center, radius = rng.random(2) * 100, rng.random() * 10 + 1
+            angles = np.linspace(0.0, 2.0 * np.pi, int(rng.integers(4, 12)))
+            loop = np.column_stack((center[0] + radius * np.cos(angles), center[1] + radius * np.sin(angles)))
+            loop[-1] = loop[0]
+            paths.append(loop)
+        else:
+            paths.append(rng.random((int(rng.integers(2, 6)), 2)) * 100)
+    return paths
+
+def _signature(path):
+    # Mismo camino aunque se invierta o se rote el lazo (sin el punto de cierre)
+    if is_closed(path):
+        path = path[:-1]
+    return tuple(sorted(map(tuple, np.round(path, 9).tolist())))
+
+def test_order_is_a_permutation_and_never_longer():
+    for seed in range(200):
+        paths = _mixed(seed)
+        start = (50.0, 50.0) if seed % 3 == 0 else None
+        ordered = order_paths(paths, start)
+        assert sorted(map(_signature, ordered)) == sorted(map(_signature, paths))
+        assert rapid_distance(ordered, start) <= rapid_distance(paths, start) + 1e-9
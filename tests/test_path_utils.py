@@ -0,0 +1,59 @@
+"""
+tests/test_path_utils.py
+Comprobaciones de core.path_utils: limpieza, formateo G1, simplificación y agrupado.
+"""
+import numpy as np
+from core.path_utils import (filter_min_distance, format_g1_lines, merge_connected_paths, merge_nested_groups,
+                             simplify_polyline, simplify_paths)
+
+def test_spike_on_the_same_line_is_kept():
+    # Ida y vuelta sobre la misma recta: (12, 0) está a 0 de la recta (0,0)-(4,0)
+    # pero a 8 mm del segmento, no puede desaparecer
+    spike = [[0, 0], [10, 0], [12, 0], [5, 0.05], [4, 0]]
+    result = simplify_polyline(spike, 0.1)
+    assert any(np.allclose(p, (12, 0)) for p in result)
+    assert np.allclose(result[0], (0, 0)) and np.allclose(result[-1], (4, 0))
+
+def test_batched_matches_single():
+    rng = np.random.default_rng(0)
+    paths = [np.cumsum(rng.normal(size=(n, 2)), axis=0) for n in (2, 5, 40, 200)]
+    batched = simplify_paths(paths, 0.5)
+    for path, simplified in zip(paths, batched):
+        assert np.array_equal(simplified, simplify_polyline(path, 0.5))
+
+def test_closed_loop_keeps_its_shape():
+    square = [[0, 0], [10, 0], [10, 10], [0, 10], [0, 0]]
+    assert len(simplify_polyline(square, 0.1)) == 5
+
+def _legacy_filter(path):
+    # Filtro punto a punto original: distancia al último punto conservado
+    clean = [path[0]]
+    for p in path[1:]:
+        prev = clean[-1]
+        if (p[0] - prev[0]) ** 2 + (p[1] - prev[1]) ** 2 > 0.0025:
+            clean.append(p)
+    return clean
+
+def test_filter_min_distance_matches_legacy_loop():
+    rng = np.random.default_rng(1)
+    for scale in (0.01, 0.04, 0.2, 1.0):
+        path = np.cumsum(rng.normal(scale=scale, size=(500, 2)), axis=0)
+        assert np.array_equal(filter_min_distance(path), np.array(_legacy_filter(path.tolist())))
+
+def test_format_g1_lines_matches_legacy_format():
+    rng = np.random.default_rng(2)
+    points = rng.normal(scale=100.0, size=(200, 2))
+    points[0] = (-0.0001, 0.0004) # redondeos a -0.000
+    expected = "\n".join(f"G1 X{x:.3f} Y{y:.3f} F{800.0:.1f}" for x, y in points.tolist())
+    assert format_g1_lines(points, 800.0) == expected
+    assert format_g1_lines(np.zeros((0, 2)), 800.0) == ""
+
+def test_merge_nested_groups_keeps_holes_with_their_exterior():
+    def square(r, c=0.0):
+        return np.array([[c - r, c - r], [c + r, c - r], [c + r, c + r], [c - r, c + r], [c - r, c - r]])
+    outer = square(10)
+    # Exterior en dos trozos abiertos, hueco, isla dentro del hueco, otra figura y una línea suelta
+    paths = [outer[:3], outer[2:], square(5), square(2), square(3, 50), np.array([[20.0, 20.0], [30.0, 30.0]])]
+    groups = merge_nested_groups(merge_connected_paths(paths, 0.01), 0.01)
+    assert [len(g) for g in groups] == [2, 1, 1, 1]
+    assert np.allclose(groups[0][1], square(5))
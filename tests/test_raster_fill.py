@@ -0,0 +1,34 @@
+"""
+tests/test_raster_fill.py
+El relleno por líneas de core.raster_fill no se sale de la zona retranqueada.
+"""
+import numpy as np
+from shapely.geometry import LineString, Polygon
+from core.raster_fill import raster_fill
+
+NOZZLE = 1.0
+OVERLAP = 0.15
+STEP = NOZZLE * (1.0 - OVERLAP)
+
+def _circle(r, cx=0.0, cy=0.0, n=96):
+    t = np.linspace(0.0, 2.0 * np.pi, n)
+    return np.column_stack((cx + r * np.cos(t), cy + r * np.sin(t)))
+
+def _shapes():
+    square = np.array([[0, 0], [40, 0], [40, 30], [0, 30], [0, 0]], dtype=float)
+    yield square, []
+    yield square, [_circle(6, 20, 15)]
+    l_shape = np.array([[0, 0], [30, 0], [30, 8], [8, 8], [8, 30], [0, 30], [0, 0]], dtype=float)
+    yield l_shape, []
+
+def test_segments_stay_inside_the_inset_region():
+    for coords, holes in _shapes():
+        region = Polygon(coords, holes).buffer(-NOZZLE / 2)
+        for angle in (0.0, 45.0, 90.0, 17.0):
+            for zigzag, perimeter in ((False, False), (True, False), (True, True)):
+                paths = raster_fill(coords, NOZZLE, OVERLAP, angle, zigzag, perimeter, holes)
+                assert paths
+                # Los enlaces del zigzag pueden rozar el borde un 5% del paso
+                allowed = region.buffer(STEP * 0.05 + 1e-6)
+                for path in paths:
+                    assert allowed.covers(LineString(path))
@@ -1,23 +1,36 @@
 import sys
-import ezdxf
-from ezdxf import path  # Herramienta poderosa para convertir curvas en rutas
-from PySide6.QtWidgets import (QApplication, QMainWindow, QGraphicsScene, 
-                               QGraphicsView, QFileDialog, QVBoxLayout, 
-                               QWidget, QPushButton, QMessageBox)
+import time
+from PySide6.QtWidgets import (QApplication, QMainWindow, QGraphicsScene,
+                               QGraphicsView, QFileDialog, QVBoxLayout,
+                               QWidget, QPushButton, QMessageBox, QGraphicsPathItem)
 from PySide6.QtGui import QPen, QColor, QPainter
-from PySide6.QtCore import Qt
+from PySide6.QtCore import Qt, QThreadPool
+from core.dxf_processor import DXFReader, DEFAULT_FLATTENING_DISTANCE
+from gui.dxf_item import build_painter_path
+from gui.workers import DXFLoadTask
 
 class VisorDXF(QMainWindow):
+    # Vértices por ítem de la escena: pocos QGraphicsPathItem grandes en vez de
+    # un QGraphicsLineItem por segmento (200k segmentos = 200k ítems)
+    CHUNK_POINTS = 50000
+
     def __init__(self):
         super().__init__()
 
         self.setWindowTitle("Visor DXF para Galletas - v0.1")
         self.resize(800, 600)
 
+        # Lectura en segundo plano (aplanado en streaming y caché en disco)
+        self.reader = DXFReader()
+        self.thread_pool = QThreadPool.globalInstance()
+        self.task = None
+        self.pending_paths = []
+        self.pending_points = 0
+
         # 1. Configuración de la Interfaz (Layout)
         widget_central = QWidget()
         layout = QVBoxLayout(widget_central)
-        
+
         # Botón para cargar
         self.btn_cargar = QPushButton("Cargar Archivo DXF")
         self.btn_cargar.clicked.connect(self.abrir_archivo)
@@ -26,76 +39,108 @@ class VisorDXF(QMainWindow):
         # Lienzo (Scene y View)
         self.scene = QGraphicsScene()
         self.view = QGraphicsView(self.scene)
-        
+
         # Configuraciones de renderizado para mejor calidad
         self.view.setRenderHint(QPainter.Antialiasing)
-        
-        # IMPORTANTE: Invertir eje Y. 
+
+        # IMPORTANTE: Invertir eje Y.
         # En computación (0,0) es arriba-izq. En CAD (0,0) es abajo-izq.
-        self.view.scale(1, -1) 
-        
+        self.view.scale(1, -1)
+
         layout.addWidget(self.view)
         self.setCentralWidget(widget_central)
 
+        # Definir estilo de línea (Azul, grosor delgado para precisión)
+        self.pen = QPen(QColor(0, 120, 255))
+        self.pen.setWidth(0) # 0 = 'Cosmetic pen', siempre se ve de 1px sin importar el zoom
+
     def abrir_archivo(self):
         # Diálogo para seleccionar archivo
         archivo, _ = QFileDialog.getOpenFileName(self, "Abrir DXF", "", "Archivos DXF (*.dxf)")
-        
+
         if archivo:
             self.procesar_dxf(archivo)
 
     def procesar_dxf(self, ruta_archivo):
-        try:
-            # Limpiar la escena anterior
-            self.scene.clear()
-            
-            # Leer el DXF con ezdxf
-            doc = ezdxf.readfile(ruta_archivo)
-            msp = doc.modelspace()
-            
-            # Definir estilo de línea (Azul, grosor delgado para precisión)
-            pen = QPen(QColor(0, 120, 255))
-            pen.setWidth(0) # 0 = 'Cosmetic pen', siempre se ve de 1px sin importar el zoom
-            
-            contador_elementos = 0
-
-            # Iterar sobre las entidades
-            # Usamos ezdxf.path para unificar líneas, arcos y splines en una sola lógica
-            for entity in msp:
-                try:
-                    # Convertir entidad a un "Path" (camino de puntos)
-                    p = path.make_path(entity)
-                    
-                    # Convertir ese Path en líneas simples para Qt
-                    # 'flattening' convierte curvas en pequeños segmentos rectos
-                    vertices = list(p.flattening(distance=0.1)) 
-                    
-                    if len(vertices) > 1:
-                        for i in range(len(vertices) - 1):
-                            p1 = vertices[i]
-                            p2 = vertices[i+1]
-                            # Agregar línea a la escena (x1, y1, x2, y2)
-                            self.scene.addLine(p1.x, p1.y, p2.x, p2.y, pen)
-                        contador_elementos += 1
-                        
-                except Exception:
-                    # Ignorar entidades que no son geometría dibujable (como texto o cotas complejas)
-                    pass
-
-            # Ajustar la cámara para ver todo el dibujo
+        """
+        Lanza la lectura en segundo plano. Los caminos llegan por lotes y se
+        juntan en QPainterPath de hasta CHUNK_POINTS vértices.
+        """
+        if self.task is not None:
+            self.task.cancel()
+
+        # Limpiar la escena anterior
+        self.scene.clear()
+        self.pending_paths = []
+        self.pending_points = 0
+        self.contador_elementos = 0
+        self.t_inicio = time.perf_counter()
+        self.t_primer_lote = None
+
+        self.btn_cargar.setEnabled(False)
+        self.statusBar().showMessage(f"Cargando {ruta_archivo}...")
+
+        task = DXFLoadTask(self.reader, ruta_archivo, DEFAULT_FLATTENING_DISTANCE)
+        task.signals.partial.connect(lambda grupos: self.agregar_lote(task, grupos))
+        task.signals.result.connect(lambda report: self.carga_terminada(task, report))
+        task.signals.error.connect(lambda mensaje: QMessageBox.critical(self, "Error", mensaje))
+        task.signals.finished.connect(lambda: self.btn_cargar.setEnabled(True))
+        self.task = task
+        self.thread_pool.start(task)
+
+    def agregar_lote(self, task, grupos):
+        if task is not self.task:
+            return # Lote de una carga anterior ya cancelada
+        for grupo in grupos:
+            for vertices in grupo:
+                self.pending_paths.append(vertices)
+                self.pending_points += len(vertices)
+        self.contador_elementos += len(grupos)
+
+        if self.pending_points >= self.CHUNK_POINTS:
+            self.volcar_pendientes()
+        if self.t_primer_lote is None:
+            # Primer dibujo en pantalla: encuadrar ya, sin esperar al final
+            self.t_primer_lote = time.perf_counter()
+            self.volcar_pendientes()
             self.view.fitInView(self.scene.itemsBoundingRect(), Qt.KeepAspectRatio)
-            
-            # Feedback al usuario
-            print(f"Dibujados {contador_elementos} elementos.")
 
-        except IOError:
-            QMessageBox.critical(self, "Error", "No se pudo leer el archivo.")
-        except ezdxf.DXFStructureError:
-             QMessageBox.critical(self, "Error", "Archivo DXF inválido o corrupto.")
+    def volcar_pendientes(self):
+        """Convierte los caminos acumulados en un único ítem de la escena."""
+        if not self.pending_paths:
+            return
+        item = QGraphicsPathItem(build_painter_path(self.pending_paths))
+        item.setPen(self.pen)
+        self.scene.addItem(item)
+        self.pending_paths = []
+        self.pending_points = 0
+
+    def carga_terminada(self, task, report):
+        if task is not self.task:
+            return
+        self.task = None
+        if report is None:
+            QMessageBox.critical(self, "Error", "Archivo DXF inválido, corrupto o ilegible.")
+            self.statusBar().clearMessage()
+            return
+        self.volcar_pendientes()
+
+        # Ajustar la cámara para ver todo el dibujo
+        self.view.fitInView(self.scene.itemsBoundingRect(), Qt.KeepAspectRatio)
+
+        # Feedback al usuario: tiempos de carga
+        total = time.perf_counter() - self.t_inicio
+        primero = (self.t_primer_lote or time.perf_counter()) - self.t_inicio
+        mensaje = (f"Dibujados {self.contador_elementos} elementos en {len(self.scene.items())} ítems "
+                   f"({report.summary()}) - primer dibujo {primero:.2f}s, total {total:.2f}s")
+        self.statusBar().showMessage(mensaje)
+        print(mensaje)
 
 # Punto de entrada de la aplicación
 if __name__ == "__main__":
     app = QApplication(sys.argv)
     ventana = VisorDXF()
     ventana.show()
-    sys.exit(app.exec())
\ No newline at end of file
+    if len(sys.argv) > 1:
+        ventana.procesar_dxf(sys.argv[1])
+    sys.exit(app.exec())